@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     port: int = Field(default=8080, validation_alias="API_PORT")
     reload: bool = Field(default=True, validation_alias="API_RELOAD")
     log_level: str = Field(default="info", validation_alias="LOG_LEVEL")
+    log_file_path: str = Field(default="logs/quark.log", validation_alias="LOG_FILE_PATH")
     
     # Configuración de seguridad
     admin_password: str = Field(default="sofia2023", validation_alias="ADMIN_PASSWORD")
@@ -38,6 +39,60 @@ class Settings(BaseSettings):
     # Configuración de ChromaDB
     chroma_db_dir: str = Field(default=str(BASE_DIR / "data" / "chroma"), validation_alias="CHROMA_DB_DIR")
     embedding_model: str = Field(default="all-MiniLM-L6-v2", validation_alias="EMBEDDING_MODEL")
+    embedding_device: str = Field(default="cpu", validation_alias="EMBEDDING_DEVICE")
+    embedding_warmup: bool = Field(default=True, validation_alias="EMBEDDING_WARMUP")
+    embedding_batch_window_ms: float = Field(default=5.0, validation_alias="EMBEDDING_BATCH_WINDOW_MS")
+    embedding_max_batch_size: int = Field(default=64, validation_alias="EMBEDDING_MAX_BATCH_SIZE")
+    embedding_cache_enabled: bool = Field(default=True, validation_alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: str = Field(default=str(BASE_DIR / "data" / "embedding_cache.sqlite3"), validation_alias="EMBEDDING_CACHE_PATH")
+    embedding_cache_max_mb: int = Field(default=512, validation_alias="EMBEDDING_CACHE_MAX_MB")
+    embedding_cache_memory_items: int = Field(default=10000, validation_alias="EMBEDDING_CACHE_MEMORY_ITEMS")
+    similarity_block_size: int = Field(default=1024, validation_alias="SIMILARITY_BLOCK_SIZE")
+    connection_memory_limit_mb: int = Field(default=256, validation_alias="CONNECTION_MEMORY_LIMIT_MB")
+    connection_top_k: int = Field(default=3, validation_alias="CONNECTION_TOP_K")
+    connection_links_per_pair: int = Field(default=20, validation_alias="CONNECTION_LINKS_PER_PAIR")
+    inactive_after_days: float = Field(default=1.0, validation_alias="INACTIVE_AFTER_DAYS")
+    
+    # Instantáneas de los análisis de sugerencias
+    snapshot_max_entries: int = Field(default=64, validation_alias="SNAPSHOT_MAX_ENTRIES")
+    snapshot_settle_seconds: float = Field(default=10.0, validation_alias="SNAPSHOT_SETTLE_SECONDS")
+    snapshot_refresh_interval_seconds: float = Field(default=5.0, validation_alias="SNAPSHOT_REFRESH_INTERVAL_SECONDS")
+    bulk_chunk_size: int = Field(default=500, validation_alias="BULK_CHUNK_SIZE")
+    
+    # Pools de hilos para el trabajo bloqueante
+    db_read_workers: int = Field(default=8, validation_alias="DB_READ_WORKERS")
+    db_write_workers: int = Field(default=2, validation_alias="DB_WRITE_WORKERS")
+    embedding_workers: int = Field(default=1, validation_alias="EMBEDDING_WORKERS")
+    pool_max_pending: int = Field(default=0, validation_alias="POOL_MAX_PENDING")
+    
+    # Trabajos en segundo plano
+    jobs_db_path: str = Field(default=str(BASE_DIR / "data" / "jobs.sqlite3"), validation_alias="JOBS_DB_PATH")
+    job_workers: int = Field(default=1, validation_alias="JOB_WORKERS")
+    
+    # Contadores de uso de los items
+    usage_flush_interval_seconds: float = Field(default=30.0, validation_alias="USAGE_FLUSH_INTERVAL_SECONDS")
+    usage_max_lag_hits: int = Field(default=10000, validation_alias="USAGE_MAX_LAG_HITS")
+    usage_max_items: int = Field(default=50000, validation_alias="USAGE_MAX_ITEMS")
+    
+    # Puntuación de relevancia
+    scoring_half_life_days: float = Field(default=30.0, validation_alias="SCORING_HALF_LIFE_DAYS")
+    priority_high_percentile: float = Field(default=80.0, validation_alias="PRIORITY_HIGH_PERCENTILE")
+    priority_low_percentile: float = Field(default=20.0, validation_alias="PRIORITY_LOW_PERCENTILE")
+    
+    # Descubrimiento de temas
+    theme_max_clusters: int = Field(default=10, validation_alias="THEME_MAX_CLUSTERS")
+    theme_sample_size: int = Field(default=10000, validation_alias="THEME_SAMPLE_SIZE")
+    theme_assign_batch_size: int = Field(default=4096, validation_alias="THEME_ASSIGN_BATCH_SIZE")
+    theme_model_path: str = Field(default=str(BASE_DIR / "data" / "theme_model.npz"), validation_alias="THEME_MODEL_PATH")
+    theme_update_interval_seconds: float = Field(default=5.0, validation_alias="THEME_UPDATE_INTERVAL_SECONDS")
+    theme_save_interval_seconds: float = Field(default=60.0, validation_alias="THEME_SAVE_INTERVAL_SECONDS")
+    theme_recluster_ratio: float = Field(default=0.5, validation_alias="THEME_RECLUSTER_RATIO")
+    
+    # Grafo de vecinos más cercanos entre módulos
+    knn_graph_dir: str = Field(default=str(BASE_DIR / "data" / "knn_graph"), validation_alias="KNN_GRAPH_DIR")
+    knn_graph_k: int = Field(default=20, validation_alias="KNN_GRAPH_K")
+    knn_graph_update_interval_seconds: float = Field(default=2.0, validation_alias="KNN_GRAPH_UPDATE_INTERVAL_SECONDS")
+    knn_graph_save_interval_seconds: float = Field(default=300.0, validation_alias="KNN_GRAPH_SAVE_INTERVAL_SECONDS")
     
     # Configuración de Airtable
     airtable_api_key: str = Field(default="", validation_alias="AIRTABLE_API_KEY")
@@ -56,11 +111,89 @@ class Settings(BaseSettings):
 def get_settings():
     return Settings()
 
+# Archivo de log (relativo al directorio de trabajo si no es absoluto)
+LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "logs/quark.log")
+
 # Configuración de ChromaDB
 CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", str(BASE_DIR / "data" / "chroma"))
 
 # Configuración de embeddings
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Micro-batching: ventana de espera (ms) y tamaño máximo de cada lote
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+
+# Caché persistente de embeddings (SQLite) con LRU en memoria
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "data" / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+
+# Tamaño de bloque para los cálculos de similitud por matrices
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", "1024"))
+
+# Conexiones entre módulos: memoria máxima (MB) de las teselas de similitud, vecinos
+# considerados por item y enlaces más fuertes que se conservan por par de módulos
+CONNECTION_MEMORY_LIMIT_MB = int(os.getenv("CONNECTION_MEMORY_LIMIT_MB", "256"))
+CONNECTION_TOP_K = int(os.getenv("CONNECTION_TOP_K", "3"))
+CONNECTION_LINKS_PER_PAIR = int(os.getenv("CONNECTION_LINKS_PER_PAIR", "20"))
+
+# Días sin acceso a partir de los cuales un item se sugiere como inactivo
+INACTIVE_AFTER_DAYS = float(os.getenv("INACTIVE_AFTER_DAYS", "1"))
+
+# Instantáneas de los análisis de sugerencias: número máximo guardado, segundos sin escrituras
+# antes de recalcular una instantánea desactualizada e intervalo (s) del hilo de refresco
+SNAPSHOT_MAX_ENTRIES = int(os.getenv("SNAPSHOT_MAX_ENTRIES", "64"))
+SNAPSHOT_SETTLE_SECONDS = float(os.getenv("SNAPSHOT_SETTLE_SECONDS", "10"))
+SNAPSHOT_REFRESH_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL_SECONDS", "5"))
+
+# Tamaño de los lotes en las escrituras masivas (un commit por lote)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+
+# Pools de hilos para lecturas, escrituras y codificación (0 = 4 tareas en vuelo por hilo)
+DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "8"))
+DB_WRITE_WORKERS = int(os.getenv("DB_WRITE_WORKERS", "2"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+POOL_MAX_PENDING = int(os.getenv("POOL_MAX_PENDING", "0"))
+
+# Trabajos en segundo plano (estado persistido en SQLite) y número de trabajos simultáneos
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", str(BASE_DIR / "data" / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+
+# Contadores de uso: intervalo de volcado (s), accesos pendientes que adelantan el volcado
+# y número máximo de items distintos con contador en memoria
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "30"))
+USAGE_MAX_LAG_HITS = int(os.getenv("USAGE_MAX_LAG_HITS", "10000"))
+USAGE_MAX_ITEMS = int(os.getenv("USAGE_MAX_ITEMS", "50000"))
+
+# Puntuación de relevancia: vida media (días) del uso y percentiles de los niveles high/low
+SCORING_HALF_LIFE_DAYS = float(os.getenv("SCORING_HALF_LIFE_DAYS", "30"))
+PRIORITY_HIGH_PERCENTILE = float(os.getenv("PRIORITY_HIGH_PERCENTILE", "80"))
+PRIORITY_LOW_PERCENTILE = float(os.getenv("PRIORITY_LOW_PERCENTILE", "20"))
+
+# Descubrimiento de temas: máximo de temas (k se elige por silueta), tamaño de la muestra
+# de ajuste y tamaño de los lotes al asignar el resto de vectores
+THEME_MAX_CLUSTERS = int(os.getenv("THEME_MAX_CLUSTERS", "10"))
+THEME_SAMPLE_SIZE = int(os.getenv("THEME_SAMPLE_SIZE", "10000"))
+THEME_ASSIGN_BATCH_SIZE = int(os.getenv("THEME_ASSIGN_BATCH_SIZE", "4096"))
+
+# Modelo de temas incremental: archivo donde se persiste, intervalo (s) para aplicar
+# las escrituras pendientes, intervalo (s) mínimo entre guardados en disco y fracción
+# de items escritos desde el último ajuste que dispara un reagrupamiento (0 lo desactiva)
+THEME_MODEL_PATH = os.getenv("THEME_MODEL_PATH", str(BASE_DIR / "data" / "theme_model.npz"))
+THEME_UPDATE_INTERVAL_SECONDS = float(os.getenv("THEME_UPDATE_INTERVAL_SECONDS", "5"))
+THEME_SAVE_INTERVAL_SECONDS = float(os.getenv("THEME_SAVE_INTERVAL_SECONDS", "60"))
+THEME_RECLUSTER_RATIO = float(os.getenv("THEME_RECLUSTER_RATIO", "0.5"))
+
+# Grafo de vecinos más cercanos entre módulos: directorio de los arrays CSR, vecinos por item,
+# intervalo (s) para aplicar las escrituras e intervalo (s) mínimo entre compactaciones en disco
+KNN_GRAPH_DIR = os.getenv("KNN_GRAPH_DIR", str(BASE_DIR / "data" / "knn_graph"))
+KNN_GRAPH_K = int(os.getenv("KNN_GRAPH_K", "20"))
+KNN_GRAPH_UPDATE_INTERVAL_SECONDS = float(os.getenv("KNN_GRAPH_UPDATE_INTERVAL_SECONDS", "2"))
+KNN_GRAPH_SAVE_INTERVAL_SECONDS = float(os.getenv("KNN_GRAPH_SAVE_INTERVAL_SECONDS", "300"))
 
 # Nombres de las colecciones en ChromaDB
 COLLECTIONS = {
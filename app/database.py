@@ -1,8 +1,22 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import chromadb
+from chromadb.api.types import validate_metadata
 from chromadb.config import Settings
 from chromadb.errors import InvalidCollectionException  # Add this import
-from app.config import CHROMA_DB_DIR, COLLECTIONS
-from app.utils.embeddings import get_embedding_function
+from app.config import (
+    CHROMA_DB_DIR, COLLECTIONS, BULK_CHUNK_SIZE,
+    DB_READ_WORKERS, DB_WRITE_WORKERS, EMBEDDING_WORKERS, POOL_MAX_PENDING
+)
+from app.utils.embeddings import get_embedding_function, embedding_service
+from app.utils.executors import BoundedThreadPool
+from app.utils.logger import logger
+from app.utils.similarity import distance_to_similarity, merge_ranked
+from app.utils.timestamps import with_epoch_fields, needs_epoch_fields
 
 class ChromaDBManager:
     """Gestor de conexión y operaciones con ChromaDB."""
@@ -14,6 +28,14 @@ class ChromaDBManager:
             settings=Settings(allow_reset=True)
         )
         self.embedding_function = get_embedding_function()
+        self._count_cache = {}
+        self._write_listeners = []
+        # Versión de los datos de cada colección y momento (monotónico) de su última escritura
+        self._versions = {}
+        self._last_write = {}
+        # Escrituras de cada colección, incluidas las que solo registran uso (invalidan los conteos)
+        self._writes = {}
+        self._versions_lock = threading.Lock()
         self._initialize_collections()
     
     def _initialize_collections(self):
@@ -46,12 +68,14 @@ class ChromaDBManager:
     def add_item(self, collection_key, id, text, metadata=None):
         """Añade un item a una colección."""
         collection = self.get_collection(collection_key)
+        metadata = with_epoch_fields(metadata)
         
         collection.add(
             ids=[id],
             documents=[text],
             metadatas=[metadata or {}]
         )
+        self._after_write(collection_key, "add", [{"id": id, "text": text, "metadata": metadata}])
         
         return {"id": id, "text": text, "metadata": metadata}
     
@@ -84,6 +108,30 @@ class ChromaDBManager:
             "metadata": results["metadatas"][0] if results["metadatas"] else {}
         }
     
+    def get_items(self, collection_key, ids, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Obtiene varios items por ID con una lectura por lote.
+        
+        Retorna un diccionario {id: item} que solo contiene los IDs existentes.
+        """
+        collection = self.get_collection(collection_key)
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        
+        for start in range(0, len(ids), chunk_size):
+            results = collection.get(
+                ids=ids[start:start + chunk_size],
+                include=["documents", "metadatas"]
+            )
+            for i, item_id in enumerate(results["ids"]):
+                found[item_id] = {
+                    "id": item_id,
+                    "text": results["documents"][i],
+                    "metadata": (results["metadatas"][i] or {}) if results["metadatas"] else {}
+                }
+        
+        return found
+    
     def update_item(self, collection_key, id, text=None, metadata=None):
         """Actualiza un item existente."""
         collection = self.get_collection(collection_key)
@@ -95,7 +143,7 @@ class ChromaDBManager:
         
         # Actualizar solo los campos proporcionados
         update_text = text if text is not None else current_item["text"]
-        update_metadata = metadata if metadata is not None else current_item["metadata"]
+        update_metadata = with_epoch_fields(metadata) if metadata is not None else current_item["metadata"]
         
         # Realizar la actualización
         collection.update(
@@ -103,6 +151,7 @@ class ChromaDBManager:
             documents=[update_text],
             metadatas=[update_metadata]
         )
+        self._after_write(collection_key, "update", [{"id": id, "text": update_text, "metadata": update_metadata}])
         
         return {
             "id": id,
@@ -121,29 +170,676 @@ class ChromaDBManager:
         
         # Eliminar el item
         collection.delete(ids=[id])
+        self._after_write(collection_key, "delete", [{"id": id}])
         
         return {"message": f"Item con ID '{id}' eliminado correctamente"}
     
-    def list_items(self, collection_key, limit=100, offset=0):
-        """Lista todos los items de una colección."""
+    @staticmethod
+    def _validate_bulk_items(items, require_text=True):
+        """
+        Valida cada item de una escritura masiva antes de enviarlo a ChromaDB.
+        
+        ChromaDB rechaza el lote completo si un solo item es inválido, así que
+        los errores se detectan aquí por item. Retorna la lista de items
+        válidos como (índice, item) y la lista de errores.
+        """
+        valid = []
+        errors = []
+        seen_ids = set()
+        
+        for index, item in enumerate(items):
+            item_id = item.get("id")
+            try:
+                if not item_id:
+                    raise ValueError("El item no tiene ID")
+                if item_id in seen_ids:
+                    raise ValueError(f"ID '{item_id}' duplicado en la solicitud")
+                if require_text and not item.get("text"):
+                    raise ValueError("El item no tiene texto")
+                if item.get("metadata"):
+                    validate_metadata(item["metadata"])
+            except ValueError as e:
+                errors.append({"index": index, "id": item_id, "error": str(e)})
+                continue
+            
+            seen_ids.add(item_id)
+            valid.append((index, item))
+        
+        return valid, errors
+    
+    @staticmethod
+    def _with_epoch_fields(valid):
+        """Añade los campos `<campo>_ts` a los metadatos de los items válidos de una escritura masiva."""
+        return [
+            (index, {**item, "metadata": with_epoch_fields(item["metadata"])}) if item.get("metadata") else (index, item)
+            for index, item in valid
+        ]
+    
+    def _existing_ids(self, collection, ids):
+        """Retorna el subconjunto de `ids` que ya existe en la colección."""
+        return set(collection.get(ids=ids, include=[])["ids"])
+    
+    def _write_chunks(self, collection_key, event, valid, chunk_size, write_chunk, usage_only=False):
+        """
+        Aplica `write_chunk` a los items válidos por lotes de `chunk_size`.
+        
+        Cada lote se escribe (y confirma) por separado: si un lote falla, sus
+        items se reportan como errores y se continúa con el siguiente.
+        """
+        written = []
+        errors = []
+        
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            try:
+                chunk_written, chunk_errors = write_chunk(chunk)
+                written.extend(chunk_written)
+                errors.extend(chunk_errors)
+            except Exception as e:
+                errors.extend({"index": index, "id": item["id"], "error": str(e)} for index, item in chunk)
+        
+        if written:
+            self._after_write(collection_key, event, [item for _, item in written], usage_only)
+        
+        return written, errors
+    
+    @staticmethod
+    def _bulk_result(total, written, errors):
+        """Construye la respuesta de una escritura masiva, con los errores en orden de entrada."""
+        written.sort(key=lambda entry: entry[0])
+        errors.sort(key=lambda error: error["index"])
+        return {
+            "items": [item for _, item in written],
+            "errors": errors,
+            "total": total,
+            "succeeded": len(written),
+            "failed": len(errors)
+        }
+    
+    def add_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE, usage_only=False):
+        """
+        Añade varios items ({"id", "text", "metadata"}) a una colección.
+        
+        Los textos de cada lote se codifican en una sola llamada al servicio de
+        embeddings y cada lote se escribe en una única transacción. Los items
+        con errores (ID repetido o existente, metadatos inválidos) se reportan
+        individualmente sin detener el resto. `usage_only` marca la escritura
+        como registro de uso (ver `_after_write`).
+        """
+        collection = self.get_collection(collection_key)
+        valid, errors = self._validate_bulk_items(items)
+        valid = self._with_epoch_fields(valid)
+        
+        def write_chunk(chunk):
+            existing = self._existing_ids(collection, [item["id"] for _, item in chunk])
+            chunk_errors = [
+                {"index": index, "id": item["id"], "error": f"Item con ID '{item['id']}' ya existe"}
+                for index, item in chunk if item["id"] in existing
+            ]
+            chunk = [(index, item) for index, item in chunk if item["id"] not in existing]
+            if not chunk:
+                return [], chunk_errors
+            
+            collection.add(
+                ids=[item["id"] for _, item in chunk],
+                documents=[item["text"] for _, item in chunk],
+                embeddings=self.embedding_function([item["text"] for _, item in chunk]),
+                metadatas=[item.get("metadata") or None for _, item in chunk]
+            )
+            written = [
+                (index, {"id": item["id"], "text": item["text"], "metadata": item.get("metadata")})
+                for index, item in chunk
+            ]
+            return written, chunk_errors
+        
+        written, chunk_errors = self._write_chunks(collection_key, "add", valid, chunk_size, write_chunk, usage_only)
+        return self._bulk_result(len(items), written, errors + chunk_errors)
+    
+    def upsert_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Inserta o reemplaza varios items ({"id", "text", "metadata"}) en una colección.
+        
+        Igual que `add_items`, pero los IDs existentes se sobrescriben en lugar
+        de reportarse como error.
+        """
+        collection = self.get_collection(collection_key)
+        valid, errors = self._validate_bulk_items(items)
+        valid = self._with_epoch_fields(valid)
+        
+        def write_chunk(chunk):
+            collection.upsert(
+                ids=[item["id"] for _, item in chunk],
+                documents=[item["text"] for _, item in chunk],
+                embeddings=self.embedding_function([item["text"] for _, item in chunk]),
+                metadatas=[item.get("metadata") or None for _, item in chunk]
+            )
+            written = [
+                (index, {"id": item["id"], "text": item["text"], "metadata": item.get("metadata")})
+                for index, item in chunk
+            ]
+            return written, []
+        
+        written, chunk_errors = self._write_chunks(collection_key, "upsert", valid, chunk_size, write_chunk)
+        return self._bulk_result(len(items), written, errors + chunk_errors)
+    
+    def update_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE, merge_metadata=False, usage_only=False):
+        """
+        Actualiza varios items existentes ({"id", "text"?, "metadata"?}).
+        
+        Como en `update_item`, solo se sustituyen los campos proporcionados.
+        Solo se vuelven a codificar los items cuyo texto cambia; las
+        actualizaciones de metadatos no recalculan embeddings.
+        
+        Con `merge_metadata` los metadatos de cada item son un parche que se
+        combina con los guardados, releídos justo antes de escribir, y cada
+        item puede indicar `increments` ({campo: delta}) que se suman al valor
+        guardado. Así una actualización parcial no sobrescribe los cambios
+        hechos por otras escrituras desde que se leyó el item. `usage_only`
+        marca la escritura como registro de uso (ver `_after_write`).
+        """
+        collection = self.get_collection(collection_key)
+        valid, errors = self._validate_bulk_items(items, require_text=False)
+        valid = self._with_epoch_fields(valid)
+        
+        def write_chunk(chunk):
+            current = collection.get(
+                ids=[item["id"] for _, item in chunk],
+                include=["documents", "metadatas"]
+            )
+            stored = {
+                item_id: (current["documents"][i], current["metadatas"][i] or {})
+                for i, item_id in enumerate(current["ids"])
+            }
+            
+            chunk_errors = []
+            text_changes = []
+            metadata_changes = []
+            written = []
+            for index, item in chunk:
+                if item["id"] not in stored:
+                    chunk_errors.append({"index": index, "id": item["id"], "error": f"Item con ID '{item['id']}' no encontrado"})
+                    continue
+                
+                current_text, current_metadata = stored[item["id"]]
+                text = item["text"] if item.get("text") is not None else current_text
+                if merge_metadata:
+                    metadata = {**current_metadata, **(item.get("metadata") or {})}
+                    for field, delta in (item.get("increments") or {}).items():
+                        metadata[field] = (metadata.get(field) or 0) + delta
+                else:
+                    metadata = item["metadata"] if item.get("metadata") is not None else current_metadata
+                
+                if text != current_text:
+                    text_changes.append((item["id"], text, metadata))
+                else:
+                    metadata_changes.append((item["id"], metadata))
+                written.append((index, {"id": item["id"], "text": text, "metadata": metadata}))
+            
+            if text_changes:
+                collection.update(
+                    ids=[item_id for item_id, _, _ in text_changes],
+                    documents=[text for _, text, _ in text_changes],
+                    embeddings=self.embedding_function([text for _, text, _ in text_changes]),
+                    metadatas=[metadata or None for _, _, metadata in text_changes]
+                )
+            metadata_changes = [(item_id, metadata) for item_id, metadata in metadata_changes if metadata]
+            if metadata_changes:
+                collection.update(
+                    ids=[item_id for item_id, _ in metadata_changes],
+                    metadatas=[metadata for _, metadata in metadata_changes]
+                )
+            
+            return written, chunk_errors
+        
+        written, chunk_errors = self._write_chunks(collection_key, "update", valid, chunk_size, write_chunk, usage_only)
+        return self._bulk_result(len(items), written, errors + chunk_errors)
+    
+    def delete_items(self, collection_key, ids, chunk_size=BULK_CHUNK_SIZE):
+        """Elimina varios items por ID, reportando los que no existen."""
+        collection = self.get_collection(collection_key)
+        valid, errors = self._validate_bulk_items([{"id": item_id} for item_id in ids], require_text=False)
+        
+        def write_chunk(chunk):
+            existing = self._existing_ids(collection, [item["id"] for _, item in chunk])
+            chunk_errors = [
+                {"index": index, "id": item["id"], "error": f"Item con ID '{item['id']}' no encontrado"}
+                for index, item in chunk if item["id"] not in existing
+            ]
+            chunk = [(index, item) for index, item in chunk if item["id"] in existing]
+            if chunk:
+                collection.delete(ids=[item["id"] for _, item in chunk])
+            return [(index, {"id": item["id"]}) for index, item in chunk], chunk_errors
+        
+        written, chunk_errors = self._write_chunks(collection_key, "delete", valid, chunk_size, write_chunk)
+        return self._bulk_result(len(ids), written, errors + chunk_errors)
+    
+    def get_item_embeddings(self, collection_key, items, chunk_size=1000):
+        """
+        Obtiene un embedding por item, en el mismo orden que `items`.
+        
+        Reutiliza los vectores ya almacenados en ChromaDB y solo codifica,
+        en una única llamada al modelo, los items que no tienen embedding.
+        """
+        collection = self.get_collection(collection_key)
+        ids = [item["id"] for item in items]
+        
+        # Recuperar los embeddings almacenados por lotes de IDs
+        stored = {}
+        for start in range(0, len(ids), chunk_size):
+            results = collection.get(
+                ids=ids[start:start + chunk_size],
+                include=["embeddings"]
+            )
+            for item_id, embedding in zip(results["ids"], results["embeddings"] or []):
+                if embedding is not None:
+                    stored[item_id] = embedding
+        
+        # Codificar los items sin embedding almacenado
+        missing = [item for item in items if item["id"] not in stored]
+        if missing:
+            encoded = self.embedding_function([item["text"] for item in missing])
+            for item, embedding in zip(missing, encoded):
+                stored[item["id"]] = embedding
+        
+        return [stored[item_id] for item_id in ids]
+    
+    def query_neighbors(self, collection_key, embeddings, n_results=10, batch_size=256):
+        """
+        Busca los vecinos más cercanos de varios embeddings en el índice HNSW de la colección.
+        
+        Las consultas se envían por lotes mediante `query_embeddings`, sin volver
+        a codificar texto. Retorna, para cada embedding, una lista de (id, similitud).
+        """
+        collection = self.get_collection(collection_key)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        
+        # ChromaDB no admite pedir más vecinos que items hay en la colección
+        n_results = min(n_results, collection.count())
+        if n_results == 0:
+            return [[] for _ in embeddings]
+        
+        neighbors = []
+        for start in range(0, len(embeddings), batch_size):
+            batch = [[float(value) for value in embedding] for embedding in embeddings[start:start + batch_size]]
+            results = collection.query(
+                query_embeddings=batch,
+                n_results=n_results,
+                include=["distances"]
+            )
+            
+            for ids, distances in zip(results["ids"], results["distances"]):
+                neighbors.append(list(zip(ids, distance_to_similarity(distances, space))))
+        
+        return neighbors
+    
+    def query_by_embedding(self, collection_key, query_embedding, n_results=5, filter=None):
+        """
+        Consulta una colección con un embedding ya calculado.
+        
+        Retorna los resultados como una lista de diccionarios ordenada por
+        distancia ascendente, con la colección de origen en cada resultado.
+        """
+        collection = self.get_collection(collection_key)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        
+        # ChromaDB no admite pedir más resultados que items hay en la colección
+        n_results = min(n_results, collection.count())
+        if n_results == 0:
+            return []
+        
+        results = collection.query(
+            query_embeddings=[[float(value) for value in query_embedding]],
+            n_results=n_results,
+            where=filter,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        distances = results["distances"][0]
+        similarities = distance_to_similarity(distances, space)
+        
+        return [
+            {
+                "collection": collection_key,
+                "id": item_id,
+                "text": results["documents"][0][i],
+                "metadata": (results["metadatas"][0][i] or {}) if results["metadatas"] else {},
+                "distance": distances[i],
+                "similarity": similarities[i]
+            }
+            for i, item_id in enumerate(results["ids"][0])
+        ]
+    
+    def query_many(self, collection_keys, query_text, n_results=5, filter=None, limit=None, executor=None):
+        """
+        Consulta varias colecciones con el mismo texto, codificándolo una sola vez.
+        
+        El embedding de la consulta se envía a todas las colecciones en paralelo
+        y sus top-k se mezclan en una lista ordenada globalmente. Retorna
+        `{"items": [...], "errors": {colección: mensaje}}`; un error en una
+        colección no impide obtener los resultados de las demás.
+        """
+        query_embedding = self.embedding_function([query_text])[0]
+        
+        def run_query(collection_key):
+            try:
+                return self.query_by_embedding(collection_key, query_embedding, n_results, filter), None
+            except Exception as e:
+                return [], str(e)
+        
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=max(len(collection_keys), 1)) as local_executor:
+                outcomes = list(local_executor.map(run_query, collection_keys))
+        else:
+            outcomes = list(executor.map(run_query, collection_keys))
+        
+        errors = {key: error for key, (_, error) in zip(collection_keys, outcomes) if error}
+        return {
+            "items": merge_ranked([hits for hits, _ in outcomes], limit),
+            "errors": errors
+        }
+    
+    def list_items(self, collection_key, limit=100, offset=0, where=None,
+                   include_documents=True, include_embeddings=False):
+        """
+        Lista los items de una colección paginando directamente en ChromaDB.
+        
+        `limit=None` retorna todos los items. Los documentos pueden omitirse
+        cuando no se necesitan y los embeddings solo se cargan si se solicitan.
+        """
         collection = self.get_collection(collection_key)
         
-        # Obtener todos los items
-        results = collection.get()
+        include = ["metadatas"]
+        if include_documents:
+            include.append("documents")
+        if include_embeddings:
+            include.append("embeddings")
         
-        # Aplicar paginación
-        start_idx = min(offset, len(results["ids"]) if results["ids"] else 0)
-        end_idx = min(start_idx + limit, len(results["ids"]) if results["ids"] else 0)
+        # ChromaDB aplica el filtro y la paginación sin cargar toda la colección
+        results = collection.get(
+            where=where,
+            limit=limit,
+            offset=offset or None,
+            include=include
+        )
         
         items = []
-        for i in range(start_idx, end_idx):
-            items.append({
-                "id": results["ids"][i],
-                "text": results["documents"][i],
-                "metadata": results["metadatas"][i] if results["metadatas"] else {}
-            })
+        for i, item_id in enumerate(results["ids"]):
+            item = {
+                "id": item_id,
+                "metadata": (results["metadatas"][i] or {}) if results["metadatas"] else {}
+            }
+            if include_documents:
+                item["text"] = results["documents"][i]
+            if include_embeddings:
+                item["embedding"] = results["embeddings"][i]
+            items.append(item)
         
         return items
+    
+    def backfill_epoch_fields(self, collection_key, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Migración: añade los campos `<campo>_ts` a los items que aún no los tienen.
+        
+        Recorre la colección por páginas leyendo solo los metadatos y
+        actualiza (sin recalcular embeddings) los items cuyos campos epoch
+        faltan o no coinciden con la fecha ISO. Es idempotente.
+        """
+        scanned = 0
+        updated = 0
+        errors = []
+        
+        while True:
+            page = self.list_items(collection_key, limit=chunk_size, offset=scanned, include_documents=False)
+            if not page:
+                break
+            scanned += len(page)
+            
+            pending = [
+                {"id": item["id"], "metadata": item["metadata"]}
+                for item in page if needs_epoch_fields(item["metadata"])
+            ]
+            if pending:
+                result = self.update_items(collection_key, pending, chunk_size)
+                updated += result["succeeded"]
+                errors.extend(result["errors"])
+        
+        return {"scanned": scanned, "updated": updated, "errors": errors}
+    
+    def count_items(self, collection_key, where=None):
+        """
+        Cuenta los items de una colección, opcionalmente bajo un filtro.
+        
+        El resultado se guarda en caché por colección y filtro junto con la
+        versión de la colección leída antes de contar; solo se sirve mientras
+        esa versión no cambie. Un conteo que coincide con una escritura
+        concurrente no se guarda.
+        
+        ChromaDB no cuenta bajo un filtro: el conteo filtrado recupera todos
+        los IDs que cumplen el filtro (sin documentos ni metadatos), así que
+        su coste crece con el número de coincidencias.
+        """
+        where_key = json.dumps(where, sort_keys=True) if where else ""
+        with self._versions_lock:
+            version = self._writes.get(collection_key, 0)
+            cached = self._count_cache.get(collection_key, {}).get(where_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        collection = self.get_collection(collection_key)
+        if where:
+            # Solo se recuperan los IDs, sin documentos ni metadatos
+            total = len(collection.get(where=where, include=[])["ids"])
+        else:
+            total = collection.count()
+        
+        with self._versions_lock:
+            if self._writes.get(collection_key, 0) == version:
+                self._count_cache.setdefault(collection_key, {})[where_key] = (version, total)
+        return total
+    
+    def _invalidate_counts(self, collection_key):
+        """Descarta los conteos en caché de una colección tras una escritura."""
+        with self._versions_lock:
+            self._count_cache.pop(collection_key, None)
+    
+    def add_write_listener(self, listener):
+        """
+        Registra una función `listener(collection_key, event, items)` que se llama tras cada escritura.
+        
+        `event` es "add", "upsert", "update" o "delete" e `items` la lista de
+        items escritos ({"id", "text", "metadata"}; solo {"id"} al eliminar).
+        Permite mantener índices en memoria coherentes con ChromaDB.
+        """
+        self._write_listeners.append(listener)
+    
+    def data_versions(self, collection_keys):
+        """
+        Retorna {colección: versión} para las colecciones dadas.
+        
+        La versión de una colección se incrementa con cada escritura a través
+        del gestor, salvo las que solo registran uso, de modo que un resultado
+        calculado con unas versiones sigue siendo válido mientras estas no
+        cambien.
+        """
+        with self._versions_lock:
+            return {key: self._versions.get(key, 0) for key in collection_keys}
+    
+    def seconds_since_write(self, collection_keys):
+        """Segundos desde la última escritura en cualquiera de las colecciones (infinito si no hubo ninguna)."""
+        with self._versions_lock:
+            last = max((self._last_write.get(key, float("-inf")) for key in collection_keys), default=float("-inf"))
+        return time.monotonic() - last
+    
+    def _after_write(self, collection_key, event, items, usage_only=False):
+        """
+        Incrementa la versión de la colección, invalida los conteos en caché y notifica la escritura a los listeners.
+        
+        Las escrituras `usage_only` (contadores de uso volcados por
+        `UsageTracker`) no cuentan como cambio de datos: no incrementan la
+        versión ni reinician `seconds_since_write`, aunque sí invalidan los
+        conteos y se notifican a los listeners.
+        """
+        with self._versions_lock:
+            self._writes[collection_key] = self._writes.get(collection_key, 0) + 1
+            if not usage_only:
+                self._versions[collection_key] = self._versions.get(collection_key, 0) + 1
+                self._last_write[collection_key] = time.monotonic()
+        self._invalidate_counts(collection_key)
+        for listener in self._write_listeners:
+            try:
+                listener(collection_key, event, items)
+            except Exception as e:
+                # La escritura ya se confirmó; un listener no debe hacerla fallar
+                logger.error(f"Error en listener de escritura: {str(e)}", {
+                    "collection": collection_key,
+                    "event": event
+                })
+
+class AsyncChromaDBManager:
+    """
+    Fachada asíncrona sobre `ChromaDBManager` para los endpoints `async def`.
+    
+    Cada operación bloqueante se ejecuta en un pool de hilos acotado según su
+    tipo (lecturas, escrituras o codificación con el modelo), de modo que una
+    consulta lenta o una codificación larga no congelan el bucle de eventos.
+    Los pools tienen tamaños independientes para que las escrituras y las
+    codificaciones no dejen sin hilos a las lecturas.
+    """
+    
+    def __init__(self, manager, read_workers=DB_READ_WORKERS, write_workers=DB_WRITE_WORKERS,
+                 embed_workers=EMBEDDING_WORKERS, max_pending=POOL_MAX_PENDING):
+        """Crea los pools de hilos sobre un gestor síncrono existente."""
+        self.manager = manager
+        self.read_pool = BoundedThreadPool("read", read_workers, max_pending)
+        self.write_pool = BoundedThreadPool("write", write_workers, max_pending)
+        self.embed_pool = BoundedThreadPool("embed", embed_workers, max_pending)
+    
+    @property
+    def collections(self):
+        """Colecciones disponibles en el gestor subyacente."""
+        return self.manager.collections
+    
+    def get_collection(self, collection_key):
+        """Obtiene una colección por su clave (no bloqueante)."""
+        return self.manager.get_collection(collection_key)
+    
+    async def add_item(self, collection_key, id, text, metadata=None):
+        """Añade un item a una colección en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.add_item, collection_key, id, text, metadata)
+    
+    async def update_item(self, collection_key, id, text=None, metadata=None):
+        """Actualiza un item existente en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.update_item, collection_key, id, text, metadata)
+    
+    async def delete_item(self, collection_key, id):
+        """Elimina un item por su ID en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.delete_item, collection_key, id)
+    
+    async def add_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE, usage_only=False):
+        """Añade varios items en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.add_items, collection_key, items, chunk_size, usage_only)
+    
+    async def upsert_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE):
+        """Inserta o reemplaza varios items en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.upsert_items, collection_key, items, chunk_size)
+    
+    async def update_items(self, collection_key, items, chunk_size=BULK_CHUNK_SIZE, merge_metadata=False, usage_only=False):
+        """Actualiza varios items en el pool de escrituras."""
+        return await self.write_pool.run(
+            self.manager.update_items, collection_key, items, chunk_size, merge_metadata, usage_only
+        )
+    
+    async def delete_items(self, collection_key, ids, chunk_size=BULK_CHUNK_SIZE):
+        """Elimina varios items en el pool de escrituras."""
+        return await self.write_pool.run(self.manager.delete_items, collection_key, ids, chunk_size)
+    
+    async def get_item(self, collection_key, id):
+        """Obtiene un item por su ID en el pool de lecturas."""
+        return await self.read_pool.run(self.manager.get_item, collection_key, id)
+    
+    async def get_items(self, collection_key, ids, chunk_size=BULK_CHUNK_SIZE):
+        """Obtiene varios items por ID en el pool de lecturas."""
+        return await self.read_pool.run(self.manager.get_items, collection_key, ids, chunk_size)
+    
+    async def query_items(self, collection_key, query_text, n_results=5, filter=None):
+        """Consulta por similitud semántica en el pool de lecturas."""
+        return await self.read_pool.run(self.manager.query_items, collection_key, query_text, n_results, filter)
+    
+    async def list_items(self, collection_key, limit=100, offset=0, where=None,
+                         include_documents=True, include_embeddings=False):
+        """Lista items de una colección en el pool de lecturas."""
+        return await self.read_pool.run(
+            self.manager.list_items, collection_key, limit=limit, offset=offset, where=where,
+            include_documents=include_documents, include_embeddings=include_embeddings
+        )
+    
+    async def count_items(self, collection_key, where=None):
+        """Cuenta items de una colección en el pool de lecturas."""
+        return await self.read_pool.run(self.manager.count_items, collection_key, where)
+    
+    async def get_item_embeddings(self, collection_key, items, chunk_size=1000):
+        """Obtiene los embeddings de varios items en el pool de codificación."""
+        return await self.embed_pool.run(self.manager.get_item_embeddings, collection_key, items, chunk_size)
+    
+    async def query_neighbors(self, collection_key, embeddings, n_results=10, batch_size=256):
+        """Busca vecinos en el índice HNSW en el pool de lecturas."""
+        return await self.read_pool.run(self.manager.query_neighbors, collection_key, embeddings, n_results, batch_size)
+    
+    async def query_many(self, collection_keys, query_text, n_results=5, filter=None, limit=None):
+        """
+        Consulta varias colecciones codificando el texto una sola vez.
+        
+        La consulta se codifica con el servicio de micro-batching y las
+        colecciones se consultan en paralelo en el pool de lecturas; los
+        resultados se mezclan con `merge_ranked`.
+        """
+        query_embedding = await self.encode(query_text)
+        outcomes = await asyncio.gather(
+            *(
+                self.read_pool.run(self.manager.query_by_embedding, collection_key, query_embedding, n_results, filter)
+                for collection_key in collection_keys
+            ),
+            return_exceptions=True
+        )
+        
+        ranked_lists = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        errors = {
+            collection_key: str(outcome)
+            for collection_key, outcome in zip(collection_keys, outcomes)
+            if isinstance(outcome, Exception)
+        }
+        return {
+            "items": merge_ranked(ranked_lists, limit),
+            "errors": errors
+        }
+    
+    async def encode(self, texts):
+        """
+        Codifica uno o varios textos a través del servicio de micro-batching.
+        
+        No ocupa ningún hilo mientras espera: el lote se codifica en el hilo
+        del servicio y el resultado se recibe como un futuro.
+        """
+        if isinstance(texts, str):
+            return (await asyncio.wrap_future(embedding_service.submit([texts])))[0]
+        
+        return await asyncio.wrap_future(embedding_service.submit(texts))
+    
+    def metrics(self):
+        """Retorna la saturación de cada pool de hilos."""
+        return {
+            "read": self.read_pool.metrics(),
+            "write": self.write_pool.metrics(),
+            "embed": self.embed_pool.metrics()
+        }
+    
+    def shutdown(self):
+        """Detiene los pools de hilos."""
+        for pool in (self.read_pool, self.write_pool, self.embed_pool):
+            pool.shutdown(wait=False)
 
 # Instancia global del gestor de ChromaDB
-db_manager = ChromaDBManager()
\ No newline at end of file
+db_manager = ChromaDBManager()
+
+# Fachada asíncrona para los endpoints
+async_db_manager = AsyncChromaDBManager(db_manager)
\ No newline at end of file
@@ -7,12 +7,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.config import API_TITLE, API_DESCRIPTION, API_VERSION, get_settings
+from app.config import API_TITLE, API_DESCRIPTION, API_VERSION, EMBEDDING_WARMUP, get_settings
 from app.utils.logger import LoggingMiddleware, logger
+from app.utils.embeddings import model_registry, embedding_service
+from app.database import async_db_manager
+from app.utils.priority_index import priority_index
+from app.utils.connection_graph import connection_graph
+from app.utils.jobs import job_manager
+from app.utils.usage_tracker import usage_tracker
+from app.utils.theme_model import theme_model
+from app.utils.snapshots import snapshot_cache
+from app.utils.knn_graph import knn_graph
 
 # Verificar importaciones de módulos
 try:
-    from app.modules import identity, business, reminders, connections, learnings, priorities, suggestions, airtable, sofia
+    from app.modules import identity, business, reminders, connections, learnings, priorities, suggestions, airtable, sofia, jobs
 except ImportError as e:
     logger.critical(f"Error al importar módulos: {e}")
     sys.exit(1)
@@ -73,6 +82,120 @@ app.include_router(airtable.router)
 # Módulo de integración con SofIA
 app.include_router(sofia.router)
 
+# Trabajos en segundo plano para los análisis largos
+app.include_router(jobs.router)
+
+# Precarga del modelo de embeddings
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    """
+    Carga el modelo de embeddings compartido antes de atender peticiones.
+    """
+    if not EMBEDDING_WARMUP:
+        return
+    
+    try:
+        metrics = model_registry.warm_up()
+        logger.info("Modelo de embeddings precargado", metrics)
+    except Exception as e:
+        # El modelo se cargará de forma perezosa en la primera petición
+        logger.warning(f"No se pudo precargar el modelo de embeddings: {str(e)}")
+
+# Carga del índice de registros de prioridad
+@app.on_event("startup")
+async def load_priority_index():
+    """
+    Carga el índice de prioridades antes de atender peticiones.
+    """
+    try:
+        await async_db_manager.read_pool.run(priority_index.load)
+        logger.info("Índice de prioridades cargado", {"records": len(priority_index)})
+    except Exception as e:
+        # El índice se cargará de forma perezosa en la primera consulta
+        logger.warning(f"No se pudo cargar el índice de prioridades: {str(e)}")
+
+# Carga del índice de adyacencia de las conexiones
+@app.on_event("startup")
+async def load_connection_graph():
+    """
+    Carga el índice de conexiones antes de atender peticiones.
+    """
+    try:
+        await async_db_manager.read_pool.run(connection_graph.load)
+        logger.info("Índice de conexiones cargado", connection_graph.metrics())
+    except Exception as e:
+        # El índice se cargará de forma perezosa en la primera consulta
+        logger.warning(f"No se pudo cargar el índice de conexiones: {str(e)}")
+
+# Reanudar los trabajos pendientes o interrumpidos por un reinicio
+@app.on_event("startup")
+async def recover_jobs():
+    """
+    Vuelve a encolar los trabajos en segundo plano que no terminaron.
+    """
+    try:
+        recovered = job_manager.recover()
+        if recovered:
+            logger.info("Trabajos en segundo plano reanudados", {"jobs": recovered})
+    except Exception as e:
+        logger.warning(f"No se pudieron reanudar los trabajos en segundo plano: {str(e)}")
+
+# Volcado periódico de los contadores de uso
+@app.on_event("startup")
+async def start_usage_tracker():
+    """
+    Arranca el hilo que vuelca los contadores de uso a la colección de prioridades.
+    """
+    usage_tracker.start()
+
+# Actualización incremental del modelo de temas
+@app.on_event("startup")
+async def start_theme_model():
+    """
+    Carga el modelo de temas guardado y arranca el hilo que lo actualiza con las escrituras
+    (y que lo ajusta en segundo plano si no hay ninguno guardado o el corpus ha cambiado mucho).
+    """
+    await async_db_manager.read_pool.run(theme_model.start)
+    logger.info("Modelo de temas iniciado", theme_model.metrics())
+
+# Grafo de vecinos más cercanos entre módulos
+@app.on_event("startup")
+async def start_knn_graph():
+    """
+    Abre el grafo kNN guardado y arranca el hilo que lo actualiza con las escrituras
+    (y que lo construye en segundo plano si no hay ninguno guardado).
+    """
+    await async_db_manager.read_pool.run(knn_graph.start)
+    logger.info("Grafo de vecinos iniciado", knn_graph.metrics())
+
+# Recalcular en segundo plano las instantáneas de sugerencias desactualizadas
+@app.on_event("startup")
+async def start_snapshot_refresher():
+    """
+    Arranca el hilo que recalcula las instantáneas de sugerencias tras las escrituras.
+    """
+    snapshot_cache.start()
+
+# Liberar los pools de hilos al detener la aplicación
+@app.on_event("shutdown")
+async def shutdown_thread_pools():
+    """
+    Detiene los pools de hilos usados para el trabajo bloqueante.
+    """
+    # Volcar los accesos pendientes antes de detener los pools
+    snapshot_cache.stop()
+    usage_tracker.stop()
+    try:
+        theme_model.stop()
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el modelo de temas: {str(e)}")
+    try:
+        knn_graph.stop()
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el grafo de vecinos: {str(e)}")
+    async_db_manager.shutdown()
+    job_manager.shutdown()
+
 # Endpoint para autenticación
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -130,10 +253,29 @@ async def root():
             {"name": "Priorización y Filtrado", "endpoint": "/priorities"},
             {"name": "Sugerencias Inteligentes", "endpoint": "/suggestions"},
             {"name": "Integración con Airtable", "endpoint": "/airtable"},
-            {"name": "Integración con SofIA", "endpoint": "/sofia"}
+            {"name": "Integración con SofIA", "endpoint": "/sofia"},
+            {"name": "Trabajos en segundo plano", "endpoint": "/trabajos"}
         ]
     }
 
+# Métricas de rendimiento
+@app.get("/metrics")
+async def metrics():
+    """
+    Proporciona métricas internas de rendimiento de la API.
+    """
+    return {
+        "embedding_model": model_registry.metrics(),
+        "embedding_service": embedding_service.metrics(),
+        "thread_pools": async_db_manager.metrics(),
+        "jobs": job_manager.metrics(),
+        "usage_tracker": usage_tracker.metrics(),
+        "theme_model": theme_model.metrics(),
+        "snapshots": snapshot_cache.metrics(),
+        "knn_graph": knn_graph.metrics(),
+        "connection_graph": connection_graph.metrics()
+    }
+
 # Endpoint protegido para verificar autenticación
 @app.get("/check-auth")
 async def check_auth(user = Depends(validate_access)):
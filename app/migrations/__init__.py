@@ -0,0 +1 @@
+# Paquete migrations 
\ No newline at end of file
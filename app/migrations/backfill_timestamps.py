@@ -0,0 +1,30 @@
+"""
+Migración: añade `updated_at_ts` y `last_accessed_ts` (segundos epoch) a los
+items guardados antes de que la API escribiera estos campos.
+
+Las consultas por rango de fechas (por ejemplo, los items inactivos en
+/sugerencias/obtener) filtran por estos campos numéricos, así que los
+registros antiguos no aparecen hasta ejecutar la migración. Es idempotente.
+
+Uso:
+    python -m app.migrations.backfill_timestamps
+    python -m app.migrations.backfill_timestamps --collections priorities identity
+"""
+import argparse
+
+from app.config import COLLECTIONS
+from app.database import db_manager
+
+def main():
+    parser = argparse.ArgumentParser(description="Añade los campos de fecha epoch a los items existentes")
+    parser.add_argument("--collections", nargs="+", choices=sorted(COLLECTIONS), default=list(COLLECTIONS))
+    args = parser.parse_args()
+
+    for collection_key in args.collections:
+        result = db_manager.backfill_epoch_fields(collection_key)
+        print(f"{collection_key}: {result['scanned']} items revisados, {result['updated']} actualizados, {len(result['errors'])} errores")
+        for error in result["errors"][:10]:
+            print(f"  - {error['id']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Migración: fusiona las conexiones duplicadas guardadas antes de que
+/conexiones/analizar usara IDs deterministas.
+
+Cada análisis creaba conexiones nuevas con IDs aleatorios, así que analizar
+dos veces el mismo item duplicaba sus conexiones. La migración deja una sola
+conexión por par (source_module, source_id, target_module, target_id) con su
+ID determinista. Es idempotente.
+
+Uso:
+    python -m app.migrations.compact_connections
+"""
+from app.database import db_manager
+from app.modules.connections import compact_connections
+
+def main():
+    result = compact_connections(db_manager)
+    print(
+        f"connections: {result['scanned']} conexiones revisadas, {result['pairs']} pares, "
+        f"{result['upserted']} reescritas, {result['deleted']} eliminadas, "
+        f"{result['skipped']} sin origen/destino, {len(result['errors'])} errores"
+    )
+    for error in result["errors"][:10]:
+        print(f"  - {error['id']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
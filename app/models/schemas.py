@@ -35,6 +35,20 @@ class QueryResult(BaseModel):
     items: List[Item] = Field(..., description="Items encontrados")
     distances: List[float] = Field(..., description="Distancias de similitud (menor es más similar)")
 
+class BulkItemError(BaseModel):
+    """Esquema para representar el error de un item en una escritura masiva."""
+    index: int = Field(..., description="Posición del item en la solicitud")
+    id: Optional[str] = Field(None, description="Identificador del item, si se conoce")
+    error: str = Field(..., description="Descripción del error")
+
+class BulkWriteResult(BaseModel):
+    """Esquema para representar el resultado de una escritura masiva."""
+    items: List[Item] = Field(..., description="Items escritos correctamente")
+    errors: List[BulkItemError] = Field(default_factory=list, description="Errores por item")
+    total: int = Field(..., description="Número de items en la solicitud")
+    succeeded: int = Field(..., description="Número de items escritos correctamente")
+    failed: int = Field(..., description="Número de items con error")
+
 # Esquemas específicos para cada módulo
 
 # Módulo de Identidad y Psicología
@@ -53,6 +67,10 @@ class IdentityItemUpdate(ItemUpdate):
     """Esquema para actualizar un item en el módulo de Identidad y Psicología."""
     pass
 
+class IdentityBulkCreate(BaseModel):
+    """Esquema para crear varios items en el módulo de Identidad y Psicología."""
+    items: List[IdentityItemCreate] = Field(..., min_length=1, description="Items a crear")
+
 # Módulo de Negocios y Estrategia
 class BusinessItemCreate(ItemCreate):
     """Esquema para crear un item en el módulo de Negocios y Estrategia."""
@@ -71,6 +89,10 @@ class BusinessItemUpdate(ItemUpdate):
     """Esquema para actualizar un item en el módulo de Negocios y Estrategia."""
     pass
 
+class BusinessBulkCreate(BaseModel):
+    """Esquema para crear varios items en el módulo de Negocios y Estrategia."""
+    items: List[BusinessItemCreate] = Field(..., min_length=1, description="Items a crear")
+
 # Módulo de Recordatorios y URLs
 class ReminderItemCreate(ItemCreate):
     """Esquema para crear un item en el módulo de Recordatorios y URLs."""
@@ -91,6 +113,10 @@ class ReminderItemUpdate(ItemUpdate):
     """Esquema para actualizar un item en el módulo de Recordatorios y URLs."""
     pass
 
+class ReminderBulkCreate(BaseModel):
+    """Esquema para crear varios recordatorios."""
+    items: List[ReminderItemCreate] = Field(..., min_length=1, description="Recordatorios a crear")
+
 # Módulo de Conexiones Inteligentes
 class ConnectionItemCreate(ItemCreate):
     """Esquema para crear un item en el módulo de Conexiones Inteligentes."""
@@ -117,7 +143,7 @@ class ConnectionAnalysisRequest(BaseModel):
     item_id: str = Field(..., description="ID del item a analizar")
     module: str = Field(..., description="Módulo al que pertenece el item")
     min_similarity: float = Field(0.7, ge=0.0, le=1.0, description="Similitud mínima para considerar una conexión")
-    max_connections: int = Field(5, ge=1, le=20, description="Número máximo de conexiones a retornar")
+    max_connections: int = Field(5, ge=1, le=20, description="Número máximo de conexiones a retornar por módulo")
 
 class ConnectionAnalysisResult(BaseModel):
     """Esquema para representar el resultado de un análisis de conexiones."""
@@ -126,6 +152,30 @@ class ConnectionAnalysisResult(BaseModel):
     connections: List[Item] = Field(..., description="Conexiones encontradas")
     total: int = Field(..., description="Número total de conexiones encontradas")
 
+class GraphNode(BaseModel):
+    """Esquema para representar un item como nodo del grafo de conexiones."""
+    id: str = Field(..., description="ID del item")
+    module: str = Field(..., description="Módulo al que pertenece el item")
+
+class GraphTraversalHit(GraphNode):
+    """Esquema para representar un item alcanzado en un recorrido del grafo."""
+    depth: int = Field(..., description="Número de saltos del camino más fuerte")
+    score: float = Field(..., description="Producto de las fuerzas de las conexiones del camino")
+    path: List[GraphNode] = Field(..., description="Camino desde el item de origen, ambos incluidos")
+
+class GraphTraversalResult(BaseModel):
+    """Esquema para representar el resultado de un recorrido del grafo de conexiones."""
+    source_id: str = Field(..., description="ID del item de origen")
+    source_module: str = Field(..., description="Módulo del item de origen")
+    items: List[GraphTraversalHit] = Field(..., description="Items alcanzados, de mayor a menor puntuación")
+    total: int = Field(..., description="Número de items retornados")
+
+class GraphPathResult(BaseModel):
+    """Esquema para representar un camino entre dos items del grafo de conexiones."""
+    path: List[GraphNode] = Field(..., description="Items del camino, origen y destino incluidos")
+    hops: int = Field(..., description="Número de conexiones del camino")
+    score: float = Field(..., description="Producto de las fuerzas de las conexiones del camino")
+
 # Módulo de Aprendizajes y Reflexiones
 class LearningItemCreate(ItemCreate):
     """Esquema para crear un item en el módulo de Aprendizajes y Reflexiones."""
@@ -146,6 +196,10 @@ class LearningItemUpdate(ItemUpdate):
     """Esquema para actualizar un item en el módulo de Aprendizajes y Reflexiones."""
     pass
 
+class LearningBulkCreate(BaseModel):
+    """Esquema para guardar varios aprendizajes o reflexiones."""
+    items: List[LearningItemCreate] = Field(..., min_length=1, description="Aprendizajes a guardar")
+
 class LearningSummaryRequest(BaseModel):
     """Esquema para solicitar un resumen de aprendizajes."""
     category: Optional[str] = Field(None, description="Categoría de aprendizajes a resumir")
@@ -190,6 +244,9 @@ class PriorityReviewRequest(BaseModel):
     max_items: int = Field(100, ge=1, description="Número máximo de items a revisar")
     include_low_relevance: bool = Field(True, description="Incluir items con baja relevancia en la revisión")
     include_duplicates: bool = Field(True, description="Incluir posibles duplicados en la revisión")
+    duplicate_mode: str = Field("exact", description="Método de detección de duplicados: 'exact' (todos los pares) o 'ann' (vecinos más cercanos en el índice HNSW)")
+    neighbors: int = Field(10, ge=1, le=100, description="Número de vecinos a consultar por item en el modo 'ann'")
+    cross_module: bool = Field(False, description="Buscar duplicados entre todos los módulos revisados a la vez, no solo dentro de cada módulo")
 
 class PriorityAdjustRequest(BaseModel):
     """Esquema para ajustar la prioridad de un item."""
@@ -203,11 +260,16 @@ class PriorityOptimizeRequest(BaseModel):
     module: Optional[str] = Field(None, description="Módulo específico a optimizar (si no se especifica, se optimizan todos)")
     auto_merge_duplicates: bool = Field(False, description="Fusionar automáticamente duplicados")
     auto_archive_low_relevance: bool = Field(False, description="Archivar automáticamente items con baja relevancia")
+    duplicate_mode: str = Field("exact", description="Método de detección de duplicados: 'exact' (todos los pares) o 'ann' (vecinos más cercanos en el índice HNSW)")
+    neighbors: int = Field(10, ge=1, le=100, description="Número de vecinos a consultar por item en el modo 'ann'")
+    cross_module: bool = Field(False, description="Fusionar duplicados entre módulos distintos")
+    dry_run: bool = Field(False, description="Calcular el plan de cambios sin aplicarlo")
 
 class PriorityReviewResult(BaseModel):
     """Esquema para representar el resultado de una revisión de prioridades."""
     total_items_reviewed: int = Field(..., description="Número total de items revisados")
     potential_duplicates: List[Dict[str, Any]] = Field(..., description="Posibles duplicados encontrados")
+    duplicate_groups: List[Dict[str, Any]] = Field(default_factory=list, description="Grupos de items conectados por duplicados")
     low_relevance_items: List[Dict[str, Any]] = Field(..., description="Items con baja relevancia")
     suggested_actions: List[Dict[str, Any]] = Field(..., description="Acciones sugeridas")
 
@@ -217,6 +279,9 @@ class PriorityOptimizeResult(BaseModel):
     merged_duplicates: List[Dict[str, Any]] = Field(..., description="Duplicados fusionados")
     archived_items: List[Dict[str, Any]] = Field(..., description="Items archivados")
     reprioritized_items: List[Dict[str, Any]] = Field(..., description="Items con prioridad ajustada")
+    dry_run: bool = Field(False, description="Indica si el plan se calculó sin aplicarse")
+    plan: Dict[str, Any] = Field(default_factory=dict, description="Plan de cambios: campos modificados de cada registro y registros de prioridad nuevos")
+    write_errors: List[Dict[str, Any]] = Field(default_factory=list, description="Errores por registro al aplicar el plan")
 
 # Módulo de Sugerencias Inteligentes
 class SuggestionItemCreate(ItemCreate):
@@ -226,10 +291,11 @@ class SuggestionItemCreate(ItemCreate):
             "type": "action",  # action, insight, connection
             "context": "",
             "relevance_score": 0.0,
-            "source_modules": [],
-            "source_items": [],
+            # ChromaDB solo admite valores escalares: las listas se guardan separadas por comas
+            "source_modules": "",
+            "source_items": "",
             "is_implemented": False,
-            "implementation_date": None,
+            "implementation_date": "",
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat()
         },
@@ -259,6 +325,36 @@ class SuggestionResult(BaseModel):
     total: int = Field(..., description="Número total de sugerencias")
     by_type: Dict[str, int] = Field(..., description="Conteo de sugerencias por tipo")
     analysis_summary: str = Field(..., description="Resumen del análisis realizado")
+    cached: bool = Field(False, description="Indica si el resultado es una instantánea de un análisis anterior sobre los mismos datos")
+
+# Trabajos en segundo plano
+class JobCreate(BaseModel):
+    """Esquema para encolar un análisis largo como trabajo en segundo plano."""
+    type: str = Field(..., description="Tipo de trabajo (prioridad.revisar, prioridad.optimizar, sugerencias.obtener, sugerencias.analizar)")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parámetros del endpoint correspondiente")
+
+class JobStatus(BaseModel):
+    """Esquema para representar el estado y el progreso de un trabajo."""
+    id: str = Field(..., description="ID del trabajo")
+    type: str = Field(..., description="Tipo de trabajo")
+    params: Dict[str, Any] = Field(..., description="Parámetros normalizados del trabajo")
+    status: str = Field(..., description="Estado: queued, running, completed o failed")
+    progress: float = Field(..., description="Progreso entre 0 y 1")
+    message: Optional[str] = Field(None, description="Descripción de la etapa en curso")
+    error: Optional[str] = Field(None, description="Error si el trabajo ha fallado")
+    created_at: str = Field(..., description="Fecha de creación")
+    started_at: Optional[str] = Field(None, description="Fecha de inicio")
+    finished_at: Optional[str] = Field(None, description="Fecha de finalización")
+    deduplicated: bool = Field(False, description="Indica si se reutilizó un trabajo idéntico pendiente o en curso")
+
+class JobResult(JobStatus):
+    """Esquema para representar un trabajo terminado junto con su resultado."""
+    result: Optional[Any] = Field(None, description="Resultado del endpoint correspondiente")
+
+class JobList(BaseModel):
+    """Esquema para representar una lista de trabajos."""
+    items: List[JobStatus] = Field(..., description="Lista de trabajos")
+    total: int = Field(..., description="Número total de trabajos que cumplen el filtro")
 
 # Esquemas para respuestas de error
 class ErrorResponse(BaseModel):
@@ -3,7 +3,7 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 import uuid
 
-from app.database import db_manager
+from app.database import async_db_manager
 from app.utils.airtable import airtable_manager
 from app.models.schemas import Item, ItemCreate, ItemUpdate, ItemList
 
@@ -23,7 +23,7 @@ async def sync_to_airtable(
     """
     try:
         # Obtener el item de ChromaDB
-        item = db_manager.get_item(collection_key=collection_key, id=item_id)
+        item = await async_db_manager.get_item(collection_key=collection_key, id=item_id)
         
         if not item:
             raise HTTPException(status_code=404, detail=f"Item con ID '{item_id}' no encontrado en la colección '{collection_key}'")
@@ -57,7 +57,7 @@ async def create_item(
         item_id = str(uuid.uuid4())
         
         # Añadir a ChromaDB
-        chroma_result = db_manager.add_item(
+        chroma_result = await async_db_manager.add_item(
             collection_key=collection_key,
             id=item_id,
             text=item.text,
@@ -145,14 +145,14 @@ async def sync_from_airtable(
             raise HTTPException(status_code=400, detail="El registro de Airtable no contiene un ID de item válido")
         
         # Verificar si el item ya existe en ChromaDB
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=collection_key,
             id=item_data["item_id"]
         )
         
         if existing_item:
             # Actualizar el item existente
-            result = db_manager.update_item(
+            result = await async_db_manager.update_item(
                 collection_key=collection_key,
                 id=item_data["item_id"],
                 text=item_data["text"],
@@ -160,7 +160,7 @@ async def sync_from_airtable(
             )
         else:
             # Crear un nuevo item
-            result = db_manager.add_item(
+            result = await async_db_manager.add_item(
                 collection_key=collection_key,
                 id=item_data["item_id"],
                 text=item_data["text"],
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Depends, Body
 from typing import List, Dict, Optional, Any
 from datetime import datetime
+import uuid
 
-from app.database import db_manager
+from app.config import BULK_CHUNK_SIZE
+from app.database import async_db_manager
+from app.utils.filters import build_where
+from app.utils.knn_graph import knn_graph
+from app.utils.connection_graph import connection_graph
 from app.models.schemas import (
     Item, ConnectionItemCreate, ConnectionItemUpdate, 
     ConnectionAnalysisRequest, ConnectionAnalysisResult,
-    ItemList, QueryResult, generate_id
+    GraphTraversalResult, GraphPathResult,
+    ItemList, QueryResult
 )
-from app.utils.embeddings import get_embedding_model
 
 router = APIRouter(
     prefix="/conexiones",
@@ -18,6 +23,86 @@ router = APIRouter(
 
 COLLECTION_KEY = "connections"
 
+# Espacio de nombres de los IDs deterministas de las conexiones
+CONNECTION_NAMESPACE = uuid.UUID("3b9e7c1a-52d4-5f86-a0e2-7c4d9b1f6a38")
+
+def connection_id(source_module: str, source_id: str, target_module: str, target_id: str) -> str:
+    """
+    ID determinista de la conexión entre dos items.
+    
+    Volver a analizar el mismo par reescribe la misma conexión en lugar de
+    crear otra.
+    """
+    return str(uuid.uuid5(CONNECTION_NAMESPACE, f"{source_module}:{source_id}->{target_module}:{target_id}"))
+
+def connection_key(metadata: Optional[Dict[str, Any]]) -> Optional[tuple]:
+    """Retorna (source_module, source_id, target_module, target_id) o None si faltan campos."""
+    fields = ("source_module", "source_id", "target_module", "target_id")
+    if not metadata or any(not metadata.get(field) for field in fields):
+        return None
+    return tuple(str(metadata[field]) for field in fields)
+
+def compact_connections(manager, chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Migración: fusiona las conexiones duplicadas del mismo par de items.
+    
+    Por cada par se conserva la conexión más fuerte (la más reciente si
+    empatan) con el ID determinista de `connection_id` y la fecha de creación
+    más antigua del grupo; el resto se elimina. Primero se escriben las
+    conexiones conservadas y después se borran los duplicados, así que una
+    ejecución interrumpida no pierde conexiones. Es idempotente.
+    """
+    items = manager.list_items(COLLECTION_KEY, limit=None)
+    
+    groups = {}
+    skipped = 0
+    for item in items:
+        key = connection_key(item.get("metadata"))
+        if key is None:
+            skipped += 1
+            continue
+        groups.setdefault(key, []).append(item)
+    
+    keep = []
+    remove = []
+    for key, group in groups.items():
+        canonical_id = connection_id(*key)
+        if len(group) == 1 and group[0]["id"] == canonical_id:
+            continue
+        
+        best = max(group, key=lambda item: (
+            float(item["metadata"].get("strength") or 0.0),
+            str(item["metadata"].get("updated_at") or "")
+        ))
+        created = [item["metadata"]["created_at"] for item in group if item["metadata"].get("created_at")]
+        metadata = dict(best["metadata"])
+        if created:
+            metadata["created_at"] = min(created)
+        
+        keep.append({"id": canonical_id, "text": best["text"], "metadata": metadata})
+        remove.extend(item["id"] for item in group if item["id"] != canonical_id)
+    
+    errors = []
+    upserted = 0
+    deleted = 0
+    if keep:
+        result = manager.upsert_items(COLLECTION_KEY, keep, chunk_size)
+        upserted = result["succeeded"]
+        errors.extend(result["errors"])
+    if remove and not errors:
+        result = manager.delete_items(COLLECTION_KEY, remove, chunk_size)
+        deleted = result["succeeded"]
+        errors.extend(result["errors"])
+    
+    return {
+        "scanned": len(items),
+        "pairs": len(groups),
+        "skipped": skipped,
+        "upserted": upserted,
+        "deleted": deleted,
+        "errors": errors
+    }
+
 @router.post("/analizar", response_model=ConnectionAnalysisResult)
 async def analyze_connections(request: ConnectionAnalysisRequest):
     """
@@ -25,8 +110,13 @@ async def analyze_connections(request: ConnectionAnalysisRequest):
     
     Este endpoint:
     1. Obtiene el item especificado
-    2. Busca items similares en todos los módulos
-    3. Crea conexiones para los items con similitud superior al umbral
+    2. Lee sus vecinos más cercanos de todos los módulos en el grafo kNN,
+       como máximo `max_connections` por módulo (el grafo guarda los
+       `KNN_GRAPH_K` vecinos más cercanos de cada item entre todos los módulos).
+       Mientras el grafo no puede responder se usa una búsqueda vectorial
+       por módulo
+    3. Guarda (o reescribe) las conexiones con similitud superior al umbral
+       con IDs deterministas y una sola escritura masiva
     4. Retorna las conexiones encontradas
     """
     try:
@@ -36,7 +126,7 @@ async def analyze_connections(request: ConnectionAnalysisRequest):
             raise HTTPException(status_code=400, detail=f"Módulo '{request.module}' no válido")
         
         # Obtener el item de origen
-        source_item = db_manager.get_item(
+        source_item = await async_db_manager.get_item(
             collection_key=request.module,
             id=request.item_id
         )
@@ -44,60 +134,90 @@ async def analyze_connections(request: ConnectionAnalysisRequest):
         if not source_item:
             raise HTTPException(status_code=404, detail=f"Item con ID '{request.item_id}' no encontrado en el módulo '{request.module}'")
         
-        # Buscar items similares en todos los módulos
-        connections = []
+        # Vecinos del item en el grafo kNN entre módulos: lectura O(k) sin búsquedas vectoriales
+        neighbors = await async_db_manager.read_pool.run(
+            knn_graph.neighbors, request.module, request.item_id, None, request.min_similarity
+        )
         
-        for module in valid_modules:
-            # Evitar buscar en el módulo de conexiones
-            if module == "connections":
-                continue
-                
-            # Buscar items similares
-            results = db_manager.query_items(
-                collection_key=module,
-                query_text=source_item["text"],
-                n_results=request.max_connections
-            )
-            
-            # Procesar los resultados
-            if results["ids"] and results["ids"][0]:
-                for i in range(len(results["ids"][0])):
+        # Grafo aún en construcción o item con cambios sin aplicar: búsqueda vectorial por módulo
+        if neighbors is None:
+            neighbors = []
+            for module in valid_modules:
+                results = await async_db_manager.query_items(
+                    collection_key=module,
+                    query_text=source_item["text"],
+                    n_results=request.max_connections + 1
+                )
+                if not results["ids"] or not results["ids"][0]:
+                    continue
+                for hit_id, distance in zip(results["ids"][0], results["distances"][0]):
                     # Evitar conectar el item consigo mismo
-                    if module == request.module and results["ids"][0][i] == request.item_id:
+                    if module == request.module and hit_id == request.item_id:
                         continue
-                    
-                    # Verificar si la similitud supera el umbral
-                    similarity = 1.0 - results["distances"][0][i]  # Convertir distancia a similitud
+                    # Convertir distancia a similitud
+                    similarity = 1.0 - distance
                     if similarity >= request.min_similarity:
-                        # Crear una conexión
-                        connection_id = generate_id()
-                        connection_text = f"Conexión entre '{source_item['text'][:50]}...' y '{results['documents'][0][i][:50]}...'"
-                        
-                        connection_metadata = {
-                            "source_id": request.item_id,
-                            "source_module": request.module,
-                            "target_id": results["ids"][0][i],
-                            "target_module": module,
-                            "connection_type": "semantic",
-                            "strength": similarity,
-                            "created_at": datetime.now().isoformat(),
-                            "updated_at": datetime.now().isoformat()
-                        }
-                        
-                        # Guardar la conexión en la base de datos
-                        db_manager.add_item(
-                            collection_key=COLLECTION_KEY,
-                            id=connection_id,
-                            text=connection_text,
-                            metadata=connection_metadata
-                        )
-                        
-                        # Añadir a la lista de conexiones
-                        connections.append({
-                            "id": connection_id,
-                            "text": connection_text,
-                            "metadata": connection_metadata
-                        })
+                        neighbors.append({"id": hit_id, "module": module, "similarity": similarity})
+            neighbors.sort(key=lambda neighbor: neighbor["similarity"], reverse=True)
+        
+        # Como máximo `max_connections` vecinos por módulo (ya vienen ordenados por similitud)
+        per_module = {}
+        limited = []
+        for neighbor in neighbors:
+            if per_module.get(neighbor["module"], 0) < request.max_connections:
+                per_module[neighbor["module"]] = per_module.get(neighbor["module"], 0) + 1
+                limited.append(neighbor)
+        neighbors = limited
+        
+        # Textos de los vecinos: una lectura por lote por módulo
+        neighbor_ids = {}
+        for neighbor in neighbors:
+            neighbor_ids.setdefault(neighbor["module"], []).append(neighbor["id"])
+        texts = {}
+        for module, ids in neighbor_ids.items():
+            found = await async_db_manager.get_items(collection_key=module, ids=ids)
+            texts.update({(module, item_id): item["text"] for item_id, item in found.items()})
+        
+        # IDs deterministas: las conexiones ya guardadas conservan su fecha de creación
+        hits = [
+            hit for hit in neighbors
+            if (hit["module"], hit["id"]) in texts and hit["similarity"] >= request.min_similarity
+        ]
+        ids = [connection_id(request.module, request.item_id, hit["module"], hit["id"]) for hit in hits]
+        existing = await async_db_manager.get_items(collection_key=COLLECTION_KEY, ids=ids) if ids else {}
+        
+        now = datetime.now().isoformat()
+        pending = []
+        
+        for hit, hit_connection_id in zip(hits, ids):
+            hit_text = texts[(hit["module"], hit["id"])]
+            previous = existing.get(hit_connection_id)
+            
+            connection_text = f"Conexión entre '{source_item['text'][:50]}...' y '{hit_text[:50]}...'"
+            connection_metadata = {
+                "source_id": request.item_id,
+                "source_module": request.module,
+                "target_id": hit["id"],
+                "target_module": hit["module"],
+                "connection_type": "semantic",
+                "strength": hit["similarity"],
+                "created_at": (previous or {}).get("metadata", {}).get("created_at") or now,
+                "updated_at": now
+            }
+            
+            pending.append({
+                "id": hit_connection_id,
+                "text": connection_text,
+                "metadata": connection_metadata
+            })
+        
+        # Guardar todas las conexiones con una sola escritura masiva
+        connections = []
+        if pending:
+            result = await async_db_manager.upsert_items(collection_key=COLLECTION_KEY, items=pending)
+            if result["errors"]:
+                raise HTTPException(status_code=500, detail=f"Error al guardar las conexiones: {result['errors'][0]['error']}")
+            connections = result["items"]
         
         # Retornar el resultado
         return {
@@ -123,30 +243,28 @@ async def list_connections(
     Lista todas las conexiones detectadas.
     """
     try:
-        # Obtener todas las conexiones
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if source_module:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("source_module") == source_module]
-        
-        if target_module:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("target_module") == target_module]
-        
-        if min_strength > 0.0:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("strength", 0.0) >= min_strength]
-        
-        # Aplicar paginación
-        start_idx = min(offset, len(filtered_items))
-        end_idx = min(start_idx + limit, len(filtered_items))
+        # Compilar los filtros en una cláusula where para ChromaDB
+        where = build_where(
+            equals={
+                "source_module": source_module,
+                "target_module": target_module
+            },
+            minimums={
+                "strength": min_strength or None
+            }
+        )
         
-        paginated_items = filtered_items[start_idx:end_idx]
+        # Filtrar y paginar directamente en ChromaDB
+        items = await async_db_manager.list_items(
+            collection_key=COLLECTION_KEY,
+            limit=limit,
+            offset=offset,
+            where=where
+        )
         
         return {
-            "items": paginated_items,
-            "total": len(filtered_items)
+            "items": items,
+            "total": await async_db_manager.count_items(collection_key=COLLECTION_KEY, where=where)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar las conexiones: {str(e)}")
@@ -163,23 +281,18 @@ async def search_connections(
     Busca conexiones por similitud semántica.
     """
     try:
-        # Construir el filtro si se proporcionan parámetros
-        filter_dict = {}
-        
-        if source_module:
-            filter_dict["source_module"] = source_module
-        
-        if target_module:
-            filter_dict["target_module"] = target_module
-        
-        if min_strength > 0.0:
-            filter_dict["strength"] = {"$gte": min_strength}
-        
-        # Si no hay filtros, establecer a None
-        if not filter_dict:
-            filter_dict = None
+        # Compilar los filtros en una cláusula where para ChromaDB
+        filter_dict = build_where(
+            equals={
+                "source_module": source_module,
+                "target_module": target_module
+            },
+            minimums={
+                "strength": min_strength or None
+            }
+        )
         
-        results = db_manager.query_items(
+        results = await async_db_manager.query_items(
             collection_key=COLLECTION_KEY,
             query_text=query,
             n_results=n_results,
@@ -202,6 +315,65 @@ async def search_connections(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al buscar conexiones: {str(e)}")
 
+@router.get("/grafo/recorrido", response_model=GraphTraversalResult)
+async def traverse_connections(
+    item_id: str = Query(..., description="ID del item de origen"),
+    module: str = Query(..., description="Módulo del item de origen"),
+    max_depth: int = Query(2, ge=1, le=4, description="Número máximo de saltos"),
+    min_strength: float = Query(0.0, ge=0.0, le=1.0, description="Fuerza mínima de las conexiones a seguir"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de items a retornar")
+):
+    """
+    Retorna los items relacionados con un item en varios saltos.
+    
+    Recorre el índice en memoria de las conexiones en ambos sentidos. Cada
+    item se retorna con su camino más fuerte (producto de las fuerzas).
+    """
+    try:
+        items = await async_db_manager.read_pool.run(
+            connection_graph.traverse, module, item_id, max_depth, min_strength, limit
+        )
+        
+        return {
+            "source_id": item_id,
+            "source_module": module,
+            "items": items,
+            "total": len(items)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recorrer las conexiones: {str(e)}")
+
+@router.get("/grafo/camino", response_model=GraphPathResult)
+async def connection_path(
+    source_id: str = Query(..., description="ID del item de origen"),
+    source_module: str = Query(..., description="Módulo del item de origen"),
+    target_id: str = Query(..., description="ID del item de destino"),
+    target_module: str = Query(..., description="Módulo del item de destino"),
+    min_strength: float = Query(0.0, ge=0.0, le=1.0, description="Fuerza mínima de las conexiones a seguir"),
+    weighted: bool = Query(True, description="Camino más fuerte (Dijkstra) en lugar del de menos saltos")
+):
+    """
+    Retorna el camino entre dos items a través de las conexiones guardadas.
+    """
+    try:
+        result = await async_db_manager.read_pool.run(
+            connection_graph.shortest_path, (source_module, source_id), (target_module, target_id),
+            min_strength, weighted
+        )
+        
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"No hay camino entre '{source_id}' y '{target_id}'")
+        
+        return {
+            "path": [{"id": node[1], "module": node[0]} for node in result["path"]],
+            "hops": result["hops"],
+            "score": result["score"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar el camino entre conexiones: {str(e)}")
+
 @router.get("/{connection_id}", response_model=Item)
 async def get_connection(
     connection_id: str = Path(..., description="ID de la conexión a obtener")
@@ -210,7 +382,7 @@ async def get_connection(
     Obtiene una conexión específica.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=connection_id
         )
@@ -232,7 +404,7 @@ async def delete_connection(
     Elimina una conexión.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=connection_id
         )
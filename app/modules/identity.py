@@ -2,9 +2,12 @@ from fastapi import APIRouter, HTTPException, Query, Path, Depends
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
-from app.database import db_manager
+from app.database import async_db_manager
+from app.utils.usage_tracker import usage_tracker
+from app.utils.scoring import scoring_engine, rerank
+from app.utils.similarity import distance_to_similarity
 from app.models.schemas import (
-    Item, IdentityItemCreate, IdentityItemUpdate, 
+    Item, BulkWriteResult, IdentityBulkCreate, IdentityItemCreate, IdentityItemUpdate, 
     ItemList, QueryResult, generate_id
 )
 
@@ -24,7 +27,7 @@ async def create_identity_item(item: IdentityItemCreate):
     item_id = generate_id()
     
     try:
-        result = db_manager.add_item(
+        result = await async_db_manager.add_item(
             collection_key=COLLECTION_KEY,
             id=item_id,
             text=item.text,
@@ -39,6 +42,24 @@ async def create_identity_item(item: IdentityItemCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear el item: {str(e)}")
 
+@router.post("/bulk", response_model=BulkWriteResult, status_code=201)
+async def bulk_create_identity_items(request: IdentityBulkCreate):
+    """
+    Crea varios items en el módulo de Identidad y Psicología en una sola solicitud.
+    
+    Los textos se codifican y se guardan por lotes. Los items que fallan se
+    reportan en `errors` con su posición en la solicitud, sin detener el resto.
+    """
+    try:
+        items = [
+            {"id": generate_id(), "text": item.text, "metadata": item.metadata}
+            for item in request.items
+        ]
+        
+        return await async_db_manager.add_items(collection_key=COLLECTION_KEY, items=items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al crear los items: {str(e)}")
+
 @router.get("/", response_model=ItemList)
 async def list_identity_items(
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de items a retornar"),
@@ -48,15 +69,14 @@ async def list_identity_items(
     Lista todos los items del módulo de Identidad y Psicología.
     """
     try:
-        items = db_manager.list_items(
+        items = await async_db_manager.list_items(
             collection_key=COLLECTION_KEY,
             limit=limit,
             offset=offset
         )
         
-        # Obtener el total de items
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        total = len(all_items)
+        # Obtener el total de items sin volver a leer la colección
+        total = await async_db_manager.count_items(collection_key=COLLECTION_KEY)
         
         return {
             "items": items,
@@ -69,7 +89,8 @@ async def list_identity_items(
 async def search_identity_items(
     query: str = Query(..., min_length=1, description="Texto a buscar"),
     n_results: int = Query(5, ge=1, le=100, description="Número de resultados a retornar"),
-    category: Optional[str] = Query(None, description="Filtrar por categoría")
+    category: Optional[str] = Query(None, description="Filtrar por categoría"),
+    priority_weight: float = Query(0.0, ge=0.0, le=1.0, description="Peso de la puntuación de prioridad en el orden de los resultados (0 = solo similitud)")
 ):
     """
     Busca items en el módulo de Identidad y Psicología por similitud semántica.
@@ -80,7 +101,7 @@ async def search_identity_items(
         if category:
             filter_dict = {"category": category}
         
-        results = db_manager.query_items(
+        results = await async_db_manager.query_items(
             collection_key=COLLECTION_KEY,
             query_text=query,
             n_results=n_results,
@@ -89,6 +110,7 @@ async def search_identity_items(
         
         # Construir la respuesta
         items = []
+        distances = results["distances"][0]
         for i in range(len(results["ids"][0])):
             items.append({
                 "id": results["ids"][0][i],
@@ -96,9 +118,19 @@ async def search_identity_items(
                 "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
             })
         
+        # Reordenar combinando la similitud con la puntuación de prioridad de cada item
+        if priority_weight > 0 and items:
+            scores = await async_db_manager.read_pool.run(scoring_engine.score_items, COLLECTION_KEY, items)
+            order = rerank(items, distance_to_similarity(distances), scores, priority_weight)
+            items = [items[i] for i in order]
+            distances = [distances[i] for i in order]
+        
+        # Registrar el acceso a los items retornados (se vuelca en segundo plano)
+        usage_tracker.record(COLLECTION_KEY, [item["id"] for item in items])
+        
         return {
             "items": items,
-            "distances": results["distances"][0]
+            "distances": distances
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al buscar items: {str(e)}")
@@ -111,7 +143,7 @@ async def get_identity_item(
     Obtiene un item específico del módulo de Identidad y Psicología.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
@@ -119,6 +151,9 @@ async def get_identity_item(
         if not item:
             raise HTTPException(status_code=404, detail=f"Item con ID '{item_id}' no encontrado")
         
+        # Registrar el acceso al item
+        usage_tracker.record(COLLECTION_KEY, [item_id])
+        
         return item
     except HTTPException:
         raise
@@ -135,7 +170,7 @@ async def update_identity_item(
     """
     try:
         # Verificar que el item existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
@@ -151,7 +186,7 @@ async def update_identity_item(
             metadata["updated_at"] = datetime.now().isoformat()
         
         # Actualizar el item
-        updated_item = db_manager.update_item(
+        updated_item = await async_db_manager.update_item(
             collection_key=COLLECTION_KEY,
             id=item_id,
             text=item_update.text,
@@ -172,7 +207,7 @@ async def delete_identity_item(
     Elimina un item del módulo de Identidad y Psicología.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
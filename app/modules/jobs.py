@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Query, Path
+from typing import Optional
+from pydantic import ValidationError
+
+from app.utils.jobs import job_manager, JOB_STATUSES
+from app.modules import priorities, suggestions
+from app.models.schemas import (
+    JobCreate, JobStatus, JobResult, JobList,
+    PriorityReviewRequest, PriorityOptimizeRequest,
+    SuggestionRequest, SuggestionAnalysisRequest
+)
+
+router = APIRouter(
+    prefix="/trabajos",
+    tags=["trabajos"],
+    responses={404: {"description": "No encontrado"}},
+)
+
+# Análisis largos que pueden ejecutarse como trabajos en segundo plano
+job_manager.register("prioridad.revisar", PriorityReviewRequest, priorities.review_priorities)
+job_manager.register("prioridad.optimizar", PriorityOptimizeRequest, priorities.optimize_priorities)
+job_manager.register("sugerencias.obtener", SuggestionRequest, suggestions.get_suggestions)
+job_manager.register("sugerencias.analizar", SuggestionAnalysisRequest, suggestions.analyze_data)
+
+@router.post("/", response_model=JobStatus, status_code=202)
+async def create_job(job: JobCreate):
+    """
+    Encola un análisis largo como trabajo en segundo plano.
+
+    Los parámetros son los mismos que el cuerpo del endpoint correspondiente.
+    Si ya hay un trabajo idéntico pendiente o en curso, se retorna ese trabajo.
+    """
+    if job.type not in job_manager.job_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de trabajo '{job.type}' no válido. Tipos disponibles: {', '.join(job_manager.job_types)}"
+        )
+
+    try:
+        return job_manager.submit(job.type, job.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Parámetros no válidos: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al crear el trabajo: {str(e)}")
+
+@router.get("/", response_model=JobList)
+async def list_jobs(
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de trabajos a retornar"),
+    offset: int = Query(0, ge=0, description="Número de trabajos a saltar"),
+    status: Optional[str] = Query(None, description="Filtrar por estado")
+):
+    """
+    Lista los trabajos más recientes.
+    """
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Estado '{status}' no válido")
+
+    try:
+        items = job_manager.list_jobs(status=status, limit=limit, offset=offset)
+        return {"items": items, "total": job_manager.count_jobs(status=status)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al listar trabajos: {str(e)}")
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str = Path(..., description="ID del trabajo")):
+    """
+    Obtiene el estado y el progreso de un trabajo.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Trabajo con ID {job_id} no encontrado")
+
+    return job
+
+@router.get("/{job_id}/resultado", response_model=JobResult)
+async def get_job_result(job_id: str = Path(..., description="ID del trabajo")):
+    """
+    Obtiene el resultado de un trabajo terminado (o su error si ha fallado).
+    """
+    job = job_manager.get_result(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Trabajo con ID {job_id} no encontrado")
+
+    if job["status"] not in ["completed", "failed"]:
+        raise HTTPException(status_code=409, detail=f"El trabajo {job_id} aún no ha terminado (estado: {job['status']})")
+
+    return job
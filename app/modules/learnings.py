@@ -3,9 +3,13 @@ from typing import List, Dict, Optional, Any
 from datetime import datetime
 from collections import Counter
 
-from app.database import db_manager
+from app.database import async_db_manager
+from app.utils.filters import build_where
+from app.utils.usage_tracker import usage_tracker
+from app.utils.scoring import scoring_engine, rerank
+from app.utils.similarity import distance_to_similarity
 from app.models.schemas import (
-    Item, LearningItemCreate, LearningItemUpdate, 
+    Item, LearningItemCreate, LearningItemUpdate, LearningBulkCreate, BulkWriteResult,
     LearningSummaryRequest, LearningSummary,
     ItemList, QueryResult, generate_id
 )
@@ -26,7 +30,7 @@ async def create_learning_item(item: LearningItemCreate):
     item_id = generate_id()
     
     try:
-        result = db_manager.add_item(
+        result = await async_db_manager.add_item(
             collection_key=COLLECTION_KEY,
             id=item_id,
             text=item.text,
@@ -41,6 +45,24 @@ async def create_learning_item(item: LearningItemCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear el aprendizaje: {str(e)}")
 
+@router.post("/guardar/lote", response_model=BulkWriteResult, status_code=201)
+async def bulk_create_learning_items(request: LearningBulkCreate):
+    """
+    Guarda varios aprendizajes o reflexiones en una sola solicitud.
+    
+    Los textos se codifican y se guardan por lotes. Los items que fallan se
+    reportan en `errors` con su posición en la solicitud, sin detener el resto.
+    """
+    try:
+        items = [
+            {"id": generate_id(), "text": item.text, "metadata": item.metadata}
+            for item in request.items
+        ]
+        
+        return await async_db_manager.add_items(collection_key=COLLECTION_KEY, items=items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al guardar los aprendizajes: {str(e)}")
+
 @router.get("/listar", response_model=ItemList)
 async def list_learning_items(
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de aprendizajes a retornar"),
@@ -54,23 +76,31 @@ async def list_learning_items(
     Lista todos los aprendizajes almacenados.
     """
     try:
-        # Obtener todos los aprendizajes
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if category:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("category") == category]
-        
-        if source:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("source") == source]
+        # Compilar los filtros escalares en una cláusula where para ChromaDB
+        where = build_where(
+            equals={
+                "category": category,
+                "source": source,
+                "importance": importance
+            }
+        )
         
-        if importance:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("importance") == importance]
+        # Sin filtro por etiqueta, filtrar y paginar directamente en ChromaDB
+        if not tag:
+            items = await async_db_manager.list_items(
+                collection_key=COLLECTION_KEY,
+                limit=limit,
+                offset=offset,
+                where=where
+            )
+            return {"items": items, "total": await async_db_manager.count_items(collection_key=COLLECTION_KEY, where=where)}
         
-        if tag:
-            filtered_items = [item for item in filtered_items if tag in item["metadata"].get("tags", [])]
+        # Las etiquetas son una lista y ChromaDB no puede filtrarlas, así que
+        # se filtran en Python sobre los items que ya cumplen el resto de filtros
+        filtered_items = [
+            item for item in await async_db_manager.list_items(collection_key=COLLECTION_KEY, limit=None, where=where)
+            if tag in item["metadata"].get("tags", [])
+        ]
         
         # Aplicar paginación
         start_idx = min(offset, len(filtered_items))
@@ -92,32 +122,26 @@ async def search_learning_items(
     category: Optional[str] = Query(None, description="Filtrar por categoría"),
     source: Optional[str] = Query(None, description="Filtrar por fuente"),
     importance: Optional[str] = Query(None, description="Filtrar por importancia"),
-    tag: Optional[str] = Query(None, description="Filtrar por etiqueta")
+    tag: Optional[str] = Query(None, description="Filtrar por etiqueta"),
+    priority_weight: float = Query(0.0, ge=0.0, le=1.0, description="Peso de la puntuación de prioridad en el orden de los resultados (0 = solo similitud)")
 ):
     """
     Busca aprendizajes por tema, palabra clave o categoría.
     """
     try:
-        # Construir el filtro si se proporcionan parámetros
-        filter_dict = {}
-        
-        if category:
-            filter_dict["category"] = category
-        
-        if source:
-            filter_dict["source"] = source
-        
-        if importance:
-            filter_dict["importance"] = importance
+        # Compilar los filtros en una cláusula where para ChromaDB
+        filter_dict = build_where(
+            equals={
+                "category": category,
+                "source": source,
+                "importance": importance
+            }
+        )
         
         # ChromaDB no soporta búsqueda en arrays directamente, así que
         # filtramos por tags después de la búsqueda
         
-        # Si no hay filtros, establecer a None
-        if not filter_dict:
-            filter_dict = None
-        
-        results = db_manager.query_items(
+        results = await async_db_manager.query_items(
             collection_key=COLLECTION_KEY,
             query_text=query,
             n_results=n_results * 2,  # Obtener más resultados para filtrar por tags después
@@ -147,6 +171,16 @@ async def search_learning_items(
                 if len(items) >= n_results:
                     break
         
+        # Reordenar combinando la similitud con la puntuación de prioridad de cada item
+        if priority_weight > 0 and items:
+            scores = await async_db_manager.read_pool.run(scoring_engine.score_items, COLLECTION_KEY, items)
+            order = rerank(items, distance_to_similarity(distances), scores, priority_weight)
+            items = [items[i] for i in order]
+            distances = [distances[i] for i in order]
+        
+        # Registrar el acceso a los items retornados (se vuelca en segundo plano)
+        usage_tracker.record(COLLECTION_KEY, [item["id"] for item in items])
+        
         return {
             "items": items,
             "distances": distances
@@ -160,17 +194,14 @@ async def summarize_learnings(request: LearningSummaryRequest):
     Genera un resumen de los aprendizajes más importantes.
     """
     try:
-        # Obtener todos los aprendizajes
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if request.category:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("category") == request.category]
-        
-        if request.importance:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("importance") == request.importance]
+        # Filtrar por categoría e importancia directamente en ChromaDB
+        where = build_where(
+            equals={
+                "category": request.category,
+                "importance": request.importance
+            }
+        )
+        filtered_items = await async_db_manager.list_items(collection_key=COLLECTION_KEY, limit=None, where=where)
         
         if request.tags:
             filtered_items = [
@@ -224,7 +255,7 @@ async def get_learning_item(
     Obtiene un aprendizaje específico.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=learning_id
         )
@@ -232,6 +263,9 @@ async def get_learning_item(
         if not item:
             raise HTTPException(status_code=404, detail=f"Aprendizaje con ID '{learning_id}' no encontrado")
         
+        # Registrar el acceso al item
+        usage_tracker.record(COLLECTION_KEY, [learning_id])
+        
         return item
     except HTTPException:
         raise
@@ -248,7 +282,7 @@ async def update_learning_item(
     """
     try:
         # Verificar que el item existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=learning_id
         )
@@ -264,7 +298,7 @@ async def update_learning_item(
             metadata["updated_at"] = datetime.now().isoformat()
         
         # Actualizar el item
-        updated_item = db_manager.update_item(
+        updated_item = await async_db_manager.update_item(
             collection_key=COLLECTION_KEY,
             id=learning_id,
             text=item_update.text,
@@ -285,7 +319,7 @@ async def delete_learning_item(
     Elimina un aprendizaje.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=learning_id
         )
@@ -1,16 +1,25 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Depends, Body
-from typing import List, Dict, Optional, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional, Any, AsyncIterator, Tuple
 from datetime import datetime
 from collections import defaultdict
+import json
+import time
 
-from app.database import db_manager
+import numpy as np
+
+from app.database import async_db_manager
+from app.utils.filters import build_where
+from app.utils.priority_index import priority_index
+from app.utils.jobs import report_progress
+from app.utils.scoring import scoring_engine
 from app.models.schemas import (
     Item, PriorityItemCreate, PriorityItemUpdate,
     PriorityReviewRequest, PriorityAdjustRequest, PriorityOptimizeRequest,
     PriorityReviewResult, PriorityOptimizeResult,
     ItemList, QueryResult, generate_id
 )
-from app.utils.embeddings import get_embedding_model
+from app.utils.similarity import iter_similar_pairs, iter_neighbor_pairs, UnionFind
 
 router = APIRouter(
     prefix="/prioridad",
@@ -20,6 +29,217 @@ router = APIRouter(
 
 COLLECTION_KEY = "priorities"
 
+# Puntuación por debajo de la cual un item sin uso del percentil inferior se propone para archivar
+ARCHIVE_SCORE_THRESHOLD = 0.2
+
+# Pares de duplicados que se retiran del generador en cada llamada al pool de lecturas
+PAIR_CHUNK_SIZE = 256
+PAIR_CHUNK_SECONDS = 0.05
+
+def validate_review_request(request: PriorityReviewRequest) -> List[str]:
+    """Valida la solicitud de revisión y retorna los módulos a revisar."""
+    # Definir los módulos a revisar
+    valid_modules = ["identity", "business", "reminders", "learnings"]
+    modules_to_review = [request.module] if request.module else valid_modules
+    
+    # Validar que los módulos son válidos
+    for module in modules_to_review:
+        if module not in valid_modules:
+            raise HTTPException(status_code=400, detail=f"Módulo '{module}' no válido")
+    
+    # Validar el método de detección de duplicados
+    if request.duplicate_mode not in ["exact", "ann"]:
+        raise HTTPException(status_code=400, detail=f"Método de detección de duplicados '{request.duplicate_mode}' no válido")
+    
+    return modules_to_review
+
+def truncate_text(text: str) -> str:
+    """Recorta un texto a 100 caracteres para las respuestas de revisión."""
+    return text[:100] + "..." if len(text) > 100 else text
+
+def take_pairs(pairs, union_find: UnionFind, max_pairs: int = PAIR_CHUNK_SIZE,
+               max_seconds: float = PAIR_CHUNK_SECONDS) -> List[Tuple[int, int, float]]:
+    """
+    Retira del generador hasta `max_pairs` pares (o los encontrados en `max_seconds`) y los une en `union_find`.
+    
+    Se ejecuta en el pool de lecturas, de modo que el cálculo de similitudes
+    por bloques y el union-find no ocupan el bucle de eventos. Retorna una
+    lista vacía cuando el generador se agota.
+    """
+    chunk = []
+    deadline = time.perf_counter() + max_seconds
+    for i, j, similarity in pairs:
+        union_find.union(i, j)
+        chunk.append((i, j, similarity))
+        if len(chunk) >= max_pairs or time.perf_counter() >= deadline:
+            break
+    return chunk
+
+async def iter_duplicates(
+    request: PriorityReviewRequest,
+    loaded: List[Tuple[str, List[Dict[str, Any]], Dict[str, Dict[str, Any]]]]
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Busca duplicados entre todos los items de `loaded` ([(módulo, items, puntuaciones)]).
+    
+    Los vectores de todos los módulos se apilan en una sola matriz (modo
+    'exact') o se consultan los índices HNSW de los módulos (modo 'ann').
+    Los duplicados transitivos (A~B y B~C) se agrupan con union-find y cada
+    grupo tiene un único item canónico: el de mayor puntuación de relevancia.
+    
+    Los pares se calculan en el pool de lecturas por tramos y se emiten en
+    cuanto llega cada tramo, así que el bucle de eventos no se bloquea durante
+    la búsqueda. En modo 'ann' con varios módulos, el índice de cada módulo
+    se consulta con sus propios vectores y con los de los módulos anteriores
+    (cada par entre dos módulos se busca desde un solo lado): N·(M+1)/2
+    consultas para N items repartidos en M módulos, en lugar de N·M.
+    """
+    entries = [(module, item, scores) for module, items, scores in loaded for item in items]
+    if len(entries) < 2:
+        return
+    
+    # Cada item se codifica como máximo una vez (o se reutiliza su vector almacenado)
+    module_embeddings = [
+        np.asarray(await async_db_manager.get_item_embeddings(collection_key=module, items=items), dtype=np.float32)
+        for module, items, _ in loaded if items
+    ]
+    embeddings = await async_db_manager.read_pool.run(np.vstack, module_embeddings)
+    
+    if request.duplicate_mode == "ann":
+        # Consultar los k vecinos de cada item en el índice HNSW de su módulo y de los módulos posteriores
+        keys = [f"{module}:{item['id']}" for module, item, _ in entries]
+        neighbors = [[] for _ in entries]
+        end = 0
+        for module, items, _ in loaded:
+            end += len(items)
+            module_neighbors = await async_db_manager.query_neighbors(
+                collection_key=module,
+                embeddings=embeddings[:end],
+                n_results=request.neighbors + 1  # El propio item siempre es su vecino más cercano
+            )
+            for i, item_neighbors in enumerate(module_neighbors):
+                neighbors[i].extend((f"{module}:{neighbor_id}", similarity) for neighbor_id, similarity in item_neighbors)
+        pairs = iter_neighbor_pairs(keys, neighbors, request.min_similarity)
+    else:
+        pairs = iter_similar_pairs(embeddings, request.min_similarity)
+    
+    # Agrupar los items conectados por duplicados (A~B y B~C forman un grupo)
+    union_find = UnionFind()
+    
+    while True:
+        chunk = await async_db_manager.read_pool.run(take_pairs, pairs, union_find)
+        if not chunk:
+            break
+        
+        for i, j, similarity in chunk:
+            module1, item1, _ = entries[i]
+            module2, item2, _ = entries[j]
+            
+            yield "duplicate", {
+                "item1": {"id": item1["id"], "text": truncate_text(item1["text"]), "module": module1},
+                "item2": {"id": item2["id"], "text": truncate_text(item2["text"]), "module": module2},
+                "similarity": similarity,
+                "suggested_action": "merge" if similarity > 0.95 else "review"
+            }
+            
+            # Añadir acción sugerida
+            if similarity > 0.95:
+                yield "action", {
+                    "action": "merge_duplicates",
+                    "items": [item1["id"], item2["id"]],
+                    "module": module1,
+                    "modules": [module1, module2],
+                    "reason": f"Duplicados con similitud {similarity:.2f}"
+                }
+    
+    for group in await async_db_manager.read_pool.run(union_find.groups):
+        members = sorted(group)
+        
+        # Item canónico: mayor puntuación; a igualdad, el primero en orden de revisión
+        canonical = max(members, key=lambda k: entries[k][2][entries[k][1]["id"]]["score"])
+        canonical_module, canonical_item, _ = entries[canonical]
+        
+        yield "duplicate_group", {
+            "module": canonical_module,
+            "modules": sorted({entries[k][0] for k in members}),
+            "primary_id": canonical_item["id"],
+            "canonical": {"id": canonical_item["id"], "module": canonical_module, "text": truncate_text(canonical_item["text"])},
+            "item_ids": [entries[k][1]["id"] for k in members],
+            "members": [
+                {"id": entries[k][1]["id"], "module": entries[k][0], "score": entries[k][2][entries[k][1]["id"]]["score"]}
+                for k in members
+            ],
+            "size": len(members)
+        }
+
+async def iter_review(request: PriorityReviewRequest, modules_to_review: List[str]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Revisa los módulos y genera cada resultado en cuanto se encuentra.
+    
+    Emite tuplas (evento, datos) con los eventos "module" (items revisados
+    de un módulo), "duplicate", "duplicate_group", "low_relevance" y "action".
+    No acumula los resultados, de modo que la memoria no crece con el número
+    de duplicados encontrados. Con `cross_module` los duplicados se buscan
+    después de cargar todos los módulos, en una sola pasada.
+    """
+    loaded = []
+    
+    for index, module in enumerate(modules_to_review):
+        report_progress(index / len(modules_to_review), f"Revisando el módulo '{module}'")
+        
+        # Obtener solo los items a revisar; el total se cuenta sin leer la colección
+        items = await async_db_manager.list_items(collection_key=module, limit=request.max_items)
+        total_items = await async_db_manager.count_items(collection_key=module)
+        yield "module", {"module": module, "total_items": total_items, "reviewed_items": len(items)}
+        
+        if not items:
+            continue
+        
+        # Puntuar todos los items del módulo a la vez (uso con decaimiento, relevancia, longitud y conexiones)
+        scores = await async_db_manager.read_pool.run(scoring_engine.score_items, module, items)
+        
+        # Buscar duplicados dentro del módulo (o acumular para la pasada entre módulos)
+        if request.include_duplicates:
+            if request.cross_module:
+                loaded.append((module, items, scores))
+            else:
+                async for event in iter_duplicates(request, [(module, items, scores)]):
+                    yield event
+        
+        # Identificar items con baja relevancia
+        if request.include_low_relevance:
+            for item in items:
+                item_score = scores[item["id"]]
+                relevance_score = item_score["score"]
+                usage_count = item_score["usage_count"]
+                
+                # Los items del percentil inferior se consideran de baja relevancia
+                if item_score["level"] == "low":
+                    archive = relevance_score < ARCHIVE_SCORE_THRESHOLD and usage_count == 0
+                    yield "low_relevance", {
+                        "id": item["id"],
+                        "text": truncate_text(item["text"]),
+                        "module": module,
+                        "relevance_score": relevance_score,
+                        "usage_count": usage_count,
+                        "suggested_action": "archive" if archive else "review"
+                    }
+                    
+                    # Añadir acción sugerida
+                    if archive:
+                        yield "action", {
+                            "action": "archive_item",
+                            "item_id": item["id"],
+                            "module": module,
+                            "reason": f"Baja relevancia ({relevance_score:.2f}) y sin uso"
+                        }
+    
+    # Buscar duplicados entre módulos con una sola matriz de vectores
+    if loaded:
+        report_progress(0.75, "Buscando duplicados entre módulos")
+        async for event in iter_duplicates(request, loaded):
+            yield event
+
 @router.post("/revisar", response_model=PriorityReviewResult)
 async def review_priorities(request: PriorityReviewRequest):
     """
@@ -32,130 +252,87 @@ async def review_priorities(request: PriorityReviewRequest):
     4. Sugiere acciones para optimizar la base de datos
     """
     try:
-        # Definir los módulos a revisar
-        valid_modules = ["identity", "business", "reminders", "learnings"]
-        modules_to_review = [request.module] if request.module else valid_modules
-        
-        # Validar que los módulos son válidos
-        for module in modules_to_review:
-            if module not in valid_modules:
-                raise HTTPException(status_code=400, detail=f"Módulo '{module}' no válido")
+        modules_to_review = validate_review_request(request)
         
         # Inicializar resultados
         total_items_reviewed = 0
-        potential_duplicates = []
-        low_relevance_items = []
-        suggested_actions = []
+        results = {
+            "duplicate": [],
+            "duplicate_group": [],
+            "low_relevance": [],
+            "action": []
+        }
         
         # Revisar cada módulo
-        for module in modules_to_review:
-            # Obtener todos los items del módulo
-            items = db_manager.list_items(collection_key=module)
-            total_items_reviewed += len(items)
-            
-            # Limitar el número de items si es necesario
-            if len(items) > request.max_items:
-                items = items[:request.max_items]
-            
-            # Buscar duplicados
-            if request.include_duplicates and len(items) > 1:
-                for i, item1 in enumerate(items):
-                    for j, item2 in enumerate(items):
-                        # Evitar comparar un item consigo mismo y duplicar comparaciones
-                        if i >= j:
-                            continue
-                        
-                        # Comparar textos usando el modelo de embeddings
-                        embedding_model = get_embedding_model()
-                        embedding1 = embedding_model.encode(item1["text"])
-                        embedding2 = embedding_model.encode(item2["text"])
-                        
-                        # Calcular similitud coseno
-                        similarity = embedding_model.util.cos_sim(embedding1, embedding2).item()
-                        
-                        # Si la similitud supera el umbral, registrar como posible duplicado
-                        if similarity >= request.min_similarity:
-                            duplicate_pair = {
-                                "item1": {
-                                    "id": item1["id"],
-                                    "text": item1["text"][:100] + "..." if len(item1["text"]) > 100 else item1["text"],
-                                    "module": module
-                                },
-                                "item2": {
-                                    "id": item2["id"],
-                                    "text": item2["text"][:100] + "..." if len(item2["text"]) > 100 else item2["text"],
-                                    "module": module
-                                },
-                                "similarity": similarity,
-                                "suggested_action": "merge" if similarity > 0.95 else "review"
-                            }
-                            potential_duplicates.append(duplicate_pair)
-                            
-                            # Añadir acción sugerida
-                            if similarity > 0.95:
-                                suggested_actions.append({
-                                    "action": "merge_duplicates",
-                                    "items": [item1["id"], item2["id"]],
-                                    "module": module,
-                                    "reason": f"Duplicados con similitud {similarity:.2f}"
-                                })
-            
-            # Identificar items con baja relevancia
-            if request.include_low_relevance:
-                # Aquí podríamos implementar diferentes heurísticas para determinar la relevancia
-                # Por ahora, usaremos una lógica simple basada en la longitud del texto
-                for item in items:
-                    # Verificar si ya existe un registro de prioridad para este item
-                    priority_records = db_manager.list_items(collection_key=COLLECTION_KEY)
-                    priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == item["id"] and p["metadata"].get("module") == module), None)
-                    
-                    # Calcular una puntuación de relevancia simple
-                    relevance_score = min(1.0, len(item["text"]) / 1000)  # Texto más largo = más relevante, hasta cierto punto
-                    
-                    # Si existe un registro de prioridad, usar su puntuación
-                    if priority_record:
-                        relevance_score = priority_record["metadata"].get("relevance_score", relevance_score)
-                        usage_count = priority_record["metadata"].get("usage_count", 0)
-                        
-                        # Ajustar relevancia según el uso
-                        if usage_count == 0:
-                            relevance_score *= 0.8  # Penalizar items nunca usados
-                    else:
-                        usage_count = 0
-                    
-                    # Si la relevancia es baja, añadir a la lista
-                    if relevance_score < 0.3:
-                        low_relevance_item = {
-                            "id": item["id"],
-                            "text": item["text"][:100] + "..." if len(item["text"]) > 100 else item["text"],
-                            "module": module,
-                            "relevance_score": relevance_score,
-                            "usage_count": usage_count,
-                            "suggested_action": "archive" if relevance_score < 0.2 and usage_count == 0 else "review"
-                        }
-                        low_relevance_items.append(low_relevance_item)
-                        
-                        # Añadir acción sugerida
-                        if relevance_score < 0.2 and usage_count == 0:
-                            suggested_actions.append({
-                                "action": "archive_item",
-                                "item_id": item["id"],
-                                "module": module,
-                                "reason": f"Baja relevancia ({relevance_score:.2f}) y sin uso"
-                            })
+        async for event, data in iter_review(request, modules_to_review):
+            if event == "module":
+                total_items_reviewed += data["total_items"]
+            else:
+                results[event].append(data)
         
         # Retornar resultados
         return {
             "total_items_reviewed": total_items_reviewed,
-            "potential_duplicates": potential_duplicates,
-            "low_relevance_items": low_relevance_items,
-            "suggested_actions": suggested_actions
+            "potential_duplicates": results["duplicate"],
+            "duplicate_groups": results["duplicate_group"],
+            "low_relevance_items": results["low_relevance"],
+            "suggested_actions": results["action"]
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al revisar prioridades: {str(e)}")
 
+@router.post("/revisar/stream")
+async def stream_review_priorities(
+    request: PriorityReviewRequest,
+    format: str = Query("ndjson", description="Formato del flujo: 'ndjson' (una línea JSON por evento) o 'sse' (Server-Sent Events)")
+):
+    """
+    Variante en streaming de /revisar.
+    
+    Emite cada duplicado, grupo, item de baja relevancia y acción sugerida en
+    cuanto se encuentra, en lugar de construir la respuesta completa en memoria.
+    Cada evento tiene la forma {"event": ..., "data": ...}; el último evento es
+    "end" con el total de items revisados (o "error" si la revisión falla).
+    """
+    if format not in ["ndjson", "sse"]:
+        raise HTTPException(status_code=400, detail=f"Formato '{format}' no válido")
+    
+    modules_to_review = validate_review_request(request)
+    
+    def encode(event: str, data: Dict[str, Any]) -> str:
+        if format == "sse":
+            return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+    
+    async def events():
+        start_time = time.perf_counter()
+        counts = defaultdict(int)
+        total_items_reviewed = 0
+        try:
+            async for event, data in iter_review(request, modules_to_review):
+                counts[event] += 1
+                if event == "module":
+                    total_items_reviewed += data["total_items"]
+                yield encode(event, data)
+        except Exception as e:
+            yield encode("error", {"detail": f"Error al revisar prioridades: {str(e)}"})
+            return
+        
+        yield encode("end", {
+            "total_items_reviewed": total_items_reviewed,
+            "potential_duplicates": counts["duplicate"],
+            "duplicate_groups": counts["duplicate_group"],
+            "low_relevance_items": counts["low_relevance"],
+            "suggested_actions": counts["action"],
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 1)
+        })
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # Evitar que los proxies acumulen la respuesta antes de reenviarla
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/ajustar", response_model=Item)
 async def adjust_priority(request: PriorityAdjustRequest):
     """
@@ -173,7 +350,7 @@ async def adjust_priority(request: PriorityAdjustRequest):
             raise HTTPException(status_code=400, detail=f"Nivel de prioridad '{request.priority_level}' no válido")
         
         # Verificar que el item existe
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=request.module,
             id=request.item_id
         )
@@ -182,29 +359,31 @@ async def adjust_priority(request: PriorityAdjustRequest):
             raise HTTPException(status_code=404, detail=f"Item con ID '{request.item_id}' no encontrado en el módulo '{request.module}'")
         
         # Buscar si ya existe un registro de prioridad para este item
-        priority_records = db_manager.list_items(collection_key=COLLECTION_KEY)
-        priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == request.item_id and p["metadata"].get("module") == request.module), None)
+        priority_record = priority_index.get(request.module, request.item_id)
         
         if priority_record:
             # Actualizar el registro existente
             priority_id = priority_record["id"]
             
-            # Preparar los metadatos actualizados
-            updated_metadata = priority_record["metadata"].copy()
-            updated_metadata["priority_level"] = request.priority_level
+            # Preparar solo los campos modificados
+            patch = {"priority_level": request.priority_level, "updated_at": datetime.now().isoformat()}
             if request.relevance_score is not None:
-                updated_metadata["relevance_score"] = request.relevance_score
-            updated_metadata["updated_at"] = datetime.now().isoformat()
+                patch["relevance_score"] = request.relevance_score
             
-            # Actualizar el registro
-            updated_record = db_manager.update_item(
+            # Combinar con los metadatos guardados al escribir, sin pisar los contadores de uso
+            result = await async_db_manager.update_items(
                 collection_key=COLLECTION_KEY,
-                id=priority_id,
-                text=f"Prioridad para item '{item['text'][:50]}...' en módulo '{request.module}'",
-                metadata=updated_metadata
+                items=[{
+                    "id": priority_id,
+                    "text": f"Prioridad para item '{item['text'][:50]}...' en módulo '{request.module}'",
+                    "metadata": patch
+                }],
+                merge_metadata=True
             )
+            if result["errors"]:
+                raise HTTPException(status_code=500, detail=f"Error al ajustar la prioridad: {result['errors'][0]['error']}")
             
-            return updated_record
+            return result["items"][0]
         else:
             # Crear un nuevo registro de prioridad
             priority_id = generate_id()
@@ -218,13 +397,14 @@ async def adjust_priority(request: PriorityAdjustRequest):
                 "usage_count": 0,
                 "last_accessed": datetime.now().isoformat(),
                 "is_duplicate": False,
-                "duplicate_of": None,
+                # ChromaDB no admite valores nulos en los metadatos
+                "duplicate_of": "",
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat()
             }
             
             # Crear el registro
-            result = db_manager.add_item(
+            result = await async_db_manager.add_item(
                 collection_key=COLLECTION_KEY,
                 id=priority_id,
                 text=f"Prioridad para item '{item['text'][:50]}...' en módulo '{request.module}'",
@@ -256,6 +436,10 @@ async def optimize_priorities(request: PriorityOptimizeRequest):
             if module not in valid_modules:
                 raise HTTPException(status_code=400, detail=f"Módulo '{module}' no válido")
         
+        # Validar el método de detección de duplicados
+        if request.duplicate_mode not in ["exact", "ann"]:
+            raise HTTPException(status_code=400, detail=f"Método de detección de duplicados '{request.duplicate_mode}' no válido")
+        
         # Inicializar resultados
         total_items_optimized = 0
         merged_duplicates = []
@@ -268,84 +452,88 @@ async def optimize_priorities(request: PriorityOptimizeRequest):
             min_similarity=0.9,  # Umbral alto para fusiones automáticas
             max_items=1000,
             include_low_relevance=True,
-            include_duplicates=True
+            include_duplicates=True,
+            duplicate_mode=request.duplicate_mode,
+            neighbors=request.neighbors,
+            cross_module=request.cross_module
         )
         
         review_result = await review_priorities(review_request)
         
+        # Plan de cambios en memoria: campos modificados por registro y registros nuevos.
+        # Solo se escriben los campos modificados para no pisar los contadores de uso
+        # que `UsageTracker` vuelque entre la lectura y la escritura
+        record_updates = {}
+        new_records = {}
+        now = datetime.now().isoformat()
+        
+        def patch_record(module, item_id, patch):
+            """Añade un parche al plan; retorna False si el item no tiene registro de prioridad."""
+            key = (module, item_id)
+            if key in new_records:
+                new_records[key]["metadata"].update(patch)
+                return True
+            
+            priority_record = priority_index.get(module, item_id)
+            if priority_record is None:
+                return False
+            
+            record_updates.setdefault(priority_record["id"], {}).update(patch)
+            return True
+        
+        report_progress(0.8, "Planificando cambios")
+        
         # Procesar duplicados si se solicita
         if request.auto_merge_duplicates:
-            # Agrupar duplicados por item principal
-            duplicate_groups = defaultdict(list)
+            # Los pares de fusión conectados (A~B, B~C) forman un único grupo, también entre módulos
+            merge_pairs = [d for d in review_result["potential_duplicates"] if d["suggested_action"] == "merge"]
+            duplicate_items = {}
+            union_find = UnionFind()
+            for duplicate in merge_pairs:
+                key1 = (duplicate["item1"]["module"], duplicate["item1"]["id"])
+                key2 = (duplicate["item2"]["module"], duplicate["item2"]["id"])
+                duplicate_items[key1] = duplicate["item1"]
+                duplicate_items[key2] = duplicate["item2"]
+                union_find.union(key1, key2)
             
-            for duplicate in review_result["potential_duplicates"]:
-                if duplicate["suggested_action"] == "merge":
-                    # Usar el ID del primer item como clave del grupo
-                    group_key = duplicate["item1"]["id"]
-                    duplicate_groups[group_key].append(duplicate["item2"])
+            # Puntuaciones calculadas por la revisión para elegir el item canónico de cada grupo
+            member_scores = {
+                (member["module"], member["id"]): member["score"]
+                for group in review_result["duplicate_groups"]
+                for member in group.get("members", [])
+            }
             
-            # Fusionar cada grupo de duplicados
-            for primary_id, duplicates in duplicate_groups.items():
-                # Obtener el módulo del item principal
-                module = next((d["item1"]["module"] for d in review_result["potential_duplicates"] 
-                              if d["item1"]["id"] == primary_id), None)
-                
-                if not module:
-                    continue
+            # Planificar la fusión de cada grupo en su item canónico; la revisión ya incluye los textos
+            for members in union_find.groups():
+                canonical_key = max(members, key=lambda key: member_scores.get(key, 0.0))
+                primary_item = duplicate_items[canonical_key]
                 
-                # Obtener el item principal
-                primary_item = db_manager.get_item(
-                    collection_key=module,
-                    id=primary_id
-                )
-                
-                if not primary_item:
-                    continue
-                
-                # Fusionar los duplicados
-                for duplicate in duplicates:
-                    duplicate_id = duplicate["id"]
-                    duplicate_module = duplicate["module"]
-                    
-                    # Obtener el item duplicado
-                    duplicate_item = db_manager.get_item(
-                        collection_key=duplicate_module,
-                        id=duplicate_id
-                    )
-                    
-                    if not duplicate_item:
+                for member in members:
+                    if member == canonical_key:
                         continue
+                    duplicate = duplicate_items[member]
                     
                     # Registrar la fusión
                     merged_duplicates.append({
                         "primary_item": {
-                            "id": primary_id,
-                            "text": primary_item["text"][:100] + "..." if len(primary_item["text"]) > 100 else primary_item["text"],
-                            "module": module
+                            "id": primary_item["id"],
+                            "text": primary_item["text"],
+                            "module": primary_item["module"]
                         },
                         "duplicate_item": {
-                            "id": duplicate_id,
-                            "text": duplicate_item["text"][:100] + "..." if len(duplicate_item["text"]) > 100 else duplicate_item["text"],
-                            "module": duplicate_module
+                            "id": duplicate["id"],
+                            "text": duplicate["text"],
+                            "module": duplicate["module"]
                         }
                     })
                     
-                    # Actualizar el registro de prioridad del duplicado
-                    priority_records = db_manager.list_items(collection_key=COLLECTION_KEY)
-                    priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == duplicate_id and p["metadata"].get("module") == duplicate_module), None)
-                    
-                    if priority_record:
-                        # Marcar como duplicado
-                        updated_metadata = priority_record["metadata"].copy()
-                        updated_metadata["is_duplicate"] = True
-                        updated_metadata["duplicate_of"] = primary_id
-                        updated_metadata["updated_at"] = datetime.now().isoformat()
-                        
-                        db_manager.update_item(
-                            collection_key=COLLECTION_KEY,
-                            id=priority_record["id"],
-                            metadata=updated_metadata
-                        )
+                    # Marcar como duplicado el registro de prioridad del duplicado
+                    patch_record(duplicate["module"], duplicate["id"], {
+                        "is_duplicate": True,
+                        "duplicate_of": primary_item["id"],
+                        "duplicate_of_module": primary_item["module"],
+                        "updated_at": now
+                    })
                     
                     total_items_optimized += 1
         
@@ -356,115 +544,103 @@ async def optimize_priorities(request: PriorityOptimizeRequest):
                     item_id = item["id"]
                     module = item["module"]
                     
-                    # Obtener el item
-                    low_relevance_item = db_manager.get_item(
-                        collection_key=module,
-                        id=item_id
-                    )
-                    
-                    if not low_relevance_item:
-                        continue
-                    
                     # Registrar el archivado
                     archived_items.append({
                         "id": item_id,
-                        "text": low_relevance_item["text"][:100] + "..." if len(low_relevance_item["text"]) > 100 else low_relevance_item["text"],
+                        "text": item["text"],
                         "module": module,
                         "relevance_score": item["relevance_score"]
                     })
                     
-                    # Actualizar el registro de prioridad
-                    priority_records = db_manager.list_items(collection_key=COLLECTION_KEY)
-                    priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == item_id and p["metadata"].get("module") == module), None)
-                    
-                    if priority_record:
-                        # Marcar como archivado
-                        updated_metadata = priority_record["metadata"].copy()
-                        updated_metadata["priority_level"] = "archived"
-                        updated_metadata["updated_at"] = datetime.now().isoformat()
-                        
-                        db_manager.update_item(
-                            collection_key=COLLECTION_KEY,
-                            id=priority_record["id"],
-                            metadata=updated_metadata
-                        )
-                    else:
-                        # Crear un nuevo registro de prioridad
-                        priority_id = generate_id()
-                        
-                        metadata = {
-                            "item_id": item_id,
-                            "module": module,
-                            "priority_level": "archived",
-                            "relevance_score": item["relevance_score"],
-                            "usage_count": 0,
-                            "last_accessed": datetime.now().isoformat(),
-                            "is_duplicate": False,
-                            "duplicate_of": None,
-                            "created_at": datetime.now().isoformat(),
-                            "updated_at": datetime.now().isoformat()
+                    # Marcar como archivado o crear un nuevo registro de prioridad
+                    if not patch_record(module, item_id, {"priority_level": "archived", "updated_at": now}):
+                        new_records[(module, item_id)] = {
+                            "id": generate_id(),
+                            "text": f"Prioridad para item '{item['text'][:50]}...' en módulo '{module}'",
+                            "metadata": {
+                                "item_id": item_id,
+                                "module": module,
+                                "priority_level": "archived",
+                                "relevance_score": item["relevance_score"],
+                                "usage_count": 0,
+                                "last_accessed": now,
+                                "is_duplicate": False,
+                                # ChromaDB no admite valores nulos en los metadatos
+                                "duplicate_of": "",
+                                "created_at": now,
+                                "updated_at": now
+                            }
                         }
-                        
-                        db_manager.add_item(
-                            collection_key=COLLECTION_KEY,
-                            id=priority_id,
-                            text=f"Prioridad para item '{low_relevance_item['text'][:50]}...' en módulo '{module}'",
-                            metadata=metadata
-                        )
                     
                     total_items_optimized += 1
         
-        # Repriorizar items basados en su uso y relevancia
+        # Repriorizar items según su puntuación relativa dentro del módulo
         for module in modules_to_optimize:
-            # Obtener todos los items del módulo
-            items = db_manager.list_items(collection_key=module)
+            # Partir de los metadatos ya modificados por el plan (los archivados no se repriorizan)
+            planned = {}
+            for item_id, priority_record in priority_index.get_module(module).items():
+                metadata = {**priority_record["metadata"], **record_updates.get(priority_record["id"], {})}
+                if metadata.get("priority_level") != "archived":
+                    planned[item_id] = metadata
+            
+            if not planned:
+                continue
+            
+            # Leer en una sola llamada los items que siguen existiendo y puntuarlos a la vez
+            items = list((await async_db_manager.get_items(module, list(planned))).values())
+            scores = await async_db_manager.read_pool.run(scoring_engine.score_items, module, items, planned)
             
             for item in items:
-                # Verificar si ya existe un registro de prioridad
-                priority_records = db_manager.list_items(collection_key=COLLECTION_KEY)
-                priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == item["id"] and p["metadata"].get("module") == module), None)
+                item_id = item["id"]
+                current_priority = planned[item_id].get("priority_level", "medium")
+                new_priority = scores[item_id]["level"]
+                if new_priority == current_priority:
+                    continue
                 
-                if priority_record:
-                    # Calcular nueva prioridad basada en uso y relevancia
-                    usage_count = priority_record["metadata"].get("usage_count", 0)
-                    relevance_score = priority_record["metadata"].get("relevance_score", 0.5)
-                    current_priority = priority_record["metadata"].get("priority_level", "medium")
-                    
-                    # Lógica simple de repriorización
-                    new_priority = current_priority
-                    if usage_count > 10 and relevance_score > 0.7:
-                        new_priority = "high"
-                    elif usage_count < 2 and relevance_score < 0.3:
-                        new_priority = "low"
-                    
-                    # Si la prioridad cambió, actualizar
-                    if new_priority != current_priority and current_priority != "archived":
-                        updated_metadata = priority_record["metadata"].copy()
-                        updated_metadata["priority_level"] = new_priority
-                        updated_metadata["updated_at"] = datetime.now().isoformat()
-                        
-                        db_manager.update_item(
-                            collection_key=COLLECTION_KEY,
-                            id=priority_record["id"],
-                            metadata=updated_metadata
-                        )
-                        
-                        reprioritized_items.append({
-                            "id": item["id"],
-                            "text": item["text"][:100] + "..." if len(item["text"]) > 100 else item["text"],
-                            "module": module,
-                            "old_priority": current_priority,
-                            "new_priority": new_priority
-                        })
-                        
-                        total_items_optimized += 1
+                patch_record(module, item_id, {"priority_level": new_priority, "updated_at": now})
+                
+                reprioritized_items.append({
+                    "id": item_id,
+                    "text": item["text"][:100] + "..." if len(item["text"]) > 100 else item["text"],
+                    "module": module,
+                    "old_priority": current_priority,
+                    "new_priority": new_priority,
+                    "score": scores[item_id]["score"]
+                })
+                
+                total_items_optimized += 1
+        
+        plan = {
+            "record_updates": [{"id": record_id, "metadata": metadata} for record_id, metadata in record_updates.items()],
+            "new_records": list(new_records.values())
+        }
+        
+        # Aplicar el plan con escrituras masivas, salvo en modo de simulación
+        write_errors = []
+        if not request.dry_run:
+            report_progress(0.9, "Aplicando el plan")
+            
+            if plan["record_updates"]:
+                result = await async_db_manager.update_items(
+                    collection_key=COLLECTION_KEY,
+                    items=plan["record_updates"],
+                    merge_metadata=True
+                )
+                write_errors.extend(result["errors"])
+            
+            if plan["new_records"]:
+                result = await async_db_manager.add_items(collection_key=COLLECTION_KEY, items=plan["new_records"])
+                write_errors.extend(result["errors"])
         
         # Retornar resultados
         return {
             "total_items_optimized": total_items_optimized,
             "merged_duplicates": merged_duplicates,
             "archived_items": archived_items,
-            "reprioritized_items": reprioritized_items
+            "reprioritized_items": reprioritized_items,
+            "dry_run": request.dry_run,
+            "plan": plan,
+            "write_errors": write_errors
         }
     except HTTPException:
         raise
@@ -483,30 +659,26 @@ async def list_priorities(
     Lista todos los registros de prioridad.
     """
     try:
-        # Obtener todos los registros
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if module:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("module") == module]
-        
-        if priority_level:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("priority_level") == priority_level]
-        
-        if is_duplicate is not None:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("is_duplicate") == is_duplicate]
-        
-        # Aplicar paginación
-        start_idx = min(offset, len(filtered_items))
-        end_idx = min(start_idx + limit, len(filtered_items))
+        # Compilar los filtros en una cláusula where para ChromaDB
+        where = build_where(
+            equals={
+                "module": module,
+                "priority_level": priority_level,
+                "is_duplicate": is_duplicate
+            }
+        )
         
-        paginated_items = filtered_items[start_idx:end_idx]
+        # Filtrar y paginar directamente en ChromaDB
+        items = await async_db_manager.list_items(
+            collection_key=COLLECTION_KEY,
+            limit=limit,
+            offset=offset,
+            where=where
+        )
         
         return {
-            "items": paginated_items,
-            "total": len(filtered_items)
+            "items": items,
+            "total": await async_db_manager.count_items(collection_key=COLLECTION_KEY, where=where)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar prioridades: {str(e)}")
@@ -519,7 +691,7 @@ async def get_priority(
     Obtiene un registro de prioridad específico.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=priority_id
         )
@@ -541,7 +713,7 @@ async def delete_priority(
     Elimina un registro de prioridad.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=priority_id
         )
@@ -2,9 +2,13 @@ from fastapi import APIRouter, HTTPException, Query, Path, Depends
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
-from app.database import db_manager
+from app.database import async_db_manager
+from app.utils.filters import build_where
+from app.utils.usage_tracker import usage_tracker
+from app.utils.scoring import scoring_engine, rerank
+from app.utils.similarity import distance_to_similarity
 from app.models.schemas import (
-    Item, ReminderItemCreate, ReminderItemUpdate, 
+    Item, BulkWriteResult, ReminderBulkCreate, ReminderItemCreate, ReminderItemUpdate, 
     ItemList, QueryResult, generate_id
 )
 
@@ -24,7 +28,7 @@ async def create_reminder_item(item: ReminderItemCreate):
     item_id = generate_id()
     
     try:
-        result = db_manager.add_item(
+        result = await async_db_manager.add_item(
             collection_key=COLLECTION_KEY,
             id=item_id,
             text=item.text,
@@ -39,6 +43,24 @@ async def create_reminder_item(item: ReminderItemCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear el recordatorio: {str(e)}")
 
+@router.post("/bulk", response_model=BulkWriteResult, status_code=201)
+async def bulk_create_reminder_items(request: ReminderBulkCreate):
+    """
+    Crea varios recordatorios en una sola solicitud.
+    
+    Los textos se codifican y se guardan por lotes. Los items que fallan se
+    reportan en `errors` con su posición en la solicitud, sin detener el resto.
+    """
+    try:
+        items = [
+            {"id": generate_id(), "text": item.text, "metadata": item.metadata}
+            for item in request.items
+        ]
+        
+        return await async_db_manager.add_items(collection_key=COLLECTION_KEY, items=items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al crear los recordatorios: {str(e)}")
+
 @router.get("/", response_model=ItemList)
 async def list_reminder_items(
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de items a retornar"),
@@ -51,30 +73,26 @@ async def list_reminder_items(
     Lista todos los recordatorios y URLs.
     """
     try:
-        # Obtener todos los items
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if type:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("type") == type]
-        
-        if priority:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("priority") == priority]
-        
-        if status:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("status") == status]
-        
-        # Aplicar paginación
-        start_idx = min(offset, len(filtered_items))
-        end_idx = min(start_idx + limit, len(filtered_items))
+        # Compilar los filtros en una cláusula where para ChromaDB
+        where = build_where(
+            equals={
+                "type": type,
+                "priority": priority,
+                "status": status
+            }
+        )
         
-        paginated_items = filtered_items[start_idx:end_idx]
+        # Filtrar y paginar directamente en ChromaDB
+        items = await async_db_manager.list_items(
+            collection_key=COLLECTION_KEY,
+            limit=limit,
+            offset=offset,
+            where=where
+        )
         
         return {
-            "items": paginated_items,
-            "total": len(filtered_items)
+            "items": items,
+            "total": await async_db_manager.count_items(collection_key=COLLECTION_KEY, where=where)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar los recordatorios: {str(e)}")
@@ -85,29 +103,23 @@ async def search_reminder_items(
     n_results: int = Query(5, ge=1, le=100, description="Número de resultados a retornar"),
     type: Optional[str] = Query(None, description="Filtrar por tipo (reminder, url)"),
     priority: Optional[str] = Query(None, description="Filtrar por prioridad"),
-    status: Optional[str] = Query(None, description="Filtrar por estado")
+    status: Optional[str] = Query(None, description="Filtrar por estado"),
+    priority_weight: float = Query(0.0, ge=0.0, le=1.0, description="Peso de la puntuación de prioridad en el orden de los resultados (0 = solo similitud)")
 ):
     """
     Busca recordatorios y URLs por similitud semántica.
     """
     try:
-        # Construir el filtro si se proporcionan parámetros
-        filter_dict = {}
-        
-        if type:
-            filter_dict["type"] = type
-        
-        if priority:
-            filter_dict["priority"] = priority
-        
-        if status:
-            filter_dict["status"] = status
-        
-        # Si no hay filtros, establecer a None
-        if not filter_dict:
-            filter_dict = None
+        # Compilar los filtros en una cláusula where para ChromaDB
+        filter_dict = build_where(
+            equals={
+                "type": type,
+                "priority": priority,
+                "status": status
+            }
+        )
         
-        results = db_manager.query_items(
+        results = await async_db_manager.query_items(
             collection_key=COLLECTION_KEY,
             query_text=query,
             n_results=n_results,
@@ -116,6 +128,7 @@ async def search_reminder_items(
         
         # Construir la respuesta
         items = []
+        distances = results["distances"][0]
         for i in range(len(results["ids"][0])):
             items.append({
                 "id": results["ids"][0][i],
@@ -123,9 +136,19 @@ async def search_reminder_items(
                 "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
             })
         
+        # Reordenar combinando la similitud con la puntuación de prioridad de cada item
+        if priority_weight > 0 and items:
+            scores = await async_db_manager.read_pool.run(scoring_engine.score_items, COLLECTION_KEY, items)
+            order = rerank(items, distance_to_similarity(distances), scores, priority_weight)
+            items = [items[i] for i in order]
+            distances = [distances[i] for i in order]
+        
+        # Registrar el acceso a los items retornados (se vuelca en segundo plano)
+        usage_tracker.record(COLLECTION_KEY, [item["id"] for item in items])
+        
         return {
             "items": items,
-            "distances": results["distances"][0]
+            "distances": distances
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al buscar recordatorios: {str(e)}")
@@ -138,7 +161,7 @@ async def get_reminder_item(
     Obtiene un recordatorio o URL específico.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
@@ -146,6 +169,9 @@ async def get_reminder_item(
         if not item:
             raise HTTPException(status_code=404, detail=f"Recordatorio con ID '{item_id}' no encontrado")
         
+        # Registrar el acceso al item
+        usage_tracker.record(COLLECTION_KEY, [item_id])
+        
         return item
     except HTTPException:
         raise
@@ -162,7 +188,7 @@ async def update_reminder_item(
     """
     try:
         # Verificar que el item existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
@@ -178,7 +204,7 @@ async def update_reminder_item(
             metadata["updated_at"] = datetime.now().isoformat()
         
         # Actualizar el item
-        updated_item = db_manager.update_item(
+        updated_item = await async_db_manager.update_item(
             collection_key=COLLECTION_KEY,
             id=item_id,
             text=item_update.text,
@@ -199,7 +225,7 @@ async def delete_reminder_item(
     Elimina un recordatorio o URL.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=item_id
         )
@@ -4,9 +4,10 @@ from datetime import datetime
 import uuid
 import json
 
-from app.database import db_manager
+from app.database import async_db_manager
 from app.utils.auth import validate_access
 from app.utils.logger import logger
+from app.utils.usage_tracker import usage_tracker
 from app.models.schemas import Item, ItemList, QueryResult
 
 router = APIRouter(
@@ -34,12 +35,12 @@ async def query_data(
         
         # Validar que la colección existe
         try:
-            db_manager.get_collection(collection_key)
+            async_db_manager.get_collection(collection_key)
         except ValueError:
             raise HTTPException(status_code=404, detail=f"Colección '{collection_key}' no encontrada")
         
         # Realizar la consulta
-        results = db_manager.query_items(
+        results = await async_db_manager.query_items(
             collection_key=collection_key,
             query_text=query["text"],
             n_results=n_results,
@@ -55,6 +56,9 @@ async def query_data(
                 "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
             })
         
+        # Registrar el acceso a los items retornados (se vuelca en segundo plano)
+        usage_tracker.record(collection_key, [item["id"] for item in items])
+        
         logger.info("Consulta de SofIA procesada", {
             "collection": collection_key,
             "query": query["text"],
@@ -89,7 +93,7 @@ async def store_data(
         
         # Validar que la colección existe
         try:
-            db_manager.get_collection(collection_key)
+            async_db_manager.get_collection(collection_key)
         except ValueError:
             raise HTTPException(status_code=404, detail=f"Colección '{collection_key}' no encontrada")
         
@@ -103,7 +107,7 @@ async def store_data(
         metadata["source"] = "sofia"
         
         # Almacenar los datos
-        result = db_manager.add_item(
+        result = await async_db_manager.add_item(
             collection_key=collection_key,
             id=item_id,
             text=text,
@@ -134,12 +138,12 @@ async def update_data(
     try:
         # Validar que la colección existe
         try:
-            db_manager.get_collection(collection_key)
+            async_db_manager.get_collection(collection_key)
         except ValueError:
             raise HTTPException(status_code=404, detail=f"Colección '{collection_key}' no encontrada")
         
         # Verificar que el item existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=collection_key,
             id=item_id
         )
@@ -159,7 +163,7 @@ async def update_data(
             metadata["last_update_source"] = "sofia"
         
         # Actualizar el item
-        result = db_manager.update_item(
+        result = await async_db_manager.update_item(
             collection_key=collection_key,
             id=item_id,
             text=text,
@@ -193,12 +197,12 @@ async def delete_data(
     try:
         # Validar que la colección existe
         try:
-            db_manager.get_collection(collection_key)
+            async_db_manager.get_collection(collection_key)
         except ValueError:
             raise HTTPException(status_code=404, detail=f"Colección '{collection_key}' no encontrada")
         
         # Eliminar el item
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=collection_key,
             id=item_id
         )
@@ -224,7 +228,7 @@ async def list_collections():
     Lista todas las colecciones disponibles para SofIA.
     """
     try:
-        collections = db_manager.collections
+        collections = async_db_manager.collections
         return collections
     except Exception as e:
         logger.error(f"Error al listar colecciones para SofIA: {str(e)}")
@@ -257,7 +261,7 @@ async def batch_operation(
                     n_results = op.get("n_results", 5)
                     filter_dict = op.get("filter", None)
                     
-                    query_results = db_manager.query_items(
+                    query_results = await async_db_manager.query_items(
                         collection_key=collection_key,
                         query_text=op["query"],
                         n_results=n_results,
@@ -299,7 +303,7 @@ async def batch_operation(
                     metadata["updated_at"] = datetime.now().isoformat()
                     metadata["source"] = "sofia_batch"
                     
-                    store_result = db_manager.add_item(
+                    store_result = await async_db_manager.add_item(
                         collection_key=collection_key,
                         id=item_id,
                         text=text,
@@ -322,7 +326,7 @@ async def batch_operation(
                     item_id = op["id"]
                     
                     # Verificar que el item existe
-                    existing_item = db_manager.get_item(
+                    existing_item = await async_db_manager.get_item(
                         collection_key=collection_key,
                         id=item_id
                     )
@@ -341,7 +345,7 @@ async def batch_operation(
                         metadata["updated_at"] = datetime.now().isoformat()
                         metadata["last_update_source"] = "sofia_batch"
                     
-                    update_result = db_manager.update_item(
+                    update_result = await async_db_manager.update_item(
                         collection_key=collection_key,
                         id=item_id,
                         text=text,
@@ -363,7 +367,7 @@ async def batch_operation(
                     collection_key = op["collection"]
                     item_id = op["id"]
                     
-                    delete_result = db_manager.delete_item(
+                    delete_result = await async_db_manager.delete_item(
                         collection_key=collection_key,
                         id=item_id
                     )
@@ -419,35 +423,29 @@ async def consolidate_data(
         if not query:
             raise HTTPException(status_code=400, detail="Se requiere un texto de consulta para consolidar datos")
         
-        consolidated_results = []
-        
-        # Consultar cada colección
-        for collection in collections:
-            try:
-                results = db_manager.query_items(
-                    collection_key=collection,
-                    query_text=query,
-                    n_results=limit
-                )
-                
-                # Añadir los resultados al consolidado
-                for i in range(len(results["ids"][0])):
-                    consolidated_results.append({
-                        "collection": collection,
-                        "id": results["ids"][0][i],
-                        "text": results["documents"][0][i],
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                        "similarity": results["distances"][0][i]
-                    })
-            except Exception as e:
-                logger.warning(f"Error al consultar colección {collection}: {str(e)}")
-                # Continuar con las demás colecciones a pesar del error
-        
-        # Ordenar por similitud (menor distancia es más similar)
-        consolidated_results.sort(key=lambda x: x["similarity"])
+        # Codificar la consulta una vez y consultar todas las colecciones en paralelo
+        results = await async_db_manager.query_many(
+            collection_keys=collections,
+            query_text=query,
+            n_results=limit,
+            limit=limit
+        )
         
-        # Limitar al número solicitado
-        consolidated_results = consolidated_results[:limit]
+        for collection, error in results["errors"].items():
+            # Continuar con las demás colecciones a pesar del error
+            logger.warning(f"Error al consultar colección {collection}: {error}")
+        
+        # Resultados ya ordenados globalmente (menor distancia es más similar)
+        consolidated_results = [
+            {
+                "collection": hit["collection"],
+                "id": hit["id"],
+                "text": hit["text"],
+                "metadata": hit["metadata"],
+                "similarity": hit["distance"]
+            }
+            for hit in results["items"]
+        ]
         
         logger.info("Consolidación de datos para SofIA completada", {
             "query": query,
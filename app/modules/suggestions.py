@@ -1,15 +1,23 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Depends, Body
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-from collections import Counter, defaultdict
+import uuid
+from collections import Counter
+from itertools import combinations
 
-from app.database import db_manager
+from app.database import async_db_manager
+from app.utils.filters import build_where
+from app.utils.jobs import report_progress
+from app.utils.snapshots import snapshot_cache
+from app.utils.theme_model import theme_model
+from app.utils.knn_graph import knn_graph
+from app.utils.similarity import normalize_embeddings, strongest_cross_links
+from app.config import CONNECTION_LINKS_PER_PAIR, INACTIVE_AFTER_DAYS
 from app.models.schemas import (
     Item, SuggestionItemCreate, SuggestionItemUpdate,
     SuggestionRequest, SuggestionAnalysisRequest, SuggestionResult,
-    ItemList, QueryResult, generate_id
+    ItemList, QueryResult
 )
-from app.utils.embeddings import get_embedding_model
 
 router = APIRouter(
     prefix="/sugerencias",
@@ -19,6 +27,78 @@ router = APIRouter(
 
 COLLECTION_KEY = "suggestions"
 
+# Espacio de nombres de los IDs deterministas de las sugerencias
+SUGGESTION_NAMESPACE = uuid.UUID("6f1c2d4e-8b3a-5c7d-9e0f-1a2b3c4d5e6f")
+
+# Módulos que se pueden analizar
+VALID_MODULES = ["identity", "business", "reminders", "learnings"]
+
+def suggestion_sources(request: SuggestionRequest) -> List[str]:
+    """
+    Colecciones que lee el análisis: los módulos analizados y las sugerencias guardadas.
+
+    Los registros de prioridad solo se leen para las sugerencias "action".
+    Los volcados de contadores de uso no cambian la versión de los datos,
+    así que los accesos no invalidan la instantánea.
+    """
+    sources = (request.modules or VALID_MODULES) + [COLLECTION_KEY]
+    if not request.suggestion_types or "action" in request.suggestion_types:
+        sources.append("priorities")
+    return sources
+
+async def matrix_cross_links(modules: List[str]) -> List[tuple]:
+    """
+    Enlaces más fuertes entre items de módulos distintos, calculados sobre todos sus embeddings.
+
+    Retorna la misma forma que `KnnGraph.cross_links`. Solo se usa mientras
+    el grafo kNN se construye, porque lee los módulos completos.
+    """
+    matrices = {}
+    ids = {}
+    for module in modules:
+        items = await async_db_manager.list_items(
+            collection_key=module,
+            limit=None,
+            include_documents=False,
+            include_embeddings=True
+        )
+        if items:
+            ids[module] = [item["id"] for item in items]
+            matrices[module] = await async_db_manager.read_pool.run(
+                normalize_embeddings, [item["embedding"] for item in items]
+            )
+    
+    links = []
+    for module1, module2 in combinations(sorted(matrices), 2):
+        pairs = await async_db_manager.read_pool.run(
+            strongest_cross_links, matrices[module1], matrices[module2], CONNECTION_LINKS_PER_PAIR, 0.7
+        )
+        links.extend(((module1, ids[module1][i]), (module2, ids[module2][j]), similarity) for i, j, similarity in pairs)
+    return links
+
+async def save_suggestion(suggestion_text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda una sugerencia con un ID derivado de su tipo y su texto.
+    
+    Si la misma sugerencia ya se guardó en un análisis anterior se retorna
+    la existente (conservando su estado de implementación) sin duplicarla.
+    
+    ChromaDB solo admite metadatos escalares: `source_modules` y
+    `source_items` se guardan separados por comas y `implementation_date`
+    vacía mientras no se implemente.
+    """
+    suggestion_id = str(uuid.uuid5(SUGGESTION_NAMESPACE, f"{metadata['type']}:{suggestion_text}"))
+    existing = await async_db_manager.get_item(collection_key=COLLECTION_KEY, id=suggestion_id)
+    if existing:
+        return existing
+    
+    return await async_db_manager.add_item(
+        collection_key=COLLECTION_KEY,
+        id=suggestion_id,
+        text=suggestion_text,
+        metadata=metadata
+    )
+
 @router.post("/obtener", response_model=SuggestionResult)
 async def get_suggestions(request: SuggestionRequest):
     """
@@ -28,10 +108,17 @@ async def get_suggestions(request: SuggestionRequest):
     1. Analiza los datos en los módulos especificados
     2. Identifica patrones y tendencias
     3. Genera sugerencias basadas en el análisis
+    
+    Si los módulos analizados no han cambiado desde el último análisis con
+    los mismos parámetros, se retorna la instantánea guardada (`cached`).
     """
+    return await snapshot_cache.get_or_compute("sugerencias.obtener", request)
+
+async def compute_suggestions(request: SuggestionRequest):
+    """Calcula las sugerencias de `/obtener` sin pasar por la caché de instantáneas."""
     try:
         # Definir los módulos a analizar
-        valid_modules = ["identity", "business", "reminders", "learnings"]
+        valid_modules = VALID_MODULES
         modules_to_analyze = request.modules if request.modules else valid_modules
         
         # Validar que los módulos son válidos
@@ -52,35 +139,25 @@ async def get_suggestions(request: SuggestionRequest):
         by_type = {t: 0 for t in valid_types}
         analysis_summary = "Análisis de datos:\n\n"
         
-        # Recopilar datos de todos los módulos
-        all_data = {}
-        for module in modules_to_analyze:
-            all_data[module] = db_manager.list_items(collection_key=module)
+        # Los análisis leen de los índices en memoria (modelo de temas, registros de
+        # prioridad, grafo kNN) en lugar de cargar las colecciones completas
         
         # Análisis 1: Identificar temas frecuentes
-        all_texts = []
-        for module, items in all_data.items():
-            all_texts.extend([item["text"] for item in items])
-        
-        # Usar el modelo de embeddings para agrupar textos similares
-        if all_texts:
-            embedding_model = get_embedding_model()
-            embeddings = embedding_model.encode(all_texts)
-            
-            # Agrupar textos similares (implementación simplificada)
-            clusters = defaultdict(list)
-            for i, text in enumerate(all_texts):
-                # Asignar cada texto a un grupo basado en similitud
-                # (En una implementación real, usaríamos un algoritmo de clustering)
-                cluster_id = i % 5  # Simplificación: asignar a 5 grupos
-                clusters[cluster_id].append(text)
-            
-            # Identificar temas principales
+        report_progress(0.25, "Identificando temas frecuentes")
+        
+        # Leer los temas del modelo incremental (O(k), sin reagrupar el corpus);
+        # antes se aplican las escrituras pendientes para que reflejen los datos actuales
+        await async_db_manager.read_pool.run(theme_model.apply_pending)
+        themes = await async_db_manager.read_pool.run(theme_model.themes, modules_to_analyze)
+        if themes:
+            # Cada tema se representa por el item más cercano a su centroide
             main_themes = []
-            for cluster_id, texts in clusters.items():
-                if len(texts) > 1:
-                    # Seleccionar el texto más representativo del grupo
-                    main_themes.append(texts[0][:100] + "...")
+            theme_items = []
+            for theme in themes:
+                if theme["size"] > 1:
+                    representative = theme["representative"]
+                    main_themes.append(representative["text"][:100] + "...")
+                    theme_items.append(representative["id"])
             
             # Añadir al resumen
             analysis_summary += "Temas principales identificados:\n"
@@ -90,29 +167,23 @@ async def get_suggestions(request: SuggestionRequest):
             
             # Generar sugerencias de tipo "insight" basadas en temas
             if "insight" in suggestion_types and main_themes:
-                for theme in main_themes[:min(2, request.max_suggestions)]:
-                    suggestion_id = generate_id()
+                for theme, medoid_id in list(zip(main_themes, theme_items))[:min(2, request.max_suggestions)]:
                     suggestion_text = f"Se ha identificado un tema recurrente: '{theme}'. Considera profundizar en este tema."
                     
                     metadata = {
                         "type": "insight",
                         "context": "análisis de temas",
                         "relevance_score": 0.8,
-                        "source_modules": modules_to_analyze,
-                        "source_items": [],
+                        "source_modules": ",".join(modules_to_analyze),
+                        "source_items": medoid_id,
                         "is_implemented": False,
-                        "implementation_date": None,
+                        "implementation_date": "",
                         "created_at": datetime.now().isoformat(),
                         "updated_at": datetime.now().isoformat()
                     }
                     
                     # Guardar la sugerencia
-                    result = db_manager.add_item(
-                        collection_key=COLLECTION_KEY,
-                        id=suggestion_id,
-                        text=suggestion_text,
-                        metadata=metadata
-                    )
+                    result = await save_suggestion(suggestion_text, metadata)
                     
                     suggestions.append({
                         "id": result["id"],
@@ -123,56 +194,58 @@ async def get_suggestions(request: SuggestionRequest):
                     by_type["insight"] += 1
         
         # Análisis 2: Identificar items sin actividad reciente
+        report_progress(0.5, "Identificando items sin actividad reciente")
         if "action" in suggestion_types:
             inactive_items = []
+            cutoff = datetime.now().timestamp() - INACTIVE_AFTER_DAYS * 86400
             
-            for module, items in all_data.items():
-                for item in items:
-                    # Verificar si tiene registro de prioridad
-                    priority_records = db_manager.list_items(collection_key="priorities")
-                    priority_record = next((p for p in priority_records if p["metadata"].get("item_id") == item["id"] and p["metadata"].get("module") == module), None)
-                    
-                    if priority_record:
-                        last_accessed = priority_record["metadata"].get("last_accessed")
-                        if last_accessed:
-                            # Simplificación: comparar solo la fecha (no la hora)
-                            last_date = last_accessed.split("T")[0]
-                            today = datetime.now().isoformat().split("T")[0]
-                            
-                            # Si la fecha es diferente, considerar como inactivo
-                            if last_date != today:
-                                inactive_items.append({
-                                    "id": item["id"],
-                                    "text": item["text"],
-                                    "module": module
-                                })
+            for module in modules_to_analyze:
+                # Registros de prioridad sin acceso desde el corte: una consulta por rango por módulo
+                stale_records = await async_db_manager.list_items(
+                    collection_key="priorities",
+                    limit=None,
+                    where=build_where(equals={"module": module}, maximums={"last_accessed_ts": cutoff}),
+                    include_documents=False
+                )
+                
+                # Leer por ID solo los items señalados, sin depender del listado del módulo
+                items_by_id = await async_db_manager.get_items(
+                    collection_key=module,
+                    ids=[record["metadata"]["item_id"] for record in stale_records if record["metadata"].get("item_id")]
+                )
+                for record in stale_records:
+                    item = items_by_id.get(record["metadata"].get("item_id"))
+                    if item:
+                        inactive_items.append({
+                            "id": item["id"],
+                            "text": item["text"],
+                            "module": module,
+                            "last_accessed_ts": record["metadata"]["last_accessed_ts"]
+                        })
+            
+            # Primero los items que llevan más tiempo sin usarse
+            inactive_items.sort(key=lambda inactive_item: inactive_item["last_accessed_ts"])
             
             # Generar sugerencias de tipo "action" basadas en items inactivos
             if inactive_items:
                 # Limitar a 2 sugerencias de este tipo
                 for inactive_item in inactive_items[:min(2, request.max_suggestions - len(suggestions))]:
-                    suggestion_id = generate_id()
                     suggestion_text = f"Revisa y actualiza el item: '{inactive_item['text'][:100]}...'"
                     
                     metadata = {
                         "type": "action",
                         "context": "items inactivos",
                         "relevance_score": 0.7,
-                        "source_modules": [inactive_item["module"]],
-                        "source_items": [inactive_item["id"]],
+                        "source_modules": inactive_item["module"],
+                        "source_items": inactive_item["id"],
                         "is_implemented": False,
-                        "implementation_date": None,
+                        "implementation_date": "",
                         "created_at": datetime.now().isoformat(),
                         "updated_at": datetime.now().isoformat()
                     }
                     
                     # Guardar la sugerencia
-                    result = db_manager.add_item(
-                        collection_key=COLLECTION_KEY,
-                        id=suggestion_id,
-                        text=suggestion_text,
-                        metadata=metadata
-                    )
+                    result = await save_suggestion(suggestion_text, metadata)
                     
                     suggestions.append({
                         "id": result["id"],
@@ -183,48 +256,46 @@ async def get_suggestions(request: SuggestionRequest):
                     by_type["action"] += 1
         
         # Análisis 3: Identificar posibles conexiones entre módulos
+        report_progress(0.75, "Identificando conexiones entre módulos")
         if "connection" in suggestion_types and len(modules_to_analyze) > 1:
-            # Seleccionar items representativos de cada módulo
-            representative_items = {}
-            for module, items in all_data.items():
-                if items:
-                    # Simplificación: seleccionar los primeros 5 items
-                    representative_items[module] = items[:5]
+            # Enlaces más fuertes de cada par de módulos según las listas del grafo kNN
+            links = await async_db_manager.read_pool.run(
+                knn_graph.cross_links, modules_to_analyze, 0.7, CONNECTION_LINKS_PER_PAIR
+            )
+            if links is None:
+                # Grafo aún en construcción: cálculo exacto sobre los embeddings de los módulos
+                links = await matrix_cross_links(modules_to_analyze)
+            links.sort(key=lambda link: link[2], reverse=True)
+            links = links[:max(0, min(2, request.max_suggestions - len(suggestions)))]
             
-            # Buscar conexiones entre módulos
-            potential_connections = []
+            # Textos de los items enlazados: una lectura por ID por módulo
+            linked_ids = {}
+            for item1, item2, _ in links:
+                for module, item_id in (item1, item2):
+                    linked_ids.setdefault(module, []).append(item_id)
+            texts = {}
+            for module, ids in linked_ids.items():
+                found = await async_db_manager.get_items(collection_key=module, ids=ids)
+                texts.update({(module, item_id): item["text"] for item_id, item in found.items()})
             
-            for module1, items1 in representative_items.items():
-                for module2, items2 in representative_items.items():
-                    # Evitar comparar un módulo consigo mismo
-                    if module1 >= module2:
-                        continue
-                    
-                    for item1 in items1:
-                        for item2 in items2:
-                            # Comparar textos usando el modelo de embeddings
-                            embedding_model = get_embedding_model()
-                            embedding1 = embedding_model.encode(item1["text"])
-                            embedding2 = embedding_model.encode(item2["text"])
-                            
-                            # Calcular similitud coseno
-                            similarity = embedding_model.util.cos_sim(embedding1, embedding2).item()
-                            
-                            # Si la similitud supera el umbral, registrar como posible conexión
-                            if similarity >= 0.7:
-                                potential_connections.append({
-                                    "item1": {
-                                        "id": item1["id"],
-                                        "text": item1["text"][:100] + "..." if len(item1["text"]) > 100 else item1["text"],
-                                        "module": module1
-                                    },
-                                    "item2": {
-                                        "id": item2["id"],
-                                        "text": item2["text"][:100] + "..." if len(item2["text"]) > 100 else item2["text"],
-                                        "module": module2
-                                    },
-                                    "similarity": similarity
-                                })
+            potential_connections = []
+            for item1, item2, similarity in links:
+                if item1 not in texts or item2 not in texts:
+                    continue
+                text1, text2 = texts[item1], texts[item2]
+                potential_connections.append({
+                    "item1": {
+                        "id": item1[1],
+                        "text": text1[:100] + "..." if len(text1) > 100 else text1,
+                        "module": item1[0]
+                    },
+                    "item2": {
+                        "id": item2[1],
+                        "text": text2[:100] + "..." if len(text2) > 100 else text2,
+                        "module": item2[0]
+                    },
+                    "similarity": similarity
+                })
             
             # Generar sugerencias de tipo "connection" basadas en conexiones potenciales
             if potential_connections:
@@ -232,28 +303,22 @@ async def get_suggestions(request: SuggestionRequest):
                 sorted_connections = sorted(potential_connections, key=lambda x: x["similarity"], reverse=True)
                 
                 for connection in sorted_connections[:min(2, request.max_suggestions - len(suggestions))]:
-                    suggestion_id = generate_id()
                     suggestion_text = f"Se ha detectado una posible conexión entre '{connection['item1']['text']}' y '{connection['item2']['text']}'"
                     
                     metadata = {
                         "type": "connection",
                         "context": "conexiones entre módulos",
                         "relevance_score": connection["similarity"],
-                        "source_modules": [connection["item1"]["module"], connection["item2"]["module"]],
-                        "source_items": [connection["item1"]["id"], connection["item2"]["id"]],
+                        "source_modules": f"{connection['item1']['module']},{connection['item2']['module']}",
+                        "source_items": f"{connection['item1']['id']},{connection['item2']['id']}",
                         "is_implemented": False,
-                        "implementation_date": None,
+                        "implementation_date": "",
                         "created_at": datetime.now().isoformat(),
                         "updated_at": datetime.now().isoformat()
                     }
                     
                     # Guardar la sugerencia
-                    result = db_manager.add_item(
-                        collection_key=COLLECTION_KEY,
-                        id=suggestion_id,
-                        text=suggestion_text,
-                        metadata=metadata
-                    )
+                    result = await save_suggestion(suggestion_text, metadata)
                     
                     suggestions.append({
                         "id": result["id"],
@@ -301,30 +366,28 @@ async def list_suggestions(
     Muestra el historial de recomendaciones generadas.
     """
     try:
-        # Obtener todas las sugerencias
-        all_items = db_manager.list_items(collection_key=COLLECTION_KEY)
-        
-        # Aplicar filtros si se proporcionan
-        filtered_items = all_items
-        
-        if type:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("type") == type]
-        
-        if is_implemented is not None:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("is_implemented") == is_implemented]
-        
-        if min_relevance > 0.0:
-            filtered_items = [item for item in filtered_items if item["metadata"].get("relevance_score", 0.0) >= min_relevance]
-        
-        # Aplicar paginación
-        start_idx = min(offset, len(filtered_items))
-        end_idx = min(start_idx + limit, len(filtered_items))
+        # Compilar los filtros en una cláusula where para ChromaDB
+        where = build_where(
+            equals={
+                "type": type,
+                "is_implemented": is_implemented
+            },
+            minimums={
+                "relevance_score": min_relevance or None
+            }
+        )
         
-        paginated_items = filtered_items[start_idx:end_idx]
+        # Filtrar y paginar directamente en ChromaDB
+        items = await async_db_manager.list_items(
+            collection_key=COLLECTION_KEY,
+            limit=limit,
+            offset=offset,
+            where=where
+        )
         
         return {
-            "items": paginated_items,
-            "total": len(filtered_items)
+            "items": items,
+            "total": await async_db_manager.count_items(collection_key=COLLECTION_KEY, where=where)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar sugerencias: {str(e)}")
@@ -386,7 +449,7 @@ async def update_suggestion(
     """
     try:
         # Verificar que la sugerencia existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id
         )
@@ -402,7 +465,7 @@ async def update_suggestion(
             metadata["updated_at"] = datetime.now().isoformat()
         
         # Actualizar el item
-        updated_item = db_manager.update_item(
+        updated_item = await async_db_manager.update_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id,
             text=item_update.text if item_update.text is not None else existing_item["text"],
@@ -424,7 +487,7 @@ async def mark_as_implemented(
     """
     try:
         # Verificar que la sugerencia existe
-        existing_item = db_manager.get_item(
+        existing_item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id
         )
@@ -439,7 +502,7 @@ async def mark_as_implemented(
         metadata["updated_at"] = datetime.now().isoformat()
         
         # Actualizar el item
-        updated_item = db_manager.update_item(
+        updated_item = await async_db_manager.update_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id,
             metadata=metadata
@@ -459,7 +522,7 @@ async def get_suggestion(
     Obtiene una sugerencia específica.
     """
     try:
-        item = db_manager.get_item(
+        item = await async_db_manager.get_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id
         )
@@ -481,7 +544,7 @@ async def delete_suggestion(
     Elimina una sugerencia.
     """
     try:
-        result = db_manager.delete_item(
+        result = await async_db_manager.delete_item(
             collection_key=COLLECTION_KEY,
             id=suggestion_id
         )
@@ -490,4 +553,7 @@ async def delete_suggestion(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al eliminar la sugerencia: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al eliminar la sugerencia: {str(e)}") 
+
+# Las sugerencias se memorizan por las versiones de los datos que leen
+snapshot_cache.register("sugerencias.obtener", SuggestionRequest, compute_suggestions, suggestion_sources)
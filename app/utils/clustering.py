@@ -0,0 +1,92 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+from app.config import THEME_MAX_CLUSTERS, THEME_SAMPLE_SIZE, THEME_ASSIGN_BATCH_SIZE
+from app.utils.similarity import normalize_embeddings
+
+# Máximo de puntos usados para calcular el coeficiente de silueta de cada k
+SILHOUETTE_SAMPLE_SIZE = 2000
+
+def choose_kmeans(sample: np.ndarray, k_min: int, k_max: int, random_state: int) -> MiniBatchKMeans:
+    """
+    Ajusta MiniBatchKMeans para cada k en [k_min, k_max] sobre la muestra y
+    retorna el modelo con mayor coeficiente de silueta.
+    """
+    k_max = min(k_max, len(sample) - 1)
+    best_model, best_score = None, -np.inf
+
+    for k in range(max(k_min, 2), k_max + 1):
+        model = MiniBatchKMeans(n_clusters=k, batch_size=1024, n_init=3, random_state=random_state)
+        labels = model.fit_predict(sample)
+        if len(np.unique(labels)) < 2:
+            continue
+
+        score = silhouette_score(
+            sample, labels, metric="cosine",
+            sample_size=min(len(sample), SILHOUETTE_SAMPLE_SIZE), random_state=random_state
+        )
+        if score > best_score:
+            best_model, best_score = model, score
+
+    return best_model
+
+def discover_themes(
+    embeddings,
+    n_clusters: Optional[int] = None,
+    max_clusters: int = THEME_MAX_CLUSTERS,
+    sample_size: int = THEME_SAMPLE_SIZE,
+    batch_size: int = THEME_ASSIGN_BATCH_SIZE,
+    random_state: int = 42
+) -> Dict[str, Any]:
+    """
+    Agrupa embeddings en temas con MiniBatchKMeans.
+
+    El modelo se ajusta sobre una muestra de como máximo `sample_size`
+    vectores; si no se indica `n_clusters`, k se elige entre 2 y
+    `max_clusters` por coeficiente de silueta. Después todos los vectores se
+    asignan al centroide más cercano por lotes de `batch_size`. Cada tema se
+    representa por su medoide: el miembro más cercano al centroide.
+
+    Retorna {"labels": array con el tema de cada vector, "themes": [{"label",
+    "size", "medoid"}]} con los temas ordenados de mayor a menor tamaño.
+    """
+    matrix = normalize_embeddings(embeddings)
+    n_items = len(matrix)
+    if n_items < 3:
+        return {"labels": np.zeros(n_items, dtype=np.int64), "themes": []}
+
+    rng = np.random.default_rng(random_state)
+    sample = matrix[rng.choice(n_items, size=min(n_items, sample_size), replace=False)]
+
+    if n_clusters:
+        model = MiniBatchKMeans(n_clusters=min(n_clusters, len(sample)), batch_size=1024, n_init=3, random_state=random_state)
+        model.fit(sample)
+    else:
+        model = choose_kmeans(sample, 2, max_clusters, random_state)
+        if model is None:
+            return {"labels": np.zeros(n_items, dtype=np.int64), "themes": []}
+
+    centroids = normalize_embeddings(model.cluster_centers_)
+
+    # Asignar todos los vectores por lotes: similitud coseno con cada centroide
+    labels = np.empty(n_items, dtype=np.int64)
+    similarities = np.empty(n_items, dtype=np.float32)
+    for start in range(0, n_items, batch_size):
+        block = matrix[start:start + batch_size] @ centroids.T
+        labels[start:start + batch_size] = block.argmax(axis=1)
+        similarities[start:start + batch_size] = block.max(axis=1)
+
+    # Medoide de cada tema: ordenar por (tema, -similitud) y tomar el primero de cada tema
+    order = np.lexsort((-similarities, labels))
+    theme_labels, first, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+
+    themes = [
+        {"label": int(label), "size": int(size), "medoid": int(order[start])}
+        for label, start, size in zip(theme_labels, first, sizes)
+    ]
+    themes.sort(key=lambda theme: theme["size"], reverse=True)
+
+    return {"labels": labels, "themes": themes}
@@ -0,0 +1,298 @@
+import heapq
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database import db_manager
+
+CONNECTION_COLLECTION_KEY = "connections"
+
+Node = Tuple[str, str]
+
+class ConnectionGraph:
+    """
+    Índice de adyacencia en memoria sobre la colección de conexiones.
+
+    Cada item es un nodo (módulo, item_id) y cada conexión una arista con su
+    `strength`. Las conexiones se recorren en ambos sentidos (la similitud es
+    simétrica); si un par tiene varias conexiones se usa la más fuerte. Se
+    carga una sola vez y se mantiene coherente escuchando las escrituras de
+    `ChromaDBManager`, de modo que expandir los vecinos de un nodo es una
+    consulta a un diccionario en lugar de búsquedas en ChromaDB.
+    """
+
+    def __init__(self, manager, collection_key: str = CONNECTION_COLLECTION_KEY):
+        """Inicializa el índice y se registra como listener de escrituras del gestor."""
+        self.manager = manager
+        self.collection_key = collection_key
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loading = False
+        self._pending: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._edges: Dict[str, Tuple[Node, Node, float]] = {}
+        self._pairs: Dict[Tuple[Node, Node], Dict[str, float]] = {}
+        self._adjacency: Dict[Node, Dict[Node, float]] = {}
+        # Conexiones en las que participa cada item, por módulo
+        self._degrees: Dict[str, Counter] = {}
+        self._skipped = 0
+        manager.add_write_listener(self._on_write)
+
+    def load(self):
+        """
+        (Re)carga el índice completo desde ChromaDB.
+
+        Las escrituras que llegan mientras se lee la colección se encolan y se
+        reaplican sobre lo leído, así que no se pierden aunque la lectura no
+        las incluya.
+        """
+        with self._lock:
+            self._loading = True
+            self._pending = []
+
+        try:
+            records = self.manager.list_items(collection_key=self.collection_key, limit=None, include_documents=False)
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            self._edges = {}
+            self._pairs = {}
+            self._adjacency = {}
+            self._degrees = {}
+            self._skipped = 0
+            for record in records:
+                self._add(record)
+            # Reaplicar en orden las escrituras recibidas durante la lectura
+            for event, items in self._pending:
+                self._apply(event, items)
+            self._pending = []
+            self._loading = False
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        """Carga el índice la primera vez que se consulta."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    @staticmethod
+    def _pair(a: Node, b: Node) -> Tuple[Node, Node]:
+        """Clave del par sin orden."""
+        return (a, b) if a <= b else (b, a)
+
+    def _refresh_pair(self, pair: Tuple[Node, Node]):
+        """Recalcula la arista de un par a partir de sus conexiones. Debe llamarse con el lock adquirido."""
+        a, b = pair
+        strengths = self._pairs.get(pair)
+        if strengths:
+            strength = max(strengths.values())
+            self._adjacency.setdefault(a, {})[b] = strength
+            self._adjacency.setdefault(b, {})[a] = strength
+            return
+
+        self._pairs.pop(pair, None)
+        for node, other in ((a, b), (b, a)):
+            neighbors = self._adjacency.get(node)
+            if neighbors is not None:
+                neighbors.pop(other, None)
+                if not neighbors:
+                    del self._adjacency[node]
+
+    def _add(self, record: Dict[str, Any]):
+        """Indexa una conexión. Debe llamarse con el lock adquirido."""
+        metadata = record.get("metadata") or {}
+        fields = ("source_module", "source_id", "target_module", "target_id")
+        if any(not metadata.get(field) for field in fields):
+            self._skipped += 1
+            return
+
+        source = (str(metadata["source_module"]), str(metadata["source_id"]))
+        target = (str(metadata["target_module"]), str(metadata["target_id"]))
+        if source == target:
+            self._skipped += 1
+            return
+
+        try:
+            strength = float(metadata.get("strength") or 0.0)
+        except (TypeError, ValueError):
+            strength = 0.0
+        # Fuerzas en [0, 1]: la puntuación de un camino nunca crece al alargarlo
+        strength = min(max(strength, 0.0), 1.0)
+
+        pair = self._pair(source, target)
+        self._edges[record["id"]] = (source, target, strength)
+        for module, item_id in (source, target):
+            self._degrees.setdefault(module, Counter())[item_id] += 1
+        self._pairs.setdefault(pair, {})[record["id"]] = strength
+        self._refresh_pair(pair)
+
+    def _remove(self, record_id: str):
+        """Elimina una conexión del índice. Debe llamarse con el lock adquirido."""
+        edge = self._edges.pop(record_id, None)
+        if edge is None:
+            return
+
+        for module, item_id in edge[:2]:
+            degrees = self._degrees[module]
+            degrees[item_id] -= 1
+            if degrees[item_id] <= 0:
+                del degrees[item_id]
+
+        pair = self._pair(edge[0], edge[1])
+        self._pairs.get(pair, {}).pop(record_id, None)
+        self._refresh_pair(pair)
+
+    def _on_write(self, collection_key: str, event: str, items: List[Dict[str, Any]]):
+        """Aplica al índice las escrituras sobre la colección de conexiones."""
+        if collection_key != self.collection_key:
+            return
+
+        with self._lock:
+            # Durante una carga se encolan para reaplicarlas sobre lo leído
+            if self._loading:
+                self._pending.append((event, items))
+            # Sin cargar ni cargando: la primera carga ya incluirá estas escrituras
+            if self._loaded:
+                self._apply(event, items)
+
+    def _apply(self, event: str, items: List[Dict[str, Any]]):
+        """Aplica una escritura al índice. Debe llamarse con el lock adquirido."""
+        for item in items:
+            self._remove(item["id"])
+            if event != "delete":
+                self._add({"id": item["id"], "metadata": item.get("metadata") or {}})
+
+    def neighbors(self, module: str, item_id: str, min_strength: float = 0.0) -> Dict[Node, float]:
+        """Retorna los vecinos directos de un item con la fuerza de su conexión."""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                node: strength
+                for node, strength in self._adjacency.get((module, item_id), {}).items()
+                if strength >= min_strength
+            }
+
+    def degrees(self, module: str) -> Counter:
+        """Retorna el número de conexiones en las que participa cada item del módulo."""
+        self._ensure_loaded()
+        with self._lock:
+            return Counter(self._degrees.get(module, {}))
+
+    def traverse(self, module: str, item_id: str, max_depth: int = 2,
+                 min_strength: float = 0.0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Retorna los items alcanzables desde un item en como mucho `max_depth` saltos.
+
+        La puntuación de un camino es el producto de las fuerzas de sus
+        conexiones; cada item se retorna con su camino más fuerte, ordenados
+        de mayor a menor puntuación. Solo se siguen conexiones con fuerza
+        mayor o igual que `min_strength`.
+        """
+        self._ensure_loaded()
+        start = (module, item_id)
+
+        with self._lock:
+            # Una tabla por nivel: (puntuación, nodo anterior) del mejor camino de esa longitud
+            levels: List[Dict[Node, Tuple[float, Optional[Node]]]] = [{start: (1.0, None)}]
+            best: Dict[Node, Tuple[float, int]] = {start: (1.0, 0)}
+
+            for depth in range(1, max_depth + 1):
+                level = {}
+                for node, (score, _) in levels[-1].items():
+                    for neighbor, strength in self._adjacency.get(node, {}).items():
+                        if strength < min_strength:
+                            continue
+                        candidate = score * strength
+                        # Un camino que no mejora al mejor ya encontrado tampoco mejora a sus continuaciones
+                        if candidate <= best.get(neighbor, (-1.0, 0))[0]:
+                            continue
+                        if candidate > level.get(neighbor, (-1.0, None))[0]:
+                            level[neighbor] = (candidate, node)
+                if not level:
+                    break
+                for node, (score, _) in level.items():
+                    if score > best.get(node, (-1.0, 0))[0]:
+                        best[node] = (score, depth)
+                levels.append(level)
+
+        hits = []
+        for node, (score, depth) in best.items():
+            if node == start:
+                continue
+            path = [node]
+            for level in range(depth, 0, -1):
+                path.append(levels[level][path[-1]][1])
+            hits.append({
+                "id": node[1],
+                "module": node[0],
+                "depth": depth,
+                "score": score,
+                "path": [{"id": step[1], "module": step[0]} for step in reversed(path)]
+            })
+
+        hits.sort(key=lambda hit: (-hit["score"], hit["depth"]))
+        return hits[:limit] if limit is not None else hits
+
+    def shortest_path(self, source: Node, target: Node, min_strength: float = 0.0,
+                      weighted: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Retorna el camino entre dos items, o None si no están conectados.
+
+        Con `weighted` se usa Dijkstra con coste -log(strength), es decir, el
+        camino cuyo producto de fuerzas es máximo; sin él, el de menos saltos.
+        Solo se siguen conexiones con fuerza positiva y mayor o igual que
+        `min_strength`.
+        """
+        self._ensure_loaded()
+
+        with self._lock:
+            if source not in self._adjacency or target not in self._adjacency:
+                return None if source != target else {"path": [source], "hops": 0, "score": 1.0}
+
+            costs: Dict[Node, float] = {source: 0.0}
+            previous: Dict[Node, Node] = {}
+            heap = [(0.0, source)]
+            while heap:
+                cost, node = heapq.heappop(heap)
+                if node == target:
+                    break
+                if cost > costs[node]:
+                    continue
+                for neighbor, strength in self._adjacency[node].items():
+                    if strength <= 0.0 or strength < min_strength:
+                        continue
+                    candidate = cost + (-math.log(strength) if weighted else 1.0)
+                    if candidate < costs.get(neighbor, math.inf):
+                        costs[neighbor] = candidate
+                        previous[neighbor] = node
+                        heapq.heappush(heap, (candidate, neighbor))
+
+            if target not in costs:
+                return None
+
+            path = [target]
+            while path[-1] != source:
+                path.append(previous[path[-1]])
+            path.reverse()
+            score = math.prod(self._adjacency[a][b] for a, b in zip(path, path[1:]))
+
+        return {"path": path, "hops": len(path) - 1, "score": score}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas del índice."""
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "nodes": len(self._adjacency),
+                "edges": len(self._pairs),
+                "connections": len(self._edges),
+                "skipped": self._skipped
+            }
+
+# Instancia global del índice de conexiones
+connection_graph = ConnectionGraph(db_manager)
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings direccionada por contenido.
+
+    Cada vector se guarda en SQLite como un blob float32 bajo la clave
+    sha256(modelo, texto), de modo que un mismo texto no se vuelve a codificar
+    entre reinicios ni entre módulos. Delante del disco hay una caché LRU en
+    memoria; cuando el tamaño en disco supera `max_bytes` se eliminan las
+    entradas usadas hace más tiempo.
+    """
+
+    # Máximo de parámetros por sentencia `IN (...)` en SQLite
+    _CHUNK_SIZE = 500
+
+    def __init__(self, path: str, model_name: str, max_bytes: int, memory_items: int = 10000):
+        """Abre (o crea) la base de datos de la caché."""
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._connection.commit()
+        self._bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def key(self, text: str) -> str:
+        """Calcula la clave de un texto para el modelo de la caché."""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Guarda un vector en la LRU en memoria. Debe llamarse con el lock adquirido."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Busca textos solo en la LRU en memoria, sin tocar el disco.
+
+        Los aciertos solo se contabilizan si la LRU sirve todos los textos;
+        si falta alguno, la petición completa sigue a `get_many`, que cuenta
+        cada texto una sola vez en el nivel que lo sirve.
+        """
+        found = {}
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[text] = vector
+            if len(found) == len(set(texts)):
+                self._memory_hits += len(found)
+        return found
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Retorna los vectores en caché de los textos dados.
+
+        Primero consulta la LRU en memoria y después SQLite; los textos sin
+        vector no aparecen en el resultado.
+        """
+        found = {}
+        pending = {}
+
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[text] = vector
+                else:
+                    pending[key] = text
+            self._memory_hits += len(found)
+
+            if not pending:
+                return found
+
+            keys = list(pending)
+            now = time.time()
+            for start in range(0, len(keys), self._CHUNK_SIZE):
+                chunk = keys[start:start + self._CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[pending[key]] = vector
+                    self._remember(key, vector)
+
+                # Registrar el uso para la política de expulsión
+                if rows:
+                    self._connection.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+                self._disk_hits += len(rows)
+
+            self._connection.commit()
+            self._misses += len(set(texts)) - len(found)
+
+        return found
+
+    def put_many(self, texts: List[str], vectors):
+        """Guarda los vectores de los textos dados y expulsa entradas si hace falta."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = []
+
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            inserted = self._connection.total_changes - before
+            self._bytes += inserted * (vectors.shape[1] * vectors.itemsize if vectors.ndim == 2 else 0)
+
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+            self._connection.commit()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta quedar en el 90% del límite. Requiere el lock."""
+        target = int(self.max_bytes * 0.9)
+        entries, total = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        if not entries or total <= target:
+            self._bytes = total
+            return
+
+        average = total / entries
+        to_delete = min(entries, int((total - target) / average) + 1)
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (to_delete,)
+        )
+        self._evictions += to_delete
+        self._bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def clear(self):
+        """Vacía la caché en memoria y en disco."""
+        with self._lock:
+            self._memory.clear()
+            self._connection.execute("DELETE FROM embeddings")
+            self._connection.commit()
+            self._bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de aciertos, fallos y tamaño de la caché."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._memory_hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions
+            }
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.config import EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH_SIZE
+
+class EmbeddingService:
+    """
+    Servicio de embeddings con micro-batching dinámico.
+
+    Las peticiones que llegan desde distintos hilos dentro de una ventana corta
+    (`window_ms`) se agrupan, hasta `max_batch_size` textos, en una sola llamada
+    a `encode` del modelo compartido. Cada llamador recibe únicamente sus
+    vectores. Dentro de cada lote los textos se ordenan por longitud para
+    reducir el relleno y los textos repetidos se codifican una sola vez.
+
+    Si se proporciona una caché (`EmbeddingCache`), solo se envían al modelo
+    los textos que no están en ella; las peticiones resueltas por completo
+    desde la LRU en memoria no esperan a la ventana de agrupamiento.
+    """
+
+    def __init__(self, registry, window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, cache=None):
+        """Inicializa el servicio sobre un registro de modelos; el hilo se arranca al primer uso."""
+        self.registry = registry
+        self.cache = cache
+        self.window_seconds = max(window_ms, 0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._encoded_texts = 0
+        self._largest_batch = 0
+        self._encode_seconds = 0.0
+
+    def _ensure_worker(self):
+        """Arranca el hilo que agrupa y codifica las peticiones si no está en marcha."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="quark-embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Encola una lista de textos para codificar.
+
+        Retorna un `Future` que se resuelve con una matriz float32 de una fila
+        por texto, en el mismo orden.
+        """
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+
+        texts = list(texts)
+        if self.cache is not None:
+            cached = self.cache.get_memory(texts)
+            if len(cached) == len(set(texts)):
+                future.set_result(np.stack([cached[text] for text in texts]))
+                return future
+
+        self._ensure_worker()
+        self._queue.put((texts, future))
+        return future
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """
+        Codifica uno o varios textos esperando al lote en el que se incluyan.
+
+        Con un único texto (str) retorna un vector; con una lista, una matriz.
+        """
+        if isinstance(texts, str):
+            return self.submit([texts]).result()[0]
+
+        return self.submit(texts).result()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """Espera una petición y agrupa las que lleguen dentro de la ventana."""
+        pending = [self._queue.get()]
+        total = len(pending[0][0])
+        deadline = time.perf_counter() + self.window_seconds
+
+        while total < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    request = self._queue.get(timeout=remaining)
+                else:
+                    # Ventana agotada: solo se añaden las peticiones ya encoladas
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            pending.append(request)
+            total += len(request[0])
+
+        return pending
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Codifica los textos únicos que no están en caché, ordenados por longitud,
+        y retorna una fila por texto en el orden original.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = self.cache.get_many(unique_texts) if self.cache is not None else {}
+        missing = [text for text in unique_texts if text not in vectors]
+
+        if missing:
+            order = sorted(range(len(missing)), key=lambda i: len(missing[i]))
+
+            start_time = time.perf_counter()
+            encoded = self.registry.encode(
+                [missing[i] for i in order],
+                batch_size=self.max_batch_size,
+                convert_to_numpy=True
+            )
+            elapsed = time.perf_counter() - start_time
+
+            encoded = np.asarray(encoded, dtype=np.float32)
+            for position, i in enumerate(order):
+                vectors[missing[i]] = encoded[position]
+
+            if self.cache is not None:
+                self.cache.put_many(missing, np.stack([vectors[text] for text in missing]))
+
+            with self._lock:
+                self._encoded_texts += len(missing)
+                self._encode_seconds += elapsed
+
+        return np.stack([vectors[text] for text in texts])
+
+    def _run(self):
+        """Bucle del hilo de trabajo: agrupar, codificar y repartir los resultados."""
+        while True:
+            pending = self._collect()
+
+            # Descartar peticiones canceladas antes de codificar
+            pending = [(texts, future) for texts, future in pending if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                vectors = self._encode_batch(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._batches += 1
+                self._requests += len(pending)
+                self._texts += len(texts)
+                self._largest_batch = max(self._largest_batch, len(texts))
+
+            offset = 0
+            for request_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de agrupamiento del servicio."""
+        with self._lock:
+            return {
+                "window_ms": self.window_seconds * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "queued_requests": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "encoded_texts": self._encoded_texts,
+                "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+                "avg_requests_per_batch": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "encode_seconds": round(self._encode_seconds, 4),
+                "cache": self.cache.metrics() if self.cache is not None else None
+            }
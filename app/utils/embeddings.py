@@ -1,22 +1,146 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
 from sentence_transformers import SentenceTransformer
-from chromadb.utils import embedding_functions
-from app.config import EMBEDDING_MODEL
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from app.config import (
+    EMBEDDING_MODEL, EMBEDDING_DEVICE,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_MEMORY_ITEMS
+)
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embedding_service import EmbeddingService
+
+class EmbeddingModelRegistry:
+    """
+    Registro a nivel de proceso que mantiene un único modelo de embeddings cargado.
+
+    El modelo se carga una sola vez (de forma perezosa o mediante `warm_up`) y se
+    comparte entre la función de embedding de ChromaDB y todos los módulos que
+    necesitan codificar textos directamente.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, device: str = EMBEDDING_DEVICE):
+        """Inicializa el registro sin cargar todavía el modelo."""
+        self.model_name = model_name
+        self.device = device
+        self._model: Optional[SentenceTransformer] = None
+        self._lock = threading.Lock()
+        self._load_time_seconds: Optional[float] = None
+        self._loaded_at: Optional[str] = None
+        self._memory_bytes = 0
+        self._parameter_count = 0
+        self._load_count = 0
+        self._access_count = 0
+
+    def _load(self):
+        """Carga el modelo y registra las métricas de carga. Debe llamarse con el lock adquirido."""
+        start_time = time.perf_counter()
+        model = SentenceTransformer(self.model_name, device=self.device)
+        self._load_time_seconds = time.perf_counter() - start_time
+        self._loaded_at = datetime.now().isoformat()
+        self._load_count += 1
+
+        # Estimar la memoria ocupada por los pesos del modelo
+        parameters = list(model.parameters())
+        self._parameter_count = sum(p.numel() for p in parameters)
+        self._memory_bytes = sum(p.numel() * p.element_size() for p in parameters)
+        self._memory_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+
+        self._model = model
+
+    def get_model(self) -> SentenceTransformer:
+        """Retorna el modelo compartido, cargándolo la primera vez que se solicita."""
+        with self._lock:
+            if self._model is None:
+                self._load()
+            self._access_count += 1
+            return self._model
+
+    def is_loaded(self) -> bool:
+        """Indica si el modelo ya está cargado en memoria."""
+        return self._model is not None
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Carga el modelo y ejecuta una codificación de prueba.
+
+        Así la primera petición real no paga el coste de carga ni la
+        inicialización perezosa de torch.
+        """
+        model = self.get_model()
+        model.encode(["warm up"], convert_to_numpy=True)
+        return self.metrics()
+
+    def encode(self, texts: List[str], **kwargs):
+        """Codifica una lista de textos con el modelo compartido."""
+        return self.get_model().encode(texts, **kwargs)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de carga y uso de memoria del modelo."""
+        dimension = None
+        if self._model is not None:
+            dimension = self._model.get_sentence_embedding_dimension()
+
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "loaded": self.is_loaded(),
+            "loaded_at": self._loaded_at,
+            "load_time_seconds": round(self._load_time_seconds, 4) if self._load_time_seconds is not None else None,
+            "load_count": self._load_count,
+            "access_count": self._access_count,
+            "parameter_count": self._parameter_count,
+            "memory_bytes": self._memory_bytes,
+            "embedding_dimension": dimension
+        }
+
+class BatchedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Función de embedding para ChromaDB que codifica a través del servicio de micro-batching.
+
+    Las llamadas concurrentes de ChromaDB (inserciones y consultas desde distintos
+    hilos) se agrupan en un solo `encode` del modelo compartido.
+    """
+
+    def __init__(self, service: EmbeddingService):
+        self._service = service
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._service.encode(list(input)).tolist()
+
+# Instancia global del registro de modelos
+model_registry = EmbeddingModelRegistry()
+
+# Caché persistente de embeddings del modelo compartido
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_PATH,
+    model_name=model_registry.model_name,
+    max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    memory_items=EMBEDDING_CACHE_MEMORY_ITEMS
+) if EMBEDDING_CACHE_ENABLED else None
+
+# Servicio de embeddings con micro-batching sobre el modelo compartido
+embedding_service = EmbeddingService(model_registry, cache=embedding_cache)
 
 def get_embedding_function():
     """
     Retorna una función de embedding para ChromaDB.
-    
-    Utiliza el modelo de SentenceTransformers especificado en la configuración.
+
+    Utiliza el modelo de SentenceTransformers compartido del registro a través
+    del servicio de micro-batching, de modo que ChromaDB y el resto de módulos
+    no cargan copias separadas del modelo y las peticiones concurrentes se
+    codifican juntas.
     """
-    return embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL
-    )
+    return BatchedEmbeddingFunction(embedding_service)
 
 def get_embedding_model():
     """
     Retorna el modelo de SentenceTransformers para generar embeddings.
-    
+
     Útil cuando se necesita acceso directo al modelo para operaciones
-    más avanzadas que las proporcionadas por ChromaDB.
+    más avanzadas que las proporcionadas por ChromaDB. El modelo se carga
+    una sola vez por proceso y se reutiliza en cada llamada.
     """
-    return SentenceTransformer(EMBEDDING_MODEL) 
\ No newline at end of file
+    return model_registry.get_model()
@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class BoundedThreadPool:
+    """
+    Pool de hilos acotado para ejecutar trabajo bloqueante desde código asíncrono.
+
+    Cada pool tiene un número fijo de hilos y un límite de tareas en vuelo
+    (en ejecución más en cola). Cuando se alcanza el límite, las corrutinas
+    esperan su turno sin bloquear el bucle de eventos. El pool registra
+    cuántas tareas están activas, en cola y completadas para exponer su
+    saturación como métrica.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int = 0):
+        """Crea el pool; `max_pending=0` limita las tareas en vuelo a 4 veces los hilos."""
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 4
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait_seconds = 0.0
+        self._total_run_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Crea los hilos del pool la primera vez que se necesitan (o tras `shutdown`)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"quark-{self.name}"
+                )
+            return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """
+        Retorna el semáforo de tareas en vuelo del bucle de eventos actual.
+
+        Cada bucle (el del servidor y los de los trabajos en segundo plano)
+        tiene su propio semáforo, ya que un `asyncio.Semaphore` no puede
+        compartirse entre bucles.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_pending)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    def _execute(self, func: Callable, queued_at: float):
+        """Ejecuta la tarea en un hilo del pool registrando tiempos de espera y ejecución."""
+        started_at = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._total_wait_seconds += started_at - queued_at
+
+        try:
+            return func()
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._total_run_seconds += time.perf_counter() - started_at
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Ejecuta `func(*args, **kwargs)` en el pool y espera su resultado."""
+        semaphore = self._get_semaphore()
+        with self._lock:
+            self._waiting += 1
+
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            with self._lock:
+                self._queued += 1
+                self._submitted += 1
+                self._peak_in_flight = max(self._peak_in_flight, self._active + self._queued)
+
+            loop = asyncio.get_running_loop()
+            call = functools.partial(func, *args, **kwargs)
+            return await loop.run_in_executor(
+                self._get_executor(),
+                functools.partial(self._execute, call, time.perf_counter())
+            )
+        finally:
+            semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de ocupación y saturación del pool."""
+        with self._lock:
+            in_flight = self._active + self._queued
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "active": self._active,
+                "queued": self._queued,
+                "waiting": self._waiting,
+                "saturation": round(self._active / self.max_workers, 4),
+                "in_flight_ratio": round(in_flight / self.max_pending, 4),
+                "peak_in_flight": self._peak_in_flight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait_seconds / self._completed * 1000, 3) if self._completed else 0.0,
+                "avg_run_ms": round(self._total_run_seconds / self._completed * 1000, 3) if self._completed else 0.0
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Detiene los hilos del pool; se volverán a crear si se envía otra tarea."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+def build_where(
+    equals: Optional[Dict[str, Any]] = None,
+    minimums: Optional[Dict[str, Any]] = None,
+    maximums: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Compila parámetros de consulta en una cláusula `where` de ChromaDB.
+
+    - `equals`: campos que deben coincidir exactamente (`$eq`).
+    - `minimums`: campos con un valor mínimo inclusivo (`$gte`).
+    - `maximums`: campos con un valor máximo exclusivo (`$lt`).
+
+    Los valores `None` se ignoran, de modo que los parámetros opcionales de
+    los endpoints pueden pasarse directamente. Con una sola condición se
+    retorna tal cual; con varias se combinan con `$and`, que es lo que exige
+    ChromaDB. Si no queda ninguna condición se retorna `None`.
+    """
+    conditions = []
+
+    for key, value in (equals or {}).items():
+        if value is not None:
+            conditions.append({key: {"$eq": value}})
+
+    for key, value in (minimums or {}).items():
+        if value is not None:
+            conditions.append({key: {"$gte": value}})
+
+    for key, value in (maximums or {}).items():
+        if value is not None:
+            conditions.append({key: {"$lt": value}})
+
+    if not conditions:
+        return None
+
+    if len(conditions) == 1:
+        return conditions[0]
+
+    return {"$and": conditions}
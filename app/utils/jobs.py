@@ -0,0 +1,270 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.config import JOBS_DB_PATH, JOB_WORKERS
+from app.models.schemas import generate_id
+from app.utils.logger import logger
+
+# Trabajo que se está ejecutando en el contexto actual (para informar del progreso)
+_current_job: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("quark_current_job", default=None)
+
+JOB_STATUSES = ["queued", "running", "completed", "failed"]
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobManager:
+    """
+    Ejecutor de trabajos en segundo plano persistido en SQLite.
+
+    Los análisis largos (revisión y optimización de prioridades, sugerencias)
+    se aceptan como trabajos y se ejecutan en un pool de hilos dedicado, cada
+    trabajo en su propio bucle de eventos, sin ocupar el bucle del servidor.
+    El estado, el progreso y el resultado de cada trabajo se guardan en
+    SQLite; los trabajos pendientes o en curso al detener el proceso se
+    vuelven a encolar al arrancar (`recover`). Un trabajo idéntico (mismo tipo
+    y mismos parámetros) a otro pendiente o en curso no se duplica.
+    """
+
+    def __init__(self, path: str, max_workers: int = 1):
+        """Abre (o crea) la base de datos de trabajos; los hilos se crean al primer uso."""
+        self.path = path
+        self.max_workers = max(max_workers, 1)
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._deduplicated = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, type TEXT NOT NULL, params TEXT NOT NULL, dedup_key TEXT NOT NULL, "
+            "status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT, result TEXT, error TEXT, "
+            "created_at TEXT NOT NULL, started_at TEXT, finished_at TEXT)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs(dedup_key, status)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+        self._connection.commit()
+
+    def register(self, job_type: str, request_model: Type[BaseModel], handler: Callable[[Any], Awaitable[Any]]):
+        """Registra un tipo de trabajo: el esquema de sus parámetros y la corrutina que lo ejecuta."""
+        self._handlers[job_type] = {"request_model": request_model, "handler": handler}
+
+    @property
+    def job_types(self) -> List[str]:
+        """Tipos de trabajo registrados."""
+        return sorted(self._handlers)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Crea los hilos de trabajo la primera vez que se necesitan (o tras `shutdown`)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="quark-jobs")
+            return self._executor
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convierte una fila de la tabla en el diccionario público del trabajo (sin resultado)."""
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "params": json.loads(row["params"]),
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def _update(self, job_id: str, **fields):
+        """Actualiza columnas de un trabajo."""
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            self._connection.commit()
+
+    def submit(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Encola un trabajo y retorna su estado.
+
+        Los parámetros se validan con el esquema del tipo de trabajo (lanza
+        `KeyError` si el tipo no existe y `ValidationError` si no son válidos).
+        Si ya hay un trabajo idéntico pendiente o en curso se retorna ese
+        trabajo con `deduplicated=True` en lugar de crear otro.
+        """
+        request_model = self._handlers[job_type]["request_model"]
+        normalized = jsonable_encoder(request_model(**(params or {})))
+        params_json = json.dumps(normalized, sort_keys=True)
+        dedup_key = hashlib.sha256(f"{job_type}\0{params_json}".encode("utf-8")).hexdigest()
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (dedup_key, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is not None:
+                self._deduplicated += 1
+                return {**self._row_to_job(row), "deduplicated": True}
+
+            job_id = generate_id()
+            self._connection.execute(
+                "INSERT INTO jobs (id, type, params, dedup_key, status, progress, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 0, ?)",
+                (job_id, job_type, params_json, dedup_key, datetime.now().isoformat())
+            )
+            self._connection.commit()
+
+        self._get_executor().submit(self._run, job_id)
+        return {**self.get(job_id), "deduplicated": False}
+
+    def _run(self, job_id: str):
+        """Ejecuta un trabajo en un hilo del pool y guarda su resultado o su error."""
+        job = self.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return
+
+        handler = self._handlers.get(job["type"])
+        if handler is None:
+            self._update(job_id, status="failed", error=f"Tipo de trabajo '{job['type']}' no registrado",
+                         finished_at=datetime.now().isoformat())
+            return
+
+        self._update(job_id, status="running", progress=0, started_at=datetime.now().isoformat())
+
+        async def execute():
+            _current_job.set(job_id)
+            return await handler["handler"](handler["request_model"](**job["params"]))
+
+        try:
+            result = asyncio.run(execute())
+        except HTTPException as e:
+            self._update(job_id, status="failed", error=str(e.detail), finished_at=datetime.now().isoformat())
+            return
+        except Exception as e:
+            logger.error(f"Error al ejecutar el trabajo {job_id}: {str(e)}")
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+            return
+
+        self._update(
+            job_id,
+            status="completed",
+            progress=1.0,
+            result=json.dumps(jsonable_encoder(result)),
+            finished_at=datetime.now().isoformat()
+        )
+
+    def report_progress(self, job_id: str, progress: float, message: Optional[str] = None):
+        """Guarda el progreso (entre 0 y 1) de un trabajo en curso."""
+        self._update(job_id, progress=round(min(max(progress, 0.0), 1.0), 4), message=message)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna el estado de un trabajo o None si no existe."""
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna el estado de un trabajo junto con su resultado (None si no ha terminado)."""
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = self._row_to_job(row)
+        job["result"] = json.loads(row["result"]) if row["result"] is not None else None
+        return job
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Lista los trabajos más recientes, opcionalmente filtrados por estado."""
+        query = "SELECT * FROM jobs"
+        args: List[Any] = []
+        if status is not None:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        args.extend([limit, offset])
+
+        with self._lock:
+            rows = self._connection.execute(query, args).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def count_jobs(self, status: Optional[str] = None) -> int:
+        """Cuenta los trabajos, opcionalmente filtrados por estado."""
+        query = "SELECT COUNT(*) FROM jobs"
+        args: List[Any] = []
+        if status is not None:
+            query += " WHERE status = ?"
+            args.append(status)
+
+        with self._lock:
+            return self._connection.execute(query, args).fetchone()[0]
+
+    def recover(self) -> int:
+        """
+        Vuelve a encolar los trabajos pendientes o interrumpidos por un reinicio.
+
+        Los trabajos en curso se reinician desde el principio. Retorna el
+        número de trabajos encolados.
+        """
+        with self._lock:
+            self._connection.execute("UPDATE jobs SET status = 'queued', progress = 0 WHERE status = 'running'")
+            self._connection.commit()
+            job_ids = [row["id"] for row in self._connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()]
+
+        for job_id in job_ids:
+            self._get_executor().submit(self._run, job_id)
+        return len(job_ids)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna el número de trabajos por estado."""
+        with self._lock:
+            counts = dict(self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "max_workers": self.max_workers,
+            "deduplicated": self._deduplicated,
+            **{status: counts.get(status, 0) for status in JOB_STATUSES}
+        }
+
+    def shutdown(self, wait: bool = False):
+        """
+        Detiene los hilos de trabajo. Los trabajos que no hayan terminado
+        quedan registrados y se reanudan con `recover` al volver a arrancar.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+def report_progress(progress: float, message: Optional[str] = None):
+    """
+    Informa del progreso del trabajo en curso.
+
+    Fuera de un trabajo (por ejemplo, cuando el endpoint se llama
+    directamente por HTTP) no hace nada.
+    """
+    job_id = _current_job.get()
+    if job_id is not None:
+        job_manager.report_progress(job_id, progress, message)
+
+# Instancia global del gestor de trabajos
+job_manager = JobManager(JOBS_DB_PATH, max_workers=JOB_WORKERS)
@@ -0,0 +1,570 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    KNN_GRAPH_DIR, KNN_GRAPH_K, KNN_GRAPH_UPDATE_INTERVAL_SECONDS,
+    KNN_GRAPH_SAVE_INTERVAL_SECONDS, CONNECTION_MEMORY_LIMIT_MB
+)
+from app.database import db_manager
+from app.utils.logger import logger
+from app.utils.similarity import normalize_embeddings, top_k_cross_similarities
+
+# Módulos cuyos items forman los nodos del grafo
+GRAPH_MODULES = ("identity", "business", "reminders", "learnings")
+
+class KnnGraph:
+    """
+    Grafo de los k vecinos más cercanos de cada item, entre todos los módulos.
+
+    Las listas de vecinos se guardan en formato CSR (`indptr`, `indices`,
+    `weights`) junto con los vectores normalizados de los nodos, como
+    archivos .npy que se abren con memoria mapeada: consultar los vecinos de
+    un item es O(k) y no requiere cargar el grafo en memoria.
+
+    Las escrituras de `ChromaDBManager` sobre los módulos se aplican de forma
+    incremental en una capa en memoria sobre el CSR: los items nuevos (o
+    cuyo texto cambia) calculan sus k vecinos y entran en las listas de los
+    nodos a los que superan; los eliminados se marcan como borrados y se
+    recalculan las listas que los contenían. Cada `save_interval` segundos
+    la capa se compacta en una nueva generación del CSR en disco.
+
+    Las escrituras y la construcción inicial solo se aplican en el hilo de
+    actualización. Las consultas leen el estado actual sin esperar: los
+    items con escrituras aún sin aplicar no se retornan como vecinos, y si
+    el grafo no está construido o el item consultado tiene cambios
+    pendientes `neighbors` retorna None para que el llamador use una
+    búsqueda vectorial.
+    """
+
+    def __init__(self, manager, path: str = KNN_GRAPH_DIR, k: int = KNN_GRAPH_K,
+                 update_interval: float = KNN_GRAPH_UPDATE_INTERVAL_SECONDS,
+                 save_interval: float = KNN_GRAPH_SAVE_INTERVAL_SECONDS,
+                 memory_limit_bytes: int = CONNECTION_MEMORY_LIMIT_MB * 1024 * 1024,
+                 modules=GRAPH_MODULES):
+        """Inicializa un grafo vacío y se registra como listener de escrituras del gestor."""
+        self.manager = manager
+        self.path = path
+        self.k = k
+        self.update_interval = update_interval
+        self.save_interval = save_interval
+        self.memory_limit_bytes = memory_limit_bytes
+        self.modules = tuple(modules)
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._pending: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        # Items con escrituras encoladas y aún no aplicadas al grafo
+        self._pending_keys = set()
+        self._built = False
+        self._generation = 0
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._builds = 0
+        self._applied_items = 0
+        self._last_update_seconds = 0.0
+        self._reset([], np.zeros((0, 0), dtype=np.float32), np.zeros(1, dtype=np.int64),
+                    np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        manager.add_write_listener(self._on_write)
+
+    def _reset(self, keys: List[Tuple[str, str]], vectors: np.ndarray, indptr: np.ndarray,
+               indices: np.ndarray, weights: np.ndarray):
+        """Sustituye el estado por un CSR base sin cambios pendientes. Debe llamarse con el lock adquirido."""
+        n_nodes = len(keys)
+        self._keys = list(keys)
+        self._index = {key: node for node, key in enumerate(self._keys)}
+        self._base_vectors = vectors
+        self._extra_vectors = np.zeros((0, vectors.shape[1] if vectors.ndim == 2 else 0), dtype=np.float32)
+        self._indptr = indptr
+        self._indices = indices
+        self._weights = weights
+        # Filas reescritas desde la última compactación: nodo -> (índices, similitudes)
+        self._overlay: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._alive = np.ones(n_nodes, dtype=bool)
+
+        # Similitud del k-ésimo vecino de cada fila (-inf si tiene menos de k)
+        lengths = np.diff(indptr)
+        self._kth = np.full(n_nodes, -np.inf, dtype=np.float32)
+        full = np.flatnonzero(lengths >= self.k)
+        if full.size:
+            self._kth[full] = weights[indptr[full + 1] - 1]
+
+    def _row(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Vecinos (índices, similitudes) de un nodo, de mayor a menor similitud."""
+        if node in self._overlay:
+            return self._overlay[node]
+        if node + 1 >= len(self._indptr):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        start, stop = self._indptr[node], self._indptr[node + 1]
+        return self._indices[start:stop], self._weights[start:stop]
+
+    def _set_row(self, node: int, indices: np.ndarray, weights: np.ndarray):
+        """Sustituye los vecinos de un nodo, ordenándolos y conservando los k mejores."""
+        order = np.argsort(-weights, kind="stable")[:self.k]
+        indices = np.asarray(indices, dtype=np.int32)[order]
+        weights = np.asarray(weights, dtype=np.float32)[order]
+        self._overlay[int(node)] = (indices, weights)
+        self._kth[node] = weights[-1] if len(weights) >= self.k else -np.inf
+
+    def _vectors(self, nodes: np.ndarray) -> np.ndarray:
+        """Vectores normalizados de los nodos dados."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        n_base = len(self._base_vectors)
+        dimension = self._base_vectors.shape[1] if n_base else self._extra_vectors.shape[1]
+        vectors = np.empty((len(nodes), dimension), dtype=np.float32)
+        in_base = nodes < n_base
+        if in_base.any():
+            vectors[in_base] = self._base_vectors[nodes[in_base]]
+        if not in_base.all():
+            vectors[~in_base] = self._extra_vectors[nodes[~in_base] - n_base]
+        return vectors
+
+    def _similarities(self, queries: np.ndarray) -> np.ndarray:
+        """Similitud de cada consulta con todos los nodos; -inf para los nodos eliminados."""
+        parts = []
+        if len(self._base_vectors):
+            parts.append(queries @ np.asarray(self._base_vectors).T)
+        if len(self._extra_vectors):
+            parts.append(queries @ self._extra_vectors.T)
+        similarities = np.concatenate(parts, axis=1)
+        similarities[:, ~self._alive] = -np.inf
+        return similarities
+
+    def _recompute(self, nodes: np.ndarray, new_nodes: np.ndarray):
+        """
+        Recalcula las listas de vecinos de `nodes` contra todos los nodos vivos.
+
+        Los nodos de `new_nodes` (que deben estar incluidos en `nodes`)
+        además se insertan en la lista de cada nodo no recalculado al que
+        superan su k-ésimo vecino. Debe llamarse con el lock adquirido.
+        """
+        if not len(nodes):
+            return
+
+        recomputed = np.zeros(len(self._keys), dtype=bool)
+        recomputed[nodes] = True
+        is_new = np.zeros(len(self._keys), dtype=bool)
+        is_new[new_nodes] = True
+
+        # Consultas por lotes para que cada bloque de similitudes respete el límite de memoria
+        batch_size = max(1, self.memory_limit_bytes // (len(self._keys) * 4 * 2))
+        for start in range(0, len(nodes), batch_size):
+            batch = nodes[start:start + batch_size]
+            similarities = self._similarities(self._vectors(batch))
+            similarities[np.arange(len(batch)), batch] = -np.inf
+
+            kk = min(self.k, similarities.shape[1])
+            candidates = np.argpartition(similarities, similarities.shape[1] - kk, axis=1)[:, similarities.shape[1] - kk:]
+            for row, node in enumerate(batch):
+                weights = similarities[row, candidates[row]]
+                keep = np.isfinite(weights)
+                self._set_row(node, candidates[row][keep], weights[keep])
+
+            # Los nodos nuevos entran en las listas de los nodos que no se han recalculado
+            for row in np.flatnonzero(is_new[batch]):
+                node = batch[row]
+                targets = np.flatnonzero((similarities[row] > self._kth) & ~recomputed & self._alive)
+                for target in targets:
+                    indices, weights = self._row(target)
+                    self._set_row(
+                        target,
+                        np.append(indices, node),
+                        np.append(weights, similarities[row, target])
+                    )
+
+    def _rows_pointing_to(self, dead: np.ndarray) -> np.ndarray:
+        """Nodos vivos cuya lista de vecinos contiene alguno de los nodos `dead`."""
+        affected = set()
+        if len(self._indices):
+            positions = np.flatnonzero(np.isin(self._indices, dead))
+            rows = np.searchsorted(self._indptr, positions, side="right") - 1
+            affected.update(int(row) for row in rows if row not in self._overlay)
+        for node, (indices, _) in self._overlay.items():
+            if np.isin(indices, dead).any():
+                affected.add(node)
+        return np.array(sorted(node for node in affected if self._alive[node]), dtype=np.int64)
+
+    def rebuild(self):
+        """Construye el grafo desde cero con los embeddings de todos los items de los módulos."""
+        with self._build_lock:
+            start_time = time.perf_counter()
+            # Las escrituras anteriores a la lectura ya están en el corpus
+            with self._lock:
+                self._pending = []
+                self._pending_keys = set()
+
+            keys, embeddings = [], []
+            for module in self.modules:
+                items = self.manager.list_items(collection_key=module, limit=None, include_documents=False)
+                if not items:
+                    continue
+                embeddings.extend(self.manager.get_item_embeddings(collection_key=module, items=items))
+                keys.extend((module, item["id"]) for item in items)
+
+            n_nodes = len(keys)
+            if n_nodes:
+                vectors = normalize_embeddings(embeddings)
+                indices, weights = top_k_cross_similarities(vectors, vectors, self.k + 1, self.memory_limit_bytes)
+
+                # Quitar a cada nodo de su propia lista (o el peor vecino si no aparece)
+                own = indices == np.arange(n_nodes)[:, None]
+                drop = np.where(own.any(axis=1), own.argmax(axis=1), indices.shape[1] - 1)
+                keep = np.ones(indices.shape, dtype=bool)
+                keep[np.arange(n_nodes), drop] = False
+                keep &= indices >= 0
+                indptr = np.concatenate([[0], np.cumsum(keep.sum(axis=1))]).astype(np.int64)
+                indices, weights = indices[keep], weights[keep]
+            else:
+                vectors = np.zeros((0, 0), dtype=np.float32)
+                indptr, indices, weights = np.zeros(1, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+            with self._lock:
+                self._reset(keys, vectors, indptr, indices.astype(np.int32), weights.astype(np.float32))
+                self._built = True
+                self._builds += 1
+                self._last_update_seconds = time.perf_counter() - start_time
+            self._save()
+
+    def _on_write(self, collection_key: str, event: str, items: List[Dict[str, Any]]):
+        """Encola las escrituras sobre los módulos para aplicarlas por lotes."""
+        if collection_key not in self.modules:
+            return
+
+        with self._lock:
+            self._pending.append((collection_key, event, items))
+            self._pending_keys.update((collection_key, item["id"]) for item in items)
+
+    def apply_pending(self) -> int:
+        """
+        Aplica al grafo las escrituras pendientes y retorna el número de items procesados.
+
+        Solo se considera la última escritura de cada item; las
+        actualizaciones que no cambian el vector del item no modifican el grafo.
+        """
+        with self._build_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                # Sin grafo no hay nada que actualizar: se construirá sobre el corpus completo
+                if not pending or not self._built:
+                    return 0
+
+            start_time = time.perf_counter()
+            latest: Dict[Tuple[str, str], Optional[str]] = {}
+            for module, event, items in pending:
+                for item in items:
+                    latest[(module, item["id"])] = None if event == "delete" else (item.get("text") or "")
+
+            changed = [(key, text) for key, text in latest.items() if text is not None]
+            vectors = normalize_embeddings(self.manager.embedding_function([text for _, text in changed])) if changed else None
+
+            with self._lock:
+                dead = [self._index.pop(key) for key, text in latest.items() if text is None and key in self._index]
+
+                new_keys, new_vectors = [], []
+                for (key, _), vector in zip(changed, vectors if vectors is not None else []):
+                    node = self._index.get(key)
+                    if node is not None:
+                        if np.allclose(self._vectors(np.array([node]))[0], vector, atol=1e-6):
+                            continue
+                        dead.append(node)
+                    new_keys.append(key)
+                    new_vectors.append(vector)
+
+                dead = np.array(dead, dtype=np.int64)
+                if dead.size:
+                    self._alive[dead] = False
+                    for node in dead:
+                        self._overlay.pop(int(node), None)
+
+                first_new = len(self._keys)
+                if new_keys:
+                    if not len(self._extra_vectors):
+                        self._extra_vectors = np.zeros((0, len(new_vectors[0])), dtype=np.float32)
+                    self._extra_vectors = np.vstack([self._extra_vectors, np.array(new_vectors, dtype=np.float32)])
+                    for offset, key in enumerate(new_keys):
+                        self._index[key] = first_new + offset
+                    self._keys.extend(new_keys)
+                    self._alive = np.concatenate([self._alive, np.ones(len(new_keys), dtype=bool)])
+                    self._kth = np.concatenate([self._kth, np.full(len(new_keys), -np.inf, dtype=np.float32)])
+
+                new_nodes = np.arange(first_new, len(self._keys), dtype=np.int64)
+                affected = self._rows_pointing_to(dead) if dead.size else np.zeros(0, dtype=np.int64)
+                self._recompute(np.union1d(affected, new_nodes), new_nodes)
+
+                if dead.size or new_keys:
+                    self._dirty = True
+                # Solo quedan pendientes los items escritos mientras se aplicaba este lote
+                self._pending_keys = {
+                    (module, item["id"]) for module, _, items in self._pending for item in items
+                }
+                self._applied_items += len(latest)
+                self._last_update_seconds = time.perf_counter() - start_time
+
+            return len(latest)
+
+    def neighbors(self, module: str, item_id: str, limit: Optional[int] = None,
+                  min_similarity: float = -1.0) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retorna los vecinos de un item ({"id", "module", "similarity"}), de mayor a menor similitud.
+
+        No aplica escrituras: lee el grafo actual y omite los vecinos con
+        escrituras pendientes. Retorna None si el grafo aún no está construido
+        o si el item no está en el grafo o tiene cambios sin aplicar.
+        """
+        key = (module, item_id)
+        with self._lock:
+            node = self._index.get(key)
+            if not self._built or node is None or key in self._pending_keys:
+                return None
+
+            indices, weights = self._row(node)
+            neighbors = []
+            for neighbor, similarity in zip(indices, weights):
+                if similarity < min_similarity:
+                    break
+                if not self._alive[neighbor] or self._keys[neighbor] in self._pending_keys:
+                    continue
+                neighbor_module, neighbor_id = self._keys[neighbor]
+                neighbors.append({"id": neighbor_id, "module": neighbor_module, "similarity": float(similarity)})
+                if limit is not None and len(neighbors) >= limit:
+                    break
+            return neighbors
+
+    def cross_links(self, modules: List[str], min_similarity: float,
+                    limit_per_pair: int) -> Optional[List[Tuple[Tuple[str, str], Tuple[str, str], float]]]:
+        """
+        Retorna los enlaces más fuertes entre items de módulos distintos según las listas de vecinos.
+
+        Cada enlace es (item1, item2, similitud), con item1 del módulo que va
+        antes en orden alfabético; como máximo `limit_per_pair` enlaces por
+        par de módulos, de mayor a menor similitud. Solo se toma una copia
+        del estado con el lock adquirido; el cálculo sobre las aristas se hace
+        sin él. Los items con escrituras pendientes se omiten. Retorna None si
+        el grafo aún no está construido.
+        """
+        with self._lock:
+            if not self._built:
+                return None
+            keys = list(self._keys)
+            alive = self._alive.copy()
+            for key in self._pending_keys:
+                node = self._index.get(key)
+                if node is not None:
+                    alive[node] = False
+            indptr, indices, weights = self._indptr, self._indices, self._weights
+            overlay = dict(self._overlay)
+
+        if not keys:
+            return []
+        order = sorted(set(modules))
+        codes = {module: code for code, module in enumerate(order)}
+        node_codes = np.array([codes.get(module, -1) for module, _ in keys], dtype=np.int64)
+
+        # Aristas del CSR base (salvo las filas reescritas) más las de la capa en memoria
+        n_base = len(indptr) - 1
+        sources = np.repeat(np.arange(n_base, dtype=np.int64), np.diff(indptr))
+        targets = np.asarray(indices, dtype=np.int64)
+        similarities = np.asarray(weights, dtype=np.float32)
+        if overlay:
+            keep = ~np.isin(sources, np.fromiter(overlay, dtype=np.int64))
+            sources, targets, similarities = sources[keep], targets[keep], similarities[keep]
+            sources = np.concatenate([sources] + [np.full(len(row[0]), node, dtype=np.int64) for node, row in overlay.items()])
+            targets = np.concatenate([targets] + [np.asarray(row[0], dtype=np.int64) for row in overlay.values()])
+            similarities = np.concatenate([similarities] + [np.asarray(row[1], dtype=np.float32) for row in overlay.values()])
+
+        keep = (similarities >= min_similarity) & alive[sources] & alive[targets]
+        sources, targets, similarities = sources[keep], targets[keep], similarities[keep]
+        source_codes, target_codes = node_codes[sources], node_codes[targets]
+        keep = (source_codes >= 0) & (target_codes >= 0) & (source_codes != target_codes)
+        sources, targets, similarities = sources[keep], targets[keep], similarities[keep]
+        source_codes, target_codes = source_codes[keep], target_codes[keep]
+
+        # Orientar cada arista del módulo menor al mayor y quitar las repetidas (a→b y b→a)
+        swap = source_codes > target_codes
+        first = np.where(swap, targets, sources)
+        second = np.where(swap, sources, targets)
+        _, unique = np.unique(first * len(keys) + second, return_index=True)
+        first, second, similarities = first[unique], second[unique], similarities[unique]
+
+        links = []
+        pair_codes = node_codes[first] * len(order) + node_codes[second]
+        for pair_code in np.unique(pair_codes):
+            positions = np.flatnonzero(pair_codes == pair_code)
+            positions = positions[np.argsort(-similarities[positions], kind="stable")[:limit_per_pair]]
+            links.extend(
+                (keys[first[position]], keys[second[position]], float(similarities[position]))
+                for position in positions
+            )
+        return links
+
+    def save(self):
+        """
+        Compacta el grafo (CSR base más cambios) en una nueva generación en disco.
+
+        Los nodos eliminados desaparecen y los índices se renumeran. La nueva
+        generación se escribe en su propio directorio y se activa reemplazando
+        `current.json`, de modo que un fallo a mitad no deja el grafo a medias.
+        """
+        with self._build_lock:
+            self._save()
+
+    def _save(self):
+        """
+        Implementación de `save`. Debe llamarse con `_build_lock` adquirido.
+
+        Los arrays se construyen con el lock adquirido, pero la escritura en
+        disco se hace sin él para no bloquear las consultas. Las escrituras
+        que lleguen mientras tanto solo se encolan (`_build_lock` impide
+        aplicarlas), así que el estado guardado sigue siendo el actual.
+        """
+        with self._lock:
+            alive = np.flatnonzero(self._alive)
+            remap = np.full(len(self._keys), -1, dtype=np.int64)
+            remap[alive] = np.arange(len(alive))
+
+            lengths = np.zeros(len(alive), dtype=np.int64)
+            rows_indices, rows_weights = [], []
+            for position, node in enumerate(alive):
+                indices, weights = self._row(int(node))
+                keep = self._alive[indices]
+                rows_indices.append(remap[indices[keep]])
+                rows_weights.append(weights[keep])
+                lengths[position] = int(keep.sum())
+
+            indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            indices = np.concatenate(rows_indices).astype(np.int32) if rows_indices else np.zeros(0, dtype=np.int32)
+            weights = np.concatenate(rows_weights).astype(np.float32) if rows_weights else np.zeros(0, dtype=np.float32)
+            vectors = self._vectors(alive) if len(alive) else np.zeros((0, 0), dtype=np.float32)
+            keys = [self._keys[node] for node in alive]
+            generation = self._generation + 1
+
+        directory = os.path.join(self.path, f"gen-{generation}")
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "indptr.npy"), indptr)
+        np.save(os.path.join(directory, "indices.npy"), indices)
+        np.save(os.path.join(directory, "weights.npy"), weights)
+        np.save(os.path.join(directory, "vectors.npy"), vectors)
+        with open(os.path.join(directory, "nodes.json"), "w", encoding="utf-8") as f:
+            json.dump({"k": self.k, "modules": list(self.modules), "keys": keys}, f)
+
+        current_path = os.path.join(self.path, "current.json")
+        with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": generation}, f)
+        os.replace(f"{current_path}.tmp", current_path)
+
+        arrays = self._map(directory)
+        with self._lock:
+            self._reset(keys, *arrays)
+            self._generation = generation
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        # Las generaciones anteriores ya no se usan
+        for name in os.listdir(self.path):
+            if name.startswith("gen-") and name != f"gen-{generation}":
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    @staticmethod
+    def _map(directory: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Abre con memoria mapeada los arrays (vectores, indptr, indices, weights) de una generación."""
+        return tuple(
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in ("vectors", "indptr", "indices", "weights")
+        )
+
+    def load(self) -> bool:
+        """Carga la última generación guardada; retorna False si no existe o no corresponde a la configuración."""
+        current_path = os.path.join(self.path, "current.json")
+        if not os.path.exists(current_path):
+            return False
+
+        with open(current_path, encoding="utf-8") as f:
+            generation = json.load(f)["generation"]
+
+        directory = os.path.join(self.path, f"gen-{generation}")
+        with open(os.path.join(directory, "nodes.json"), encoding="utf-8") as f:
+            nodes = json.load(f)
+        if nodes["k"] != self.k or tuple(nodes["modules"]) != self.modules:
+            return False
+        arrays = self._map(directory)
+
+        with self._lock:
+            self._reset([tuple(key) for key in nodes["keys"]], *arrays)
+            self._generation = generation
+            self._built = True
+        return True
+
+    def _run(self):
+        """
+        Bucle del hilo de actualización.
+
+        Construye el grafo si no se cargó de disco y después aplica las
+        escrituras y compacta el grafo periódicamente.
+        """
+        while not self._stopped.is_set():
+            try:
+                if not self._built:
+                    self.rebuild()
+                    logger.info("Grafo de vecinos construido", self.metrics())
+                else:
+                    self.apply_pending()
+                    if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+                        self.save()
+            except Exception as e:
+                logger.warning(f"Error al actualizar el grafo de vecinos: {str(e)}")
+            self._wake.wait(self.update_interval)
+            self._wake.clear()
+
+    def start(self):
+        """
+        Carga el grafo de disco (si existe) y arranca el hilo de actualización.
+
+        Si no hay grafo guardado, el hilo lo construye en segundo plano; hasta
+        entonces `neighbors` retorna None.
+        """
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el grafo de vecinos: {str(e)}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(target=self._run, name="quark-knn-graph", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        """Detiene el hilo de actualización, aplica lo pendiente y compacta el grafo."""
+        self._stopped.set()
+        self._wake.set()
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join()
+        self.apply_pending()
+        if self._dirty:
+            self.save()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas del grafo de vecinos."""
+        with self._lock:
+            return {
+                "built": self._built,
+                "k": self.k,
+                "nodes": int(self._alive.sum()),
+                "generation": self._generation,
+                "overlay_rows": len(self._overlay),
+                "pending_writes": len(self._pending),
+                "applied_items": self._applied_items,
+                "builds": self._builds,
+                "last_update_ms": round(self._last_update_seconds * 1000, 3)
+            }
+
+# Instancia global del grafo de vecinos
+knn_graph = KnnGraph(db_manager)
@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 import time
 import json
@@ -8,6 +9,8 @@ from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
 
+from app.config import LOG_FILE_PATH
+
 # Configurar el logger
 logger = logging.getLogger("quark")
 logger.setLevel(logging.INFO)
@@ -21,21 +24,15 @@ console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
 try:
-    # Handler para un archivo de log
-    file_handler = logging.FileHandler("logs/quark.log")
+    # Handler para un archivo de log (el directorio se crea si no existe)
+    log_dir = os.path.dirname(LOG_FILE_PATH)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    file_handler = logging.FileHandler(LOG_FILE_PATH)
     file_handler.setFormatter(formatter)
     logger.addHandler(file_handler)
-except FileNotFoundError:
-    # Si el directorio de logs no existe, lo creamos
-    import os
-    os.makedirs("logs", exist_ok=True)
-    # Intentamos de nuevo
-    try:
-        file_handler = logging.FileHandler("logs/quark.log")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    except Exception as e:
-        print(f"No se pudo crear el archivo de log: {e}")
+except Exception as e:
+    print(f"No se pudo crear el archivo de log: {e}")
 
 class CustomJSONEncoder(json.JSONEncoder):
     """
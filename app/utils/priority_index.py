@@ -0,0 +1,135 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database import db_manager
+
+PRIORITY_COLLECTION_KEY = "priorities"
+
+class PriorityIndex:
+    """
+    Índice en memoria de los registros de prioridad por (módulo, item_id).
+
+    Se carga una sola vez desde la colección de prioridades y se mantiene
+    coherente escuchando las escrituras de `ChromaDBManager`, de modo que
+    buscar el registro de un item es O(1) en lugar de leer la colección
+    completa en cada iteración.
+    """
+
+    def __init__(self, manager, collection_key: str = PRIORITY_COLLECTION_KEY):
+        """Inicializa el índice y se registra como listener de escrituras del gestor."""
+        self.manager = manager
+        self.collection_key = collection_key
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loading = False
+        self._pending: List[Tuple[str, List[Dict[str, Any]]]] = []
+        self._by_key: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._key_by_record: Dict[str, Tuple[str, str]] = {}
+        self._by_module: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        manager.add_write_listener(self._on_write)
+
+    def load(self):
+        """
+        (Re)carga el índice completo desde ChromaDB.
+
+        Las escrituras que llegan mientras se lee la colección se encolan y se
+        reaplican sobre lo leído, así que no se pierden aunque la lectura no
+        las incluya.
+        """
+        with self._lock:
+            self._loading = True
+            self._pending = []
+
+        try:
+            records = self.manager.list_items(collection_key=self.collection_key, limit=None)
+        except Exception:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            self._by_key = {}
+            self._key_by_record = {}
+            self._by_module = {}
+            for record in records:
+                self._add(record)
+            # Reaplicar en orden las escrituras recibidas durante la lectura
+            for event, items in self._pending:
+                self._apply(event, items)
+            self._pending = []
+            self._loading = False
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        """Carga el índice la primera vez que se consulta."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def _add(self, record: Dict[str, Any]):
+        """Indexa un registro. Debe llamarse con el lock adquirido."""
+        metadata = record.get("metadata") or {}
+        module = metadata.get("module")
+        item_id = metadata.get("item_id")
+        if module is None or item_id is None:
+            return
+
+        # Si hay varios registros para el mismo item se conserva el primero
+        key = (module, item_id)
+        if key in self._by_key and self._by_key[key]["id"] != record["id"]:
+            return
+
+        self._by_key[key] = record
+        self._key_by_record[record["id"]] = key
+        self._by_module.setdefault(module, {})[item_id] = record
+
+    def _remove(self, record_id: str):
+        """Elimina un registro del índice. Debe llamarse con el lock adquirido."""
+        key = self._key_by_record.pop(record_id, None)
+        if key is None:
+            return
+
+        self._by_key.pop(key, None)
+        module_records = self._by_module.get(key[0])
+        if module_records is not None:
+            module_records.pop(key[1], None)
+
+    def _on_write(self, collection_key: str, event: str, items: List[Dict[str, Any]]):
+        """Aplica al índice las escrituras sobre la colección de prioridades."""
+        if collection_key != self.collection_key:
+            return
+
+        with self._lock:
+            # Durante una carga se encolan para reaplicarlas sobre lo leído
+            if self._loading:
+                self._pending.append((event, items))
+            # Sin cargar ni cargando: la primera carga ya incluirá estas escrituras
+            if self._loaded:
+                self._apply(event, items)
+
+    def _apply(self, event: str, items: List[Dict[str, Any]]):
+        """Aplica una escritura al índice. Debe llamarse con el lock adquirido."""
+        for item in items:
+            self._remove(item["id"])
+            if event != "delete":
+                self._add({"id": item["id"], "text": item.get("text"), "metadata": item.get("metadata") or {}})
+
+    def get(self, module: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna el registro de prioridad de un item, o None si no tiene."""
+        self._ensure_loaded()
+        return self._by_key.get((module, item_id))
+
+    def get_module(self, module: str) -> Dict[str, Dict[str, Any]]:
+        """Retorna los registros de prioridad de un módulo indexados por item_id."""
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._by_module.get(module, {}))
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._by_key)
+
+# Instancia global del índice de prioridades
+priority_index = PriorityIndex(db_manager)
@@ -0,0 +1,181 @@
+import math
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import SCORING_HALF_LIFE_DAYS, PRIORITY_HIGH_PERCENTILE, PRIORITY_LOW_PERCENTILE
+from app.database import db_manager
+from app.utils.connection_graph import connection_graph
+from app.utils.priority_index import priority_index
+from app.utils.timestamps import parse_timestamp
+
+# Peso de cada componente en la puntuación final (suman 1)
+SCORE_WEIGHTS = {
+    "relevance": 0.4,
+    "usage": 0.3,
+    "degree": 0.2,
+    "length": 0.1
+}
+
+# Longitud de texto a partir de la cual el componente de longitud vale 1
+LENGTH_SATURATION = 1000
+
+class ScoreTable:
+    """
+    Columnas de puntuación de un conjunto de items de un módulo.
+
+    Cada atributo es un array de NumPy alineado con `ids`.
+    """
+
+    def __init__(self, ids: List[str], usage_count, last_accessed, relevance, length, degree):
+        self.ids = ids
+        self.usage_count = np.asarray(usage_count, dtype=np.float64)
+        self.last_accessed = np.asarray(last_accessed, dtype=np.float64)
+        self.relevance = np.asarray(relevance, dtype=np.float64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.degree = np.asarray(degree, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class ScoringEngine:
+    """
+    Motor de puntuación de relevancia vectorizado.
+
+    Carga en arrays las columnas (usage_count, last_accessed, relevance_score,
+    longitud del texto y grado de conexión) de los items de un módulo y
+    calcula todas las puntuaciones a la vez. El uso decae exponencialmente
+    con la antigüedad del último acceso (`half_life_days`). Los niveles de
+    prioridad se asignan por percentiles de la puntuación dentro del
+    conjunto evaluado.
+    """
+
+    def __init__(self, manager, index, graph=None, half_life_days: float = SCORING_HALF_LIFE_DAYS,
+                 high_percentile: float = PRIORITY_HIGH_PERCENTILE,
+                 low_percentile: float = PRIORITY_LOW_PERCENTILE,
+                 weights: Optional[Dict[str, float]] = None):
+        """Inicializa el motor sobre el gestor de base de datos y los índices de prioridades y de conexiones."""
+        self.manager = manager
+        self.index = index
+        self.graph = graph
+        self.half_life_days = half_life_days
+        self.high_percentile = high_percentile
+        self.low_percentile = low_percentile
+        self.weights = weights or SCORE_WEIGHTS
+
+    def connection_degrees(self, module: str) -> Counter:
+        """
+        Cuenta las conexiones en las que participa cada item del módulo.
+
+        Se leen del índice de conexiones en memoria, que se mantiene al día
+        con las escrituras, en lugar de recorrer la colección en cada llamada.
+        """
+        if self.graph is None:
+            return Counter()
+        return self.graph.degrees(module)
+
+    def load(self, module: str, items: List[Dict[str, Any]],
+             metadata_overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+             degrees: Optional[Counter] = None) -> ScoreTable:
+        """
+        Construye la tabla de columnas para los items dados de un módulo.
+
+        Las columnas de uso y relevancia salen de los registros de prioridad
+        (o de `metadata_overrides`, por item_id, si se proporcionan). Sin
+        registro, la relevancia por defecto depende de la longitud del texto.
+        """
+        records = self.index.get_module(module)
+        overrides = metadata_overrides or {}
+        if degrees is None:
+            degrees = self.connection_degrees(module)
+
+        n = len(items)
+        usage_count = np.zeros(n)
+        last_accessed = np.full(n, np.nan)
+        relevance = np.full(n, np.nan)
+        length = np.zeros(n)
+        degree = np.zeros(n)
+
+        for i, item in enumerate(items):
+            record = records.get(item["id"])
+            metadata = overrides.get(item["id"]) or (record["metadata"] if record else {})
+            usage_count[i] = metadata.get("usage_count", 0) or 0
+            last_accessed[i] = parse_timestamp(metadata.get("last_accessed_ts", metadata.get("last_accessed")))
+            relevance[i] = metadata.get("relevance_score", np.nan)
+            length[i] = len(item.get("text") or "")
+            degree[i] = degrees.get(item["id"], 0)
+
+        return ScoreTable([item["id"] for item in items], usage_count, last_accessed, relevance, length, degree)
+
+    def score(self, table: ScoreTable, now: Optional[float] = None) -> np.ndarray:
+        """Calcula la puntuación (entre 0 y 1) de todos los items de la tabla."""
+        if not len(table):
+            return np.zeros(0)
+
+        now = datetime.now().timestamp() if now is None else now
+
+        # Uso con decaimiento exponencial según la antigüedad del último acceso
+        age_days = np.maximum(now - table.last_accessed, 0.0) / 86400.0
+        decay = np.where(np.isnan(age_days), 0.0, np.exp(-math.log(2) * np.nan_to_num(age_days) / self.half_life_days))
+        usage = np.log1p(table.usage_count * decay)
+        usage = usage / usage.max() if usage.max() > 0 else usage
+
+        length = np.minimum(table.length / LENGTH_SATURATION, 1.0)
+        relevance = np.clip(np.where(np.isnan(table.relevance), length, table.relevance), 0.0, 1.0)
+        degree = np.log1p(table.degree)
+        degree = degree / degree.max() if degree.max() > 0 else degree
+
+        return (
+            self.weights["relevance"] * relevance
+            + self.weights["usage"] * usage
+            + self.weights["degree"] * degree
+            + self.weights["length"] * length
+        )
+
+    def levels(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Asigna niveles por percentiles: 'high' por encima de `high_percentile`,
+        'low' por debajo de `low_percentile` y 'medium' en el resto (o si todas
+        las puntuaciones son iguales).
+        """
+        levels = np.full(len(scores), "medium", dtype=object)
+        if not len(scores):
+            return levels
+
+        high_cut = np.percentile(scores, self.high_percentile)
+        low_cut = np.percentile(scores, self.low_percentile)
+        if high_cut > low_cut:
+            levels[scores >= high_cut] = "high"
+            levels[scores <= low_cut] = "low"
+        return levels
+
+    def score_items(self, module: str, items: List[Dict[str, Any]],
+                    metadata_overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """Retorna {item_id: {"score", "level", "usage_count"}} para los items dados."""
+        table = self.load(module, items, metadata_overrides)
+        scores = self.score(table)
+        levels = self.levels(scores)
+        return {
+            item_id: {
+                "score": float(scores[i]),
+                "level": levels[i],
+                "usage_count": int(table.usage_count[i])
+            }
+            for i, item_id in enumerate(table.ids)
+        }
+
+def rerank(items: List[Dict[str, Any]], similarities: List[float], scores: Dict[str, Dict[str, Any]],
+           weight: float) -> List[int]:
+    """
+    Retorna el orden de los resultados de una búsqueda combinando la
+    similitud con la puntuación de prioridad: (1 - weight) * sim + weight * score.
+    """
+    combined = (1.0 - weight) * np.asarray(similarities, dtype=np.float64) + weight * np.array(
+        [scores[item["id"]]["score"] if item["id"] in scores else 0.0 for item in items]
+    )
+    return [int(i) for i in np.argsort(-combined, kind="stable")]
+
+# Instancia global del motor de puntuación
+scoring_engine = ScoringEngine(db_manager, priority_index, connection_graph)
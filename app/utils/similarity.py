@@ -0,0 +1,309 @@
+import heapq
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import SIMILARITY_BLOCK_SIZE, CONNECTION_TOP_K, CONNECTION_MEMORY_LIMIT_MB
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """
+    Convierte una lista de embeddings en una matriz float32 con filas de norma 1.
+
+    Las filas con norma cero se dejan a cero para que su similitud con
+    cualquier otro vector sea 0 en lugar de NaN.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    return matrix / norms
+
+def iter_similar_pairs(
+    embeddings,
+    min_similarity: float,
+    block_size: int = SIMILARITY_BLOCK_SIZE
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Encuentra todos los pares (i, j) con i < j cuya similitud coseno supera el umbral.
+
+    La matriz de similitud se calcula por bloques de `block_size` x `block_size`,
+    de modo que la memoria usada no depende del número total de items. Los pares
+    se generan en el mismo orden que un doble bucle (i ascendente, j ascendente).
+    """
+    matrix = normalize_embeddings(embeddings)
+    n_items = matrix.shape[0]
+
+    for row_start in range(0, n_items, block_size):
+        row_stop = min(row_start + block_size, n_items)
+        rows = matrix[row_start:row_stop]
+
+        block_i: List[np.ndarray] = []
+        block_j: List[np.ndarray] = []
+        block_sim: List[np.ndarray] = []
+
+        # Solo hace falta el triángulo superior: columnas desde el inicio del bloque de filas
+        for col_start in range(row_start, n_items, block_size):
+            col_stop = min(col_start + block_size, n_items)
+            similarities = rows @ matrix[col_start:col_stop].T
+
+            mask = similarities >= min_similarity
+            if col_start == row_start:
+                # En el bloque diagonal descartar i >= j
+                mask = np.triu(mask, k=1)
+
+            local_i, local_j = np.nonzero(mask)
+            if local_i.size:
+                block_i.append(local_i + row_start)
+                block_j.append(local_j + col_start)
+                block_sim.append(similarities[local_i, local_j])
+
+        if not block_i:
+            continue
+
+        pair_i = np.concatenate(block_i)
+        pair_j = np.concatenate(block_j)
+        pair_sim = np.concatenate(block_sim)
+
+        # Ordenar como lo haría un doble bucle
+        order = np.lexsort((pair_j, pair_i))
+        for k in order:
+            yield int(pair_i[k]), int(pair_j[k]), float(pair_sim[k])
+
+def find_similar_pairs(
+    embeddings,
+    min_similarity: float,
+    block_size: int = SIMILARITY_BLOCK_SIZE
+) -> List[Tuple[int, int, float]]:
+    """Versión en lista de `iter_similar_pairs`."""
+    return list(iter_similar_pairs(embeddings, min_similarity, block_size=block_size))
+
+# Bytes por celda de una tesela de similitud: la similitud (float32), el índice de
+# `argpartition` (int64) y la copia interna que `argpartition` ordena
+CROSS_BYTES_PER_CELL = 24
+
+def cross_block_shape(n_rows: int, n_cols: int, memory_limit_bytes: int) -> Tuple[int, int]:
+    """Elige el tamaño (filas, columnas) de las teselas de similitud para no superar `memory_limit_bytes`."""
+    cells = max(memory_limit_bytes // CROSS_BYTES_PER_CELL, 1)
+    rows = min(n_rows, max(int(np.sqrt(cells)), 1))
+    cols = min(n_cols, max(cells // rows, 1))
+    rows = min(n_rows, max(cells // cols, 1))
+    return rows, cols
+
+def top_k_cross_similarities(
+    left: np.ndarray,
+    right: np.ndarray,
+    k: int,
+    memory_limit_bytes: int,
+    min_similarity: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Para cada fila de `left` encuentra las `k` filas de `right` más similares.
+
+    Ambas matrices deben tener filas de norma 1 (ver `normalize_embeddings`).
+    La matriz de similitud completa nunca se materializa: se calcula por
+    teselas cuyo tamaño se ajusta a `memory_limit_bytes` y los k mejores de
+    cada fila se combinan tesela a tesela con `argpartition`. Con
+    `min_similarity` solo se consideran las similitudes que lo alcanzan y se
+    omiten las filas de cada tesela sin ningún candidato.
+
+    Retorna (índices, similitudes), ambos de forma (len(left), k) y
+    ordenados por similitud descendente; los huecos se rellenan con índice
+    -1 y similitud -inf.
+    """
+    n_left, n_right = len(left), len(right)
+    k = min(k, n_right)
+    indices = np.full((n_left, k), -1, dtype=np.int64)
+    similarities = np.full((n_left, k), -np.inf, dtype=np.float32)
+    if not n_left or not k:
+        return indices, similarities
+
+    block_rows, block_cols = cross_block_shape(n_left, n_right, memory_limit_bytes)
+
+    for row_start in range(0, n_left, block_rows):
+        rows = left[row_start:row_start + block_rows]
+        best_idx = indices[row_start:row_start + len(rows)]
+        best_sim = similarities[row_start:row_start + len(rows)]
+
+        for col_start in range(0, n_right, block_cols):
+            block = rows @ right[col_start:col_start + block_cols].T
+            if min_similarity is not None:
+                active = np.flatnonzero(block.max(axis=1) >= min_similarity)
+                if not active.size:
+                    continue
+                block = block[active]
+            else:
+                active = slice(None)
+
+            n_cols = block.shape[1]
+            kk = min(k, n_cols)
+            if n_cols > kk:
+                candidates = np.argpartition(block, n_cols - kk, axis=1)[:, n_cols - kk:]
+            else:
+                candidates = np.broadcast_to(np.arange(n_cols), block.shape)
+
+            # Combinar los candidatos de la tesela con los mejores acumulados
+            merged_idx = np.concatenate([best_idx[active], candidates + col_start], axis=1)
+            merged_sim = np.concatenate([best_sim[active], np.take_along_axis(block, candidates, axis=1)], axis=1)
+            if min_similarity is not None:
+                merged_sim[merged_sim < min_similarity] = -np.inf
+            keep = np.argpartition(merged_sim, merged_sim.shape[1] - k, axis=1)[:, merged_sim.shape[1] - k:]
+            best_idx[active] = np.take_along_axis(merged_idx, keep, axis=1)
+            best_sim[active] = np.take_along_axis(merged_sim, keep, axis=1)
+
+        order = np.argsort(-best_sim, axis=1, kind="stable")
+        best_idx[:] = np.take_along_axis(best_idx, order, axis=1)
+        best_sim[:] = np.take_along_axis(best_sim, order, axis=1)
+
+    indices[np.isneginf(similarities)] = -1
+    return indices, similarities
+
+def strongest_cross_links(
+    left: np.ndarray,
+    right: np.ndarray,
+    limit: int,
+    min_similarity: float,
+    k: int = CONNECTION_TOP_K,
+    memory_limit_bytes: int = CONNECTION_MEMORY_LIMIT_MB * 1024 * 1024
+) -> List[Tuple[int, int, float]]:
+    """
+    Retorna como máximo `limit` enlaces (i, j, similitud) entre filas de
+    `left` y de `right`, de mayor a menor similitud.
+
+    Cada fila de `left` aporta como mucho sus `k` vecinos más cercanos en
+    `right` por encima de `min_similarity`, de modo que un solo item no puede
+    acaparar todos los enlaces de un par de módulos.
+    """
+    indices, similarities = top_k_cross_similarities(left, right, k, memory_limit_bytes, min_similarity)
+    rows, cols = np.nonzero(indices >= 0)
+    if not rows.size:
+        return []
+
+    values = similarities[rows, cols]
+    if rows.size > limit:
+        keep = np.argpartition(-values, limit - 1)[:limit]
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+
+    targets = indices[rows, cols]
+    order = np.lexsort((targets, rows, -values))
+    return [(int(rows[n]), int(targets[n]), float(values[n])) for n in order]
+
+def distance_to_similarity(distances, space: str = "l2") -> List[float]:
+    """
+    Convierte distancias de ChromaDB en similitud coseno.
+
+    ChromaDB usa por defecto la distancia L2 al cuadrado; para vectores de
+    norma 1 equivale a 2 - 2·cos. Para los espacios "cosine" e "ip" la
+    distancia ya es 1 - similitud.
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if space == "l2":
+        similarities = 1.0 - distances / 2.0
+    else:
+        similarities = 1.0 - distances
+
+    return similarities.tolist()
+
+def merge_ranked(
+    ranked_lists: Iterable[List[Dict[str, Any]]],
+    limit: Optional[int] = None,
+    key: str = "distance"
+) -> List[Dict[str, Any]]:
+    """
+    Mezcla listas de resultados ya ordenadas por `key` (ascendente) en una sola lista global.
+
+    Usa una mezcla por montículo (k-way merge), de modo que solo se recorren
+    los primeros `limit` resultados sin reordenar todas las listas.
+    """
+    merged = heapq.merge(*ranked_lists, key=lambda hit: hit[key])
+    return list(islice(merged, limit))
+
+def iter_neighbor_pairs(
+    ids: List[str],
+    neighbors: List[List[Tuple[str, float]]],
+    min_similarity: float
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Convierte las listas de vecinos de cada item en pares únicos (i, j) con i < j.
+
+    `neighbors[i]` contiene los (id, similitud) más cercanos a `ids[i]`. Se
+    descartan el propio item, los vecinos que no están en `ids` y los pares
+    por debajo del umbral; cada par se genera una sola vez aunque aparezca en
+    las listas de ambos items.
+    """
+    index = {item_id: i for i, item_id in enumerate(ids)}
+    seen = set()
+
+    for i, item_neighbors in enumerate(neighbors):
+        for neighbor_id, similarity in item_neighbors:
+            j = index.get(neighbor_id)
+            if j is None or j == i or similarity < min_similarity:
+                continue
+
+            pair = (i, j) if i < j else (j, i)
+            if pair in seen:
+                continue
+
+            seen.add(pair)
+            yield pair[0], pair[1], float(similarity)
+
+class UnionFind:
+    """
+    Estructura union-find (conjuntos disjuntos) sobre claves arbitrarias.
+
+    Usa compresión de caminos y unión por tamaño, de modo que agrupar los
+    pares de duplicados conectados (A~B, B~C) es prácticamente lineal.
+    """
+
+    def __init__(self):
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._size: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable):
+        """Añade una clave como conjunto propio si todavía no existe."""
+        if key not in self._parent:
+            self._parent[key] = key
+            self._size[key] = 1
+
+    def find(self, key: Hashable) -> Hashable:
+        """Retorna el representante del conjunto de la clave."""
+        self.add(key)
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+
+        # Compresión de caminos
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+
+        return root
+
+    def union(self, a: Hashable, b: Hashable) -> Hashable:
+        """Une los conjuntos de ambas claves y retorna el nuevo representante."""
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return root_a
+
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size[root_b]
+        return root_a
+
+    def groups(self, min_size: int = 2) -> List[List[Hashable]]:
+        """
+        Retorna los conjuntos con al menos `min_size` elementos.
+
+        Los miembros de cada grupo, y los grupos entre sí, mantienen el orden
+        en que las claves se añadieron.
+        """
+        members: Dict[Hashable, List[Hashable]] = {}
+        for key in self._parent:
+            members.setdefault(self.find(key), []).append(key)
+
+        return [group for group in members.values() if len(group) >= min_size]
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.config import SNAPSHOT_MAX_ENTRIES, SNAPSHOT_SETTLE_SECONDS, SNAPSHOT_REFRESH_INTERVAL_SECONDS
+from app.database import db_manager
+from app.utils.logger import logger
+
+class SnapshotCache:
+    """
+    Caché de resultados de análisis versionados por los datos que leyeron.
+
+    Cada tipo de análisis se registra con su modelo de petición, la función
+    que lo calcula y una función que indica de qué colecciones depende. Un
+    resultado se guarda junto con las versiones de esas colecciones
+    (`ChromaDBManager.data_versions`) leídas antes de calcularlo y se sirve
+    mientras no cambien. Un hilo en segundo plano recalcula las instantáneas
+    desactualizadas cuando sus colecciones llevan `settle_seconds` sin
+    escrituras, de modo que la siguiente petición ya no paga el cálculo.
+    Como máximo se mantienen `max_entries` instantáneas (LRU).
+    """
+
+    def __init__(self, manager, max_entries: int = SNAPSHOT_MAX_ENTRIES,
+                 settle_seconds: float = SNAPSHOT_SETTLE_SECONDS,
+                 refresh_interval: float = SNAPSHOT_REFRESH_INTERVAL_SECONDS):
+        """Inicializa la caché vacía; el hilo de refresco se arranca con `start`."""
+        self.manager = manager
+        self.max_entries = max(max_entries, 1)
+        self.settle_seconds = settle_seconds
+        self.refresh_interval = refresh_interval
+        self._analyses: Dict[str, Dict[str, Any]] = {}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._failed_refreshes = 0
+
+    def register(self, kind: str, request_model: type,
+                 compute: Callable[[BaseModel], Awaitable[Dict[str, Any]]],
+                 dependencies: Callable[[BaseModel], List[str]]):
+        """Registra un tipo de análisis: cómo calcularlo y de qué colecciones depende."""
+        self._analyses[kind] = {"request_model": request_model, "compute": compute, "dependencies": dependencies}
+
+    @staticmethod
+    def _key(kind: str, params: Dict[str, Any]) -> str:
+        """Clave de una instantánea: el tipo de análisis y sus parámetros normalizados."""
+        return f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def _store(self, key: str, entry: Dict[str, Any]):
+        """Guarda una instantánea descartando la menos usada si se supera `max_entries`."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def _compute(self, kind: str, request: BaseModel) -> Dict[str, Any]:
+        """Calcula un análisis y guarda la instantánea con las versiones leídas antes del cálculo."""
+        analysis = self._analyses[kind]
+        params = jsonable_encoder(request)
+        dependencies = sorted(set(analysis["dependencies"](request)))
+        versions = self.manager.data_versions(dependencies)
+
+        result = await analysis["compute"](request)
+
+        self._store(self._key(kind, params), {
+            "kind": kind,
+            "params": params,
+            "dependencies": dependencies,
+            "versions": versions,
+            "result": result,
+            "computed_at": datetime.now().isoformat()
+        })
+        return result
+
+    async def get_or_compute(self, kind: str, request: BaseModel) -> Dict[str, Any]:
+        """
+        Retorna la instantánea del análisis si sus datos no han cambiado o la calcula.
+
+        Los errores del cálculo (por ejemplo, una petición inválida) se
+        propagan y no se guardan.
+        """
+        key = self._key(kind, jsonable_encoder(request))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and entry["versions"] == self.manager.data_versions(entry["dependencies"]):
+            with self._lock:
+                self._hits += 1
+            return {**entry["result"], "cached": True}
+
+        with self._lock:
+            self._misses += 1
+        return await self._compute(kind, request)
+
+    def refresh_stale(self) -> int:
+        """
+        Recalcula las instantáneas desactualizadas cuyas colecciones ya no reciben escrituras.
+
+        Se ejecuta en un bucle de eventos propio (el del hilo de refresco) y
+        retorna el número de instantáneas recalculadas.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+
+        refreshed = 0
+        for entry in entries:
+            if entry["versions"] == self.manager.data_versions(entry["dependencies"]):
+                continue
+            if self.manager.seconds_since_write(entry["dependencies"]) < self.settle_seconds:
+                continue
+
+            analysis = self._analyses[entry["kind"]]
+            try:
+                asyncio.run(self._compute(entry["kind"], analysis["request_model"](**entry["params"])))
+                refreshed += 1
+            except Exception as e:
+                with self._lock:
+                    self._failed_refreshes += 1
+                logger.warning(f"Error al recalcular la instantánea '{entry['kind']}': {str(e)}")
+
+        with self._lock:
+            self._refreshes += refreshed
+        return refreshed
+
+    def _run(self):
+        """Bucle del hilo de refresco."""
+        while not self._stopped.wait(self.refresh_interval):
+            self.refresh_stale()
+
+    def start(self):
+        """Arranca el hilo de refresco si no está en marcha."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(target=self._run, name="quark-snapshot-refresher", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        """Detiene el hilo de refresco."""
+        self._stopped.set()
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas de la caché de instantáneas."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "refreshes": self._refreshes,
+                "failed_refreshes": self._failed_refreshes
+            }
+
+# Instancia global de la caché de instantáneas
+snapshot_cache = SnapshotCache(db_manager)
@@ -0,0 +1,482 @@
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    THEME_MODEL_PATH, THEME_UPDATE_INTERVAL_SECONDS, THEME_SAVE_INTERVAL_SECONDS, THEME_RECLUSTER_RATIO
+)
+from app.database import db_manager
+from app.utils.clustering import discover_themes
+from app.utils.logger import logger
+from app.utils.similarity import normalize_embeddings
+
+# Módulos cuyos items se agrupan en temas
+THEME_MODULES = ("identity", "business", "reminders", "learnings")
+
+# Candidatos a representante que se conservan por tema (por si se elimina el primero)
+REPRESENTATIVES_PER_THEME = 5
+
+# Longitud máxima del texto guardado para cada representante
+REPRESENTATIVE_TEXT_LENGTH = 200
+
+class ThemeModel:
+    """
+    Modelo de temas persistente que se actualiza de forma incremental.
+
+    Guarda los centroides de k-means, el número de items de cada módulo
+    asignados a cada tema, el tema y el vector (float16) de cada item y unos
+    pocos representantes por tema. Se ajusta una vez sobre el corpus completo
+    (`rebuild`) y después escucha las escrituras de `ChromaDBManager`: los
+    items añadidos o modificados se asignan al centroide más cercano y mueven
+    ese centroide con la actualización de mini-batch k-means (media ponderada
+    por el número de vectores que ha absorbido); los modificados y los
+    eliminados restan antes la contribución de su vector anterior, de modo
+    que cada centroide sigue siendo la media de los items de su tema.
+    Las escrituras se acumulan y un hilo en segundo plano las aplica por
+    lotes cada `update_interval` segundos y guarda el modelo en disco cada
+    `save_interval` segundos, de modo que leer los temas es O(k).
+
+    Las actualizaciones incrementales conservan el número de temas del
+    último ajuste; cuando los items escritos desde entonces alcanzan la
+    fracción `recluster_ratio` del corpus ajustado, el mismo hilo vuelve a
+    agrupar el corpus (y a elegir k). El ajuste nunca se hace al leer: hasta
+    que el hilo termina el primero, `themes` retorna una lista vacía.
+    """
+
+    def __init__(self, manager, path: str = THEME_MODEL_PATH,
+                 update_interval: float = THEME_UPDATE_INTERVAL_SECONDS,
+                 save_interval: float = THEME_SAVE_INTERVAL_SECONDS,
+                 recluster_ratio: float = THEME_RECLUSTER_RATIO,
+                 modules=THEME_MODULES):
+        """Inicializa un modelo vacío y se registra como listener de escrituras del gestor."""
+        self.manager = manager
+        self.path = path
+        self.update_interval = update_interval
+        self.save_interval = save_interval
+        self.recluster_ratio = recluster_ratio
+        self.modules = tuple(modules)
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._pending: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        self._reset()
+        # Items del último ajuste y items escritos desde entonces; sin ajuste, el corpus está por leer
+        self._fitted_items = 0
+        self._changed_items = 0
+        self._stale = True
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._rebuilds = 0
+        self._applied_items = 0
+        self._last_update_seconds = 0.0
+        manager.add_write_listener(self._on_write)
+
+    def _reset(self, centroids: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None):
+        """Reinicia el estado con los centroides dados. Debe llamarse con el lock adquirido."""
+        k = 0 if centroids is None else len(centroids)
+        self._centroids = centroids
+        self._weights = np.zeros(k) if weights is None else np.asarray(weights, dtype=np.float64)
+        self._counts = {module: np.zeros(k, dtype=np.int64) for module in self.modules}
+        # (módulo, item_id) -> tema
+        self._assignments: Dict[Tuple[str, str], int] = {}
+        self._representatives: List[List[Dict[str, Any]]] = [[] for _ in range(k)]
+        # Vector normalizado de cada item: fila de `_vectors` por (módulo, item_id) y filas libres
+        dimension = 0 if centroids is None else centroids.shape[1]
+        self._vectors = np.zeros((0, dimension), dtype=np.float16)
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._free_rows: List[int] = []
+
+    @property
+    def fitted(self) -> bool:
+        """Indica si el modelo tiene centroides."""
+        return self._centroids is not None and len(self._centroids) > 0
+
+    def _assign(self, module: str, item_id: str, text: str, label: int, similarity: float):
+        """Registra el tema de un item. Debe llamarse con el lock adquirido."""
+        self._assignments[(module, item_id)] = label
+        self._counts[module][label] += 1
+
+        candidates = self._representatives[label]
+        candidates.append({
+            "id": item_id,
+            "module": module,
+            "text": (text or "")[:REPRESENTATIVE_TEXT_LENGTH],
+            "similarity": float(similarity)
+        })
+        candidates.sort(key=lambda candidate: candidate["similarity"], reverse=True)
+        del candidates[REPRESENTATIVES_PER_THEME:]
+
+    def _set_vector(self, key: Tuple[str, str], vector: np.ndarray):
+        """Guarda el vector de un item, reutilizando filas libres. Debe llamarse con el lock adquirido."""
+        row = self._rows.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                # Sin filas libres, las filas 0..len(_rows)-1 están ocupadas
+                row = len(self._rows)
+                if row >= len(self._vectors):
+                    grown = np.zeros((max(2 * len(self._vectors), 1024), self._vectors.shape[1]), dtype=np.float16)
+                    grown[:len(self._vectors)] = self._vectors
+                    self._vectors = grown
+            self._rows[key] = row
+        self._vectors[row] = vector
+
+    def _unassign(self, module: str, item_id: str) -> Optional[int]:
+        """
+        Descuenta un item de su tema y lo retira de los representantes. Debe llamarse con el lock adquirido.
+
+        El centroide resta la contribución del vector del item:
+        c' = c + (c - v) / (n - 1).
+        """
+        label = self._assignments.pop((module, item_id), None)
+        if label is None:
+            return None
+
+        weight = self._weights[label]
+        row = self._rows.pop((module, item_id), None)
+        if row is not None:
+            self._free_rows.append(row)
+            if weight > 1:
+                vector = self._vectors[row].astype(np.float32)
+                self._centroids[label] += ((self._centroids[label] - vector) / (weight - 1)).astype(np.float32)
+
+        self._counts[module][label] -= 1
+        self._weights[label] = max(weight - 1, 0.0)
+        self._representatives[label] = [
+            candidate for candidate in self._representatives[label]
+            if (candidate["module"], candidate["id"]) != (module, item_id)
+        ]
+        return label
+
+    def rebuild(self):
+        """Ajusta el modelo desde cero sobre todos los items de los módulos."""
+        with self._build_lock:
+            start_time = time.perf_counter()
+            # Las escrituras anteriores a la lectura ya están en el corpus
+            with self._lock:
+                self._pending = []
+                self._stale = False
+
+            keys, texts, embeddings = [], [], []
+            for module in self.modules:
+                items = self.manager.list_items(collection_key=module, limit=None)
+                if not items:
+                    continue
+                embeddings.extend(self.manager.get_item_embeddings(collection_key=module, items=items))
+                keys.extend((module, item["id"]) for item in items)
+                texts.extend(item["text"] for item in items)
+
+            if not keys:
+                with self._lock:
+                    self._reset()
+                    self._fitted_items = self._changed_items = 0
+                    self._dirty = True
+                    self._rebuilds += 1
+                return
+
+            matrix = normalize_embeddings(embeddings)
+            labels = discover_themes(matrix)["labels"]
+            # Numerar los temas de forma consecutiva por si alguno quedó vacío
+            _, labels = np.unique(labels, return_inverse=True)
+            k = int(labels.max()) + 1
+
+            sums = np.zeros((k, matrix.shape[1]), dtype=np.float64)
+            np.add.at(sums, labels, matrix)
+            weights = np.bincount(labels, minlength=k).astype(np.float64)
+            centroids = (sums / weights[:, None]).astype(np.float32)
+            similarities = np.einsum("ij,ij->i", matrix, normalize_embeddings(centroids)[labels])
+
+            with self._lock:
+                self._reset(centroids, weights)
+                self._vectors = matrix.astype(np.float16)
+                self._rows = {key: i for i, key in enumerate(keys)}
+                for i in np.lexsort((-similarities, labels)):
+                    module, item_id = keys[i]
+                    label = int(labels[i])
+                    self._assignments[(module, item_id)] = label
+                    self._counts[module][label] += 1
+                    if len(self._representatives[label]) < REPRESENTATIVES_PER_THEME:
+                        self._representatives[label].append({
+                            "id": item_id,
+                            "module": module,
+                            "text": texts[i][:REPRESENTATIVE_TEXT_LENGTH],
+                            "similarity": float(similarities[i])
+                        })
+                self._fitted_items = len(keys)
+                self._changed_items = 0
+                self._dirty = True
+                self._rebuilds += 1
+                self._last_update_seconds = time.perf_counter() - start_time
+
+        self.save()
+
+    def needs_rebuild(self) -> bool:
+        """
+        Indica si el corpus debe volver a agruparse.
+
+        Ocurre si el modelo aún no se ha ajustado sobre el corpus actual o si
+        los items escritos desde el último ajuste alcanzan `recluster_ratio`
+        veces los items ajustados: el número de temas se eligió para el corpus
+        de entonces y las actualizaciones incrementales no lo cambian.
+        """
+        with self._lock:
+            if self._stale:
+                return True
+            if self.recluster_ratio <= 0 or not self.fitted:
+                return False
+            return self._changed_items >= self.recluster_ratio * max(self._fitted_items, 1)
+
+    def _on_write(self, collection_key: str, event: str, items: List[Dict[str, Any]]):
+        """Encola las escrituras sobre los módulos para aplicarlas por lotes."""
+        if collection_key not in self.modules:
+            return
+
+        with self._lock:
+            self._pending.append((collection_key, event, items))
+            # Sin modelo, la siguiente pasada del hilo ajusta sobre el corpus con la escritura
+            if not self.fitted:
+                self._stale = True
+
+    def apply_pending(self) -> int:
+        """
+        Aplica al modelo las escrituras pendientes y retorna el número de items procesados.
+
+        Solo se considera la última escritura de cada item. Los vectores se
+        obtienen de la función de embeddings del gestor (normalmente desde la
+        caché, porque acaban de codificarse al escribir). Si el hilo está
+        reagrupando el corpus no espera y retorna 0: las escrituras quedan
+        pendientes para la siguiente pasada.
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                # Sin modelo no hay nada que actualizar: el hilo ajustará sobre el corpus completo
+                if not pending or not self.fitted:
+                    return 0
+
+            start_time = time.perf_counter()
+            latest: Dict[Tuple[str, str], Optional[str]] = {}
+            for module, event, items in pending:
+                for item in items:
+                    latest[(module, item["id"])] = None if event == "delete" else (item.get("text") or "")
+
+            changed = [(key, text) for key, text in latest.items() if text is not None]
+            vectors = normalize_embeddings(self.manager.embedding_function([text for _, text in changed])) if changed else None
+
+            with self._lock:
+                for key, text in latest.items():
+                    if text is None:
+                        if self._unassign(*key) is not None:
+                            self._dirty = True
+
+                # Los items cuyo vector no cambia (por ejemplo, solo metadatos) no alteran el modelo;
+                # los demás restan su contribución anterior antes de reasignarse
+                batch = []
+                for i, (key, _) in enumerate(changed):
+                    row = self._rows.get(key)
+                    if row is not None and np.array_equal(self._vectors[row], vectors[i].astype(np.float16)):
+                        continue
+                    self._unassign(*key)
+                    batch.append(i)
+
+                if batch:
+                    batch = np.asarray(batch)
+                    batch_vectors = vectors[batch]
+                    similarity = batch_vectors @ normalize_embeddings(self._centroids).T
+                    labels = similarity.argmax(axis=1)
+                    best = similarity.max(axis=1)
+
+                    for position, i in enumerate(batch):
+                        (module, item_id), text = changed[i]
+                        self._assign(module, item_id, text, int(labels[position]), best[position])
+                        self._set_vector((module, item_id), batch_vectors[position])
+
+                    # Actualización de mini-batch k-means: cada centroide se desplaza
+                    # hacia la media de sus nuevos vectores con tasa m / (n + m)
+                    sums = np.zeros_like(self._centroids, dtype=np.float64)
+                    np.add.at(sums, labels, batch_vectors)
+                    batch_counts = np.bincount(labels, minlength=len(self._centroids)).astype(np.float64)
+                    touched = batch_counts > 0
+                    self._weights[touched] += batch_counts[touched]
+                    self._centroids[touched] += (
+                        (sums[touched] - batch_counts[touched, None] * self._centroids[touched])
+                        / self._weights[touched, None]
+                    ).astype(np.float32)
+
+                    self._dirty = True
+
+                self._applied_items += len(latest)
+                self._changed_items += len(latest)
+                self._last_update_seconds = time.perf_counter() - start_time
+
+            return len(latest)
+        finally:
+            self._build_lock.release()
+
+    def themes(self, modules: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Retorna los temas de los módulos indicados, de mayor a menor tamaño.
+
+        Cada tema es {"label", "size", "representative": {"id", "module",
+        "text"}}; el representante es el item más cercano al centroide entre
+        los de esos módulos. No recorre el corpus: el coste es O(k). Retorna
+        una lista vacía si el modelo aún no se ha ajustado.
+        """
+        modules = [module for module in (modules or self.modules) if module in self._counts]
+
+        with self._lock:
+            if not self.fitted:
+                return []
+
+            sizes = sum(self._counts[module] for module in modules)
+            themes = []
+            for label, size in enumerate(sizes):
+                candidates = [candidate for candidate in self._representatives[label] if candidate["module"] in modules]
+                if size <= 0 or not candidates:
+                    continue
+                representative = candidates[0]
+                themes.append({
+                    "label": label,
+                    "size": int(size),
+                    "representative": {key: representative[key] for key in ("id", "module", "text")}
+                })
+
+        themes.sort(key=lambda theme: theme["size"], reverse=True)
+        return themes
+
+    def save(self):
+        """Guarda el modelo en disco de forma atómica (archivo temporal y renombrado)."""
+        with self._lock:
+            if not self.fitted:
+                self._dirty = False
+                return
+
+            module_index = {module: i for i, module in enumerate(self.modules)}
+            keys = list(self._assignments.items())
+            buffer = io.BytesIO()
+            np.savez(
+                buffer,
+                centroids=self._centroids,
+                weights=self._weights,
+                modules=np.array(self.modules),
+                counts=np.stack([self._counts[module] for module in self.modules]),
+                item_modules=np.array([module_index[module] for (module, _), _ in keys], dtype=np.int16),
+                item_ids=np.array([item_id for (_, item_id), _ in keys], dtype=str),
+                item_labels=np.array([label for _, label in keys], dtype=np.int32),
+                item_vectors=self._vectors[[self._rows[key] for key, _ in keys]],
+                representatives=np.array(json.dumps(self._representatives)),
+                fit_counts=np.array([self._fitted_items, self._changed_items], dtype=np.int64)
+            )
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """Carga el modelo guardado en disco; retorna False si no existe o no corresponde a los módulos."""
+        if not os.path.exists(self.path):
+            return False
+
+        with np.load(self.path, allow_pickle=False) as data:
+            # Los modelos sin vectores por item no pueden restar contribuciones: se reajustan
+            if tuple(data["modules"].tolist()) != self.modules or "item_vectors" not in data:
+                return False
+
+            with self._lock:
+                self._reset(data["centroids"].astype(np.float32), data["weights"])
+                for module, counts in zip(self.modules, data["counts"]):
+                    self._counts[module] = counts.astype(np.int64)
+                self._assignments = {
+                    (self.modules[module], str(item_id)): int(label)
+                    for module, item_id, label in zip(data["item_modules"], data["item_ids"], data["item_labels"])
+                }
+                self._vectors = data["item_vectors"].astype(np.float16)
+                self._rows = {key: i for i, key in enumerate(self._assignments)}
+                self._representatives = json.loads(str(data["representatives"]))
+                # Items del último ajuste y escritos desde entonces (el reagrupamiento sobrevive a reinicios)
+                if "fit_counts" in data:
+                    self._fitted_items, self._changed_items = (int(count) for count in data["fit_counts"])
+                else:
+                    self._fitted_items, self._changed_items = len(self._assignments), 0
+                self._stale = False
+                self._dirty = False
+
+        return True
+
+    def _run(self):
+        """
+        Bucle del hilo de actualización.
+
+        Ajusta el modelo si no está ajustado o si el corpus ha cambiado lo
+        suficiente; si no, aplica las escrituras pendientes. Guarda el
+        modelo periódicamente.
+        """
+        while not self._stopped.is_set():
+            try:
+                if self.needs_rebuild():
+                    self.rebuild()
+                    logger.info("Modelo de temas reagrupado", self.metrics())
+                else:
+                    self.apply_pending()
+                if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+                    self.save()
+            except Exception as e:
+                logger.warning(f"Error al actualizar el modelo de temas: {str(e)}")
+            self._wake.wait(self.update_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Carga el modelo de disco (si aún no tiene uno) y arranca el hilo que lo ajusta y actualiza."""
+        try:
+            if not self.fitted:
+                self.load()
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el modelo de temas: {str(e)}")
+
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(target=self._run, name="quark-theme-model", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        """Detiene el hilo de actualización, aplica lo pendiente y guarda el modelo."""
+        self._stopped.set()
+        self._wake.set()
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join()
+        self.apply_pending()
+        if self._dirty:
+            self.save()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas del modelo de temas."""
+        with self._lock:
+            return {
+                "fitted": self.fitted,
+                "themes": 0 if self._centroids is None else len(self._centroids),
+                "items": len(self._assignments),
+                "pending_writes": len(self._pending),
+                "changed_since_fit": self._changed_items,
+                "applied_items": self._applied_items,
+                "rebuilds": self._rebuilds,
+                "last_update_ms": round(self._last_update_seconds * 1000, 3)
+            }
+
+# Instancia global del modelo de temas
+theme_model = ThemeModel(db_manager)
@@ -0,0 +1,43 @@
+import math
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Campos de fecha ISO 8601 que se guardan también como epoch numérico (`<campo>_ts`)
+EPOCH_FIELDS = ("updated_at", "last_accessed")
+
+def parse_timestamp(value) -> float:
+    """Convierte una fecha ISO 8601 (o un epoch) a segundos epoch; NaN si no es válida."""
+    if value is None or value == "":
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+def epoch_field(field: str) -> str:
+    """Nombre del campo numérico que acompaña a un campo de fecha."""
+    return f"{field}_ts"
+
+def with_epoch_fields(metadata: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Retorna una copia de los metadatos con `<campo>_ts` (segundos epoch) para
+    cada campo de `EPOCH_FIELDS` con una fecha válida.
+
+    ChromaDB solo admite `$lt`/`$gte` sobre números, así que las consultas
+    por rango de fechas se hacen sobre estos campos.
+    """
+    if not metadata:
+        return metadata
+
+    enriched = dict(metadata)
+    for field in EPOCH_FIELDS:
+        value = parse_timestamp(metadata.get(field))
+        if not math.isnan(value):
+            enriched[epoch_field(field)] = value
+    return enriched
+
+def needs_epoch_fields(metadata: Optional[Dict[str, Any]]) -> bool:
+    """Indica si a los metadatos les falta algún `<campo>_ts` o no coincide con su fecha."""
+    return bool(metadata) and with_epoch_fields(metadata) != metadata
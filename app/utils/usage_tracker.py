@@ -0,0 +1,225 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import USAGE_FLUSH_INTERVAL_SECONDS, USAGE_MAX_LAG_HITS, USAGE_MAX_ITEMS
+from app.database import db_manager
+from app.models.schemas import generate_id
+from app.utils.logger import logger
+from app.utils.priority_index import priority_index
+
+# Módulos cuyos items tienen registros de prioridad
+TRACKED_MODULES = ("identity", "business", "reminders", "learnings")
+
+class UsageTracker:
+    """
+    Contador de accesos en memoria que alimenta `usage_count` y `last_accessed`.
+
+    Las lecturas solo incrementan un contador en memoria; un hilo en segundo
+    plano vuelca los contadores a la colección de prioridades cada
+    `flush_interval` segundos con una escritura masiva por volcado. Si se
+    acumulan `max_lag` accesos sin volcar, el volcado se adelanta. Como
+    máximo se mantienen `max_items` contadores distintos: los accesos a items
+    nuevos por encima del límite se descartan hasta el siguiente volcado.
+    """
+
+    def __init__(self, manager, index, flush_interval: float = USAGE_FLUSH_INTERVAL_SECONDS,
+                 max_lag: int = USAGE_MAX_LAG_HITS, max_items: int = USAGE_MAX_ITEMS,
+                 collection_key: str = "priorities"):
+        """Inicializa el contador; el hilo de volcado se arranca con `start`."""
+        self.manager = manager
+        self.index = index
+        self.flush_interval = flush_interval
+        self.max_lag = max(max_lag, 1)
+        self.max_items = max(max_items, 1)
+        self.collection_key = collection_key
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        # (módulo, item_id) -> [accesos, último acceso en ISO 8601]
+        self._counters: Dict[Tuple[str, str], List[Any]] = {}
+        self._pending_hits = 0
+        self._recorded = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._flushed_hits = 0
+        self._failed_flushes = 0
+        self._last_flush_seconds = 0.0
+
+    def record(self, module: str, item_ids: Iterable[str]):
+        """Registra un acceso a cada item; no realiza ninguna escritura."""
+        if module not in TRACKED_MODULES:
+            return
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            for item_id in item_ids:
+                key = (module, item_id)
+                counter = self._counters.get(key)
+                if counter is None:
+                    if len(self._counters) >= self.max_items:
+                        self._dropped += 1
+                        continue
+                    counter = self._counters[key] = [0, now]
+
+                counter[0] += 1
+                counter[1] = now
+                self._pending_hits += 1
+                self._recorded += 1
+
+            lagging = self._pending_hits >= self.max_lag or len(self._counters) >= self.max_items
+
+        if lagging:
+            self._wake.set()
+
+    def _take(self) -> Dict[Tuple[str, str], List[Any]]:
+        """Retira los contadores pendientes para volcarlos."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            self._pending_hits = 0
+        return counters
+
+    def _restore(self, counters: Dict[Tuple[str, str], List[Any]]):
+        """Devuelve a memoria los contadores de un volcado fallido, respetando `max_items`."""
+        with self._lock:
+            for key, (hits, last_accessed) in counters.items():
+                counter = self._counters.get(key)
+                if counter is None:
+                    if len(self._counters) >= self.max_items:
+                        self._dropped += hits
+                        continue
+                    self._counters[key] = [hits, last_accessed]
+                else:
+                    counter[0] += hits
+                    counter[1] = max(counter[1], last_accessed)
+                self._pending_hits += hits
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Vuelca los contadores a la colección de prioridades.
+
+        Los registros existentes se actualizan con una llamada a
+        `update_items` que solo combina `usage_count` (como incremento) y
+        `last_accessed` con los metadatos guardados, de modo que no pisa los
+        cambios de prioridad hechos desde que se leyó el índice. Los items sin
+        registro reciben uno nuevo con `add_items`. Los accesos a items que ya
+        no existen se descartan. Ambas escrituras se marcan `usage_only`, así
+        que no invalidan los análisis guardados en instantáneas.
+        """
+        with self._flush_lock:
+            counters = self._take()
+            if not counters:
+                return {"updated": 0, "created": 0}
+
+            start_time = time.perf_counter()
+            try:
+                now = datetime.now().isoformat()
+                updates = []
+                missing: Dict[str, List[str]] = {}
+
+                for (module, item_id), (hits, last_accessed) in counters.items():
+                    record = self.index.get(module, item_id)
+                    if record is None:
+                        missing.setdefault(module, []).append(item_id)
+                        continue
+
+                    updates.append({
+                        "id": record["id"],
+                        "metadata": {"last_accessed": last_accessed},
+                        "increments": {"usage_count": hits}
+                    })
+
+                new_records = []
+                for module, item_ids in missing.items():
+                    items = self.manager.get_items(module, item_ids)
+                    for item_id in item_ids:
+                        item = items.get(item_id)
+                        if item is None:
+                            continue
+
+                        hits, last_accessed = counters[(module, item_id)]
+                        new_records.append({
+                            "id": generate_id(),
+                            "text": f"Prioridad para item '{item['text'][:50]}...' en módulo '{module}'",
+                            "metadata": {
+                                "item_id": item_id,
+                                "module": module,
+                                "priority_level": "medium",
+                                "relevance_score": 0.5,
+                                "usage_count": hits,
+                                "last_accessed": last_accessed,
+                                "is_duplicate": False,
+                                "duplicate_of": "",
+                                "created_at": now,
+                                "updated_at": now
+                            }
+                        })
+
+                errors = []
+                if updates:
+                    errors.extend(self.manager.update_items(self.collection_key, updates, merge_metadata=True, usage_only=True)["errors"])
+                if new_records:
+                    errors.extend(self.manager.add_items(self.collection_key, new_records, usage_only=True)["errors"])
+                if errors:
+                    logger.warning("Registros de prioridad no actualizados al volcar los contadores de uso", {"errors": errors[:10]})
+            except Exception as e:
+                self._restore(counters)
+                with self._lock:
+                    self._failed_flushes += 1
+                logger.warning(f"Error al volcar los contadores de uso: {str(e)}")
+                return {"updated": 0, "created": 0}
+
+            with self._lock:
+                self._flushes += 1
+                self._flushed_hits += sum(hits for hits, _ in counters.values())
+                self._last_flush_seconds = time.perf_counter() - start_time
+
+            return {"updated": len(updates), "created": len(new_records)}
+
+    def _run(self):
+        """Bucle del hilo de volcado: espera al intervalo (o a un aviso de retraso) y vuelca."""
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        """Arranca el hilo de volcado periódico si no está en marcha."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(target=self._run, name="quark-usage-flusher", daemon=True)
+                self._worker.start()
+
+    def stop(self, flush: bool = True):
+        """Detiene el hilo de volcado y, opcionalmente, vuelca los contadores pendientes."""
+        self._stopped.set()
+        self._wake.set()
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join()
+        if flush:
+            self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Retorna métricas del contador de accesos."""
+        with self._lock:
+            return {
+                "flush_interval_seconds": self.flush_interval,
+                "max_lag": self.max_lag,
+                "max_items": self.max_items,
+                "pending_items": len(self._counters),
+                "pending_hits": self._pending_hits,
+                "recorded_hits": self._recorded,
+                "dropped_hits": self._dropped,
+                "flushes": self._flushes,
+                "flushed_hits": self._flushed_hits,
+                "failed_flushes": self._failed_flushes,
+                "last_flush_ms": round(self._last_flush_seconds * 1000, 3)
+            }
+
+# Instancia global del contador de accesos
+usage_tracker = UsageTracker(db_manager, priority_index)
@@ -0,0 +1,100 @@
+"""
+Benchmark de descubrimiento de conexiones entre módulos para /sugerencias/obtener.
+
+Compara el bucle original (similitud coseno par a par en Python entre los
+items de dos módulos) con la búsqueda top-k por teselas de
+`app.utils.similarity`, que recorre todos los items respetando un límite de
+memoria. El bucle original se mide sobre una muestra de pares y se extrapola
+al número total de pares. La memoria pico se mide con tracemalloc.
+
+Uso:
+    python -m benchmarks.benchmark_connections --sizes 1000 10000 50000 --memory-limit-mb 64 256
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.utils.similarity import normalize_embeddings, strongest_cross_links
+
+def make_modules(n_items: int, dimension: int, link_ratio: float, seed: int):
+    """Genera los embeddings de dos módulos con una fracción de items relacionados entre ellos."""
+    rng = np.random.default_rng(seed)
+    left = rng.standard_normal((n_items, dimension)).astype(np.float32)
+    right = rng.standard_normal((n_items, dimension)).astype(np.float32)
+
+    n_links = int(n_items * link_ratio)
+    sources = rng.choice(n_items, size=n_links, replace=False)
+    targets = rng.choice(n_items, size=n_links, replace=False)
+    right[targets] = left[sources] + rng.standard_normal((n_links, dimension)).astype(np.float32) * 0.3
+
+    return normalize_embeddings(left), normalize_embeddings(right)
+
+def legacy_loop(left: np.ndarray, right: np.ndarray, min_similarity: float, max_pairs: int):
+    """Reproduce el bucle doble original, limitado a `max_pairs` comparaciones."""
+    compared = 0
+    found = 0
+
+    for a in left:
+        for b in right:
+            similarity = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+            if similarity >= min_similarity:
+                found += 1
+            compared += 1
+            if compared >= max_pairs:
+                return compared, found
+
+    return compared, found
+
+def run(sizes, memory_limits_mb, dimension, min_similarity, top_k, links, legacy_sample, seed):
+    print(f"{'items':>8} | {'límite MB':>9} | {'bucle (s)':>12} | {'teselas (s)':>11} | {'pico MB':>8} | {'aceleración':>11} | enlaces")
+    print("-" * 90)
+
+    for n_items in sizes:
+        left, right = make_modules(n_items, dimension, link_ratio=0.01, seed=seed)
+        total_pairs = n_items * n_items
+
+        # Bucle original (extrapolado si hay demasiados pares)
+        start = time.perf_counter()
+        compared, _ = legacy_loop(left, right, min_similarity, max_pairs=min(total_pairs, legacy_sample))
+        legacy_seconds = (time.perf_counter() - start) * (total_pairs / max(compared, 1))
+        legacy_label = f"{legacy_seconds:12.2f}" + ("*" if compared < total_pairs else " ")
+
+        for memory_limit_mb in memory_limits_mb:
+            tracemalloc.start()
+            start = time.perf_counter()
+            found = strongest_cross_links(
+                left, right, links, min_similarity, k=top_k,
+                memory_limit_bytes=memory_limit_mb * 1024 * 1024
+            )
+            blocked_seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            speedup = legacy_seconds / blocked_seconds if blocked_seconds > 0 else float("inf")
+            print(
+                f"{n_items:>8} | {memory_limit_mb:>9} | {legacy_label} | {blocked_seconds:11.2f} | "
+                f"{peak / 1024 / 1024:8.1f} | {speedup:10.0f}x | {len(found)}"
+            )
+
+    print("\n* tiempo extrapolado a partir de una muestra de pares.")
+    print("El bucle original solo comparaba los 5 primeros items de cada módulo y codificaba ambos textos en cada par.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de conexiones entre módulos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--memory-limit-mb", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--min-similarity", type=float, default=0.7)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--links", type=int, default=20)
+    parser.add_argument("--legacy-sample", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(args.sizes, args.memory_limit_mb, args.dimension, args.min_similarity,
+        args.top_k, args.links, args.legacy_sample, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark del micro-batching de embeddings.
+
+Simula ráfagas de peticiones concurrentes de un solo texto (como las de
+/sofia/store o /sofia/query) y compara la codificación texto a texto con el
+servicio `app.utils.embedding_service.EmbeddingService`, que agrupa las
+peticiones que llegan dentro de una ventana en una sola llamada al modelo.
+
+Uso:
+    python -m benchmarks.benchmark_embedding_batching --clients 32 --requests 512
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.embedding_service import EmbeddingService
+from app.utils.embeddings import model_registry
+
+WORDS = "idea plan cliente mercado producto estrategia aprendizaje recordatorio reunión objetivo".split()
+
+def make_texts(n_texts: int, seed: int):
+    """Genera textos de longitud variable."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(3, 60))) for _ in range(n_texts)]
+
+def measure(encode, texts, clients):
+    """Codifica cada texto en una petición independiente desde `clients` hilos."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(encode, ([text] for text in texts)))
+    return time.perf_counter() - start
+
+def run(clients, n_requests, window_ms, max_batch_size, seed):
+    texts = make_texts(n_requests, seed)
+    model_registry.warm_up()
+
+    # Sin agrupar: cada petición es una llamada al modelo
+    single_seconds = measure(lambda batch: model_registry.encode(batch, convert_to_numpy=True), texts, clients)
+
+    service = EmbeddingService(model_registry, window_ms=window_ms, max_batch_size=max_batch_size)
+    batched_seconds = measure(service.encode, texts, clients)
+    metrics = service.metrics()
+
+    print(f"{'modo':>12} | {'tiempo (s)':>10} | {'textos/s':>10} | lotes")
+    print("-" * 50)
+    print(f"{'individual':>12} | {single_seconds:10.2f} | {n_requests / single_seconds:10.1f} | {n_requests}")
+    print(f"{'agrupado':>12} | {batched_seconds:10.2f} | {n_requests / batched_seconds:10.1f} | {metrics['batches']}")
+    print(f"\nAceleración: {single_seconds / batched_seconds:.1f}x "
+          f"(tamaño medio de lote: {metrics['avg_batch_size']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del micro-batching de embeddings")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run(args.clients, args.requests, args.window_ms, args.max_batch_size, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,16 @@ import tempfile
 from pathlib import Path
 from fastapi.testclient import TestClient
 
+# Los ficheros de datos de las pruebas van a un directorio temporal, no al
+# directorio data/ del repositorio. Deben fijarse antes de importar la app,
+# porque la configuración se lee al importarla.
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="quark-tests-")
+os.environ["JOBS_DB_PATH"] = os.path.join(TEST_DATA_DIR, "jobs.sqlite3")
+os.environ["THEME_MODEL_PATH"] = os.path.join(TEST_DATA_DIR, "theme_model.npz")
+os.environ["KNN_GRAPH_DIR"] = os.path.join(TEST_DATA_DIR, "knn_graph")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TEST_DATA_DIR, "embedding_cache.sqlite3")
+os.environ["LOG_FILE_PATH"] = os.path.join(TEST_DATA_DIR, "quark.log")
+
 from app.main import app
 from app.utils.auth import create_access_token
 from app.config import SOFIA_API_KEY, AUTH_SECRET_KEY
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -229,4 +230,107 @@ def test_sofia_delete(client, api_key_headers, created_test_item):
     
     query_result = query_response.json()
     # El item eliminado no debería estar en los resultados o debería tener una distancia grande
-    assert len(query_result["items"]) == 0 or query_result["distances"][0] > 0.5 
\ No newline at end of file
+    assert len(query_result["items"]) == 0 or query_result["distances"][0] > 0.5 
+
+
+# Pruebas de métricas
+@pytest.mark.api
+def test_metrics(client):
+    """Prueba que el modelo de embeddings se carga una sola vez por proceso."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert "embedding_model" in data
+    assert data["embedding_model"]["load_count"] <= 1
+    assert set(data["thread_pools"]) == {"read", "write", "embed"}
+    assert all(0 <= pool["saturation"] <= 1 for pool in data["thread_pools"].values())
+
+# Pruebas de escritura masiva
+@pytest.mark.api
+def test_business_bulk_create(client):
+    """Prueba la creación masiva con errores reportados por item."""
+    bulk_data = {
+        "items": [
+            {"text": "Idea masiva uno", "metadata": {"category": "idea", "priority": "high", "status": "pending"}},
+            {"text": "Idea masiva dos", "metadata": {"category": "idea", "priority": "low", "status": "pending"}},
+            {"text": "Idea inválida", "metadata": {"tags": ["no", "admitido"]}}
+        ]
+    }
+    
+    response = client.post("/business/bulk", json=bulk_data)
+    
+    assert response.status_code == 201
+    result = response.json()
+    assert result["total"] == 3
+    assert result["succeeded"] == 2
+    assert result["failed"] == 1
+    assert result["errors"][0]["index"] == 2
+    assert [item["text"] for item in result["items"]] == ["Idea masiva uno", "Idea masiva dos"]
+
+# Pruebas de optimización de prioridades
+@pytest.mark.api
+def test_priority_optimize_dry_run(client):
+    """Prueba que el modo de simulación retorna el plan sin escribir en la base de datos."""
+    client.post("/business/", json={"text": "x", "metadata": {"category": "idea", "priority": "low", "status": "pending"}})
+    before = client.get("/prioridad/").json()["total"]
+    
+    response = client.post("/prioridad/optimizar", json={
+        "module": "business",
+        "auto_archive_low_relevance": True,
+        "dry_run": True
+    })
+    
+    assert response.status_code == 200
+    result = response.json()
+    assert result["dry_run"] is True
+    assert result["write_errors"] == []
+    assert set(result["plan"]) == {"record_updates", "new_records"}
+    assert client.get("/prioridad/").json()["total"] == before
+
+@pytest.mark.api
+def test_priority_review_stream(client):
+    """Prueba que la revisión en streaming emite un evento JSON por línea y termina con 'end'."""
+    response = client.post("/prioridad/revisar/stream", json={"module": "business", "min_similarity": 0.5})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "module"
+    assert events[-1]["event"] == "end"
+    assert events[-1]["data"]["potential_duplicates"] == sum(1 for event in events if event["event"] == "duplicate")
+
+@pytest.mark.api
+def test_priority_review_cross_module_groups(client):
+    """Prueba que los duplicados entre módulos forman un solo grupo con un item canónico."""
+    text = "Revisar el plan trimestral de ventas con el equipo"
+    client.post("/business/", json={"text": text, "metadata": {"category": "plan", "priority": "high", "status": "pending"}})
+    client.post("/identity/", json={"text": text, "metadata": {"category": "hábito"}})
+    
+    response = client.post("/prioridad/revisar", json={
+        "module": None,
+        "min_similarity": 0.99,
+        "cross_module": True,
+        "include_low_relevance": False
+    })
+    
+    assert response.status_code == 200
+    groups = [g for g in response.json()["duplicate_groups"] if set(g["modules"]) >= {"business", "identity"}]
+    assert groups
+    for group in groups:
+        assert group["canonical"]["id"] in group["item_ids"]
+        assert group["primary_id"] == group["canonical"]["id"]
+
+@pytest.mark.api
+def test_suggestions_snapshot_until_data_changes(client):
+    """Prueba que las sugerencias se sirven desde la instantánea hasta que cambian los datos."""
+    request = {"modules": ["business"], "suggestion_types": ["action"]}
+    
+    first = client.post("/sugerencias/obtener", json=request)
+    second = client.post("/sugerencias/obtener", json=request)
+    
+    assert first.status_code == 200 and second.status_code == 200
+    assert second.json()["cached"] is True
+    assert second.json()["suggestions"] == first.json()["suggestions"]
+    
+    client.post("/business/", json={"text": "Nueva línea de negocio", "metadata": {"category": "idea", "priority": "low", "status": "pending"}})
+    assert client.post("/sugerencias/obtener", json=request).json()["cached"] is False
@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.utils.clustering import discover_themes
+
+def make_blobs(n_per_theme, n_themes, dim=16, seed=0):
+    """Genera grupos de vectores alrededor de direcciones aleatorias."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_themes, dim))
+    vectors = np.vstack([center + 0.05 * rng.normal(size=(n_per_theme, dim)) for center in centers])
+    return vectors, np.repeat(np.arange(n_themes), n_per_theme)
+
+def test_discover_themes_selects_k_and_recovers_groups():
+    """k se elige por silueta y cada grupo sintético acaba en un único tema."""
+    vectors, truth = make_blobs(40, 4)
+
+    result = discover_themes(vectors, max_clusters=8)
+
+    assert len(result["themes"]) == 4
+    for theme in range(4):
+        assert len(np.unique(result["labels"][truth == theme])) == 1
+
+def test_medoid_is_the_member_closest_to_the_centroid():
+    """El medoide pertenece a su tema y es el miembro más parecido al centroide."""
+    vectors, _ = make_blobs(30, 3, seed=1)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    result = discover_themes(vectors, n_clusters=3)
+
+    for theme in result["themes"]:
+        members = np.flatnonzero(result["labels"] == theme["label"])
+        centroid = normalized[members].mean(axis=0)
+        assert result["labels"][theme["medoid"]] == theme["label"]
+        assert theme["medoid"] == members[np.argmax(normalized[members] @ centroid)]
+        assert theme["size"] == len(members)
+
+def test_fits_on_a_sample_and_assigns_every_item():
+    """Con más items que la muestra, todos los vectores reciben un tema."""
+    vectors, truth = make_blobs(2000, 3, seed=2)
+
+    result = discover_themes(vectors, max_clusters=4, sample_size=300, batch_size=512)
+
+    assert len(result["labels"]) == len(vectors)
+    assert sum(theme["size"] for theme in result["themes"]) == len(vectors)
+    assert all(len(np.unique(result["labels"][truth == theme])) == 1 for theme in range(3))
+
+def test_too_few_items_have_no_themes():
+    assert discover_themes(np.ones((2, 4)))["themes"] == []
@@ -0,0 +1,116 @@
+import math
+
+from app.utils.connection_graph import ConnectionGraph
+
+class FakeManager:
+    """Gestor mínimo con los métodos que usa el índice."""
+
+    def __init__(self, records):
+        self.records = records
+        self.list_calls = 0
+        self.listeners = []
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def list_items(self, collection_key, limit=100, include_documents=True):
+        self.list_calls += 1
+        return list(self.records)
+
+    def write(self, collection_key, event, items):
+        for listener in self.listeners:
+            listener(collection_key, event, items)
+
+def connection(record_id, source, target, strength):
+    return {"id": record_id, "metadata": {
+        "source_module": source[0], "source_id": source[1],
+        "target_module": target[0], "target_id": target[1],
+        "strength": strength
+    }}
+
+A, B, C, D, E = ("identity", "a"), ("business", "b"), ("learnings", "c"), ("reminders", "d"), ("identity", "e")
+
+def make_graph():
+    manager = FakeManager([
+        connection("ab", A, B, 0.9),
+        connection("bc", B, C, 0.8),
+        connection("ac", A, C, 0.5),
+        connection("cd", C, D, 0.9),
+        connection("ab-dup", B, A, 0.6),
+        {"id": "bad", "metadata": {"source_module": "identity"}}
+    ])
+    return manager, ConnectionGraph(manager)
+
+def test_traversal_follows_strongest_paths_within_depth():
+    """El recorrido sigue las conexiones en ambos sentidos y retorna el camino más fuerte de cada item."""
+    manager, graph = make_graph()
+
+    hits = {(hit["module"], hit["id"]): hit for hit in graph.traverse(*A, max_depth=2)}
+
+    assert set(hits) == {B, C, D}
+    assert hits[B]["score"] == 0.9 and hits[B]["depth"] == 1
+    # A-B-C (0.72) es más fuerte que la conexión directa A-C (0.5)
+    assert math.isclose(hits[C]["score"], 0.72) and hits[C]["depth"] == 2
+    assert [(step["module"], step["id"]) for step in hits[C]["path"]] == [A, B, C]
+    # D a dos saltos solo por la conexión directa con C
+    assert math.isclose(hits[D]["score"], 0.45)
+    assert graph.traverse(*A, max_depth=1, min_strength=0.7) == [
+        {"id": "b", "module": "business", "depth": 1, "score": 0.9, "path": [
+            {"id": "a", "module": "identity"}, {"id": "b", "module": "business"}
+        ]}
+    ]
+    assert graph.metrics()["edges"] == 4 and graph.metrics()["skipped"] == 1
+    # El grado cuenta conexiones, incluidos los duplicados de un mismo par
+    assert graph.degrees("identity") == {"a": 3}
+    assert graph.degrees("business") == {"b": 3}
+    assert manager.list_calls == 1
+
+def test_shortest_path_weighted_and_by_hops():
+    """Dijkstra retorna el camino más fuerte; sin pesos, el de menos saltos."""
+    _, graph = make_graph()
+
+    strongest = graph.shortest_path(A, D)
+    assert strongest["path"] == [A, B, C, D] and math.isclose(strongest["score"], 0.648)
+
+    fewest = graph.shortest_path(A, D, weighted=False)
+    assert fewest["path"] == [A, C, D] and fewest["hops"] == 2
+
+    assert graph.shortest_path(A, D, min_strength=0.95) is None
+    assert graph.shortest_path(A, E) is None
+
+def test_index_follows_writes():
+    """Las altas, cambios y bajas de conexiones se reflejan sin recargar la colección."""
+    manager, graph = make_graph()
+    graph.load()
+
+    manager.write("connections", "upsert", [connection("de", D, E, 0.7)])
+    assert graph.shortest_path(A, E)["hops"] == 4
+
+    # Al borrar la conexión más fuerte del par A-B queda su duplicado
+    manager.write("connections", "delete", [{"id": "ab"}])
+    assert graph.neighbors(*A)[B] == 0.6
+
+    manager.write("connections", "update", [connection("bc", B, C, 0.1)])
+    assert graph.neighbors(*B) == {A: 0.6, C: 0.1}
+
+    manager.write("connections", "delete", [{"id": "ab-dup"}])
+    assert B not in graph.neighbors(*A)
+    assert graph.degrees("business") == {"b": 1}
+    manager.write("identity", "delete", [{"id": "ac"}])  # Otra colección: se ignora
+    assert C in graph.neighbors(*A)
+    assert manager.list_calls == 1
+
+def test_index_keeps_writes_made_during_load():
+    """Una conexión escrita mientras se lee la colección no se pierde."""
+    manager, graph = make_graph()
+    list_items = manager.list_items
+
+    def list_during_write(collection_key, limit=100, include_documents=True):
+        records = list_items(collection_key, limit, include_documents)
+        manager.write("connections", "upsert", [connection("de", D, E, 0.7)])
+        return records
+
+    manager.list_items = list_during_write
+    graph.load()
+
+    assert graph.neighbors(*D)[E] == 0.7
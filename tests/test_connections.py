@@ -0,0 +1,118 @@
+import asyncio
+
+from app.models.schemas import ConnectionAnalysisRequest
+from app.modules import connections
+from app.modules.connections import compact_connections, connection_id
+
+class FakeManager:
+    """Colección de conexiones en memoria con las operaciones masivas de ChromaDBManager."""
+
+    def __init__(self, items):
+        self.items = {item["id"]: item for item in items}
+        self.writes = []
+
+    def list_items(self, collection_key, limit=100, include_documents=True):
+        return list(self.items.values())
+
+    def upsert_items(self, collection_key, items, chunk_size=500):
+        self.writes.append("upsert")
+        self.items.update({item["id"]: item for item in items})
+        return {"items": items, "errors": [], "succeeded": len(items)}
+
+    def delete_items(self, collection_key, ids, chunk_size=500):
+        self.writes.append("delete")
+        for item_id in ids:
+            self.items.pop(item_id)
+        return {"items": [{"id": item_id} for item_id in ids], "errors": [], "succeeded": len(ids)}
+
+def connection(item_id, target_id, strength, created_at):
+    return {
+        "id": item_id,
+        "text": f"Conexión {item_id}",
+        "metadata": {
+            "source_module": "identity", "source_id": "a",
+            "target_module": "business", "target_id": target_id,
+            "strength": strength, "created_at": created_at, "updated_at": created_at
+        }
+    }
+
+def test_connection_id_is_deterministic_and_directional():
+    """El mismo par produce siempre el mismo ID; el par inverso es otra conexión."""
+    assert connection_id("identity", "a", "business", "b") == connection_id("identity", "a", "business", "b")
+    assert connection_id("identity", "a", "business", "b") != connection_id("business", "b", "identity", "a")
+
+def test_compaction_collapses_duplicates():
+    """Los duplicados de un par se fusionan en la conexión más fuerte con el ID determinista."""
+    manager = FakeManager([
+        connection("r1", "b", 0.7, "2024-01-02T00:00:00"),
+        connection("r2", "b", 0.9, "2024-01-03T00:00:00"),
+        connection("r3", "b", 0.8, "2024-01-01T00:00:00"),
+        connection(connection_id("identity", "a", "business", "c"), "c", 0.6, "2024-01-01T00:00:00"),
+        {"id": "manual", "text": "Conexión manual", "metadata": {"connection_type": "manual"}}
+    ])
+
+    result = compact_connections(manager)
+
+    canonical = connection_id("identity", "a", "business", "b")
+    assert result["scanned"] == 5 and result["pairs"] == 2 and result["skipped"] == 1
+    assert result["upserted"] == 1 and result["deleted"] == 3
+    assert sorted(manager.items) == sorted([canonical, connection_id("identity", "a", "business", "c"), "manual"])
+    assert manager.items[canonical]["metadata"]["strength"] == 0.9
+    assert manager.items[canonical]["metadata"]["created_at"] == "2024-01-01T00:00:00"
+    assert manager.writes == ["upsert", "delete"]
+
+    # Segunda ejecución: no queda nada que fusionar
+    assert compact_connections(manager)["upserted"] == 0
+    assert manager.writes == ["upsert", "delete"]
+
+def fake_connection_store(monkeypatch):
+    """Sustituye las lecturas y escrituras de `analyze_connections` por datos en memoria."""
+    async def get_item(collection_key, id):
+        return {"id": id, "text": "origen", "metadata": {}}
+
+    async def get_items(collection_key, ids):
+        if collection_key == "connections":
+            return {}
+        return {item_id: {"id": item_id, "text": item_id, "metadata": {}} for item_id in ids}
+
+    async def upsert_items(collection_key, items):
+        return {"items": items, "errors": []}
+
+    monkeypatch.setattr(connections.async_db_manager, "get_item", get_item)
+    monkeypatch.setattr(connections.async_db_manager, "get_items", get_items)
+    monkeypatch.setattr(connections.async_db_manager, "upsert_items", upsert_items)
+
+def test_max_connections_applies_per_module(monkeypatch):
+    """`max_connections` limita las conexiones de cada módulo, no el total."""
+    neighbors = [
+        {"id": f"{module}-{i}", "module": module, "similarity": 0.95 - i * 0.01}
+        for module in ("business", "learnings") for i in range(4)
+    ]
+    fake_connection_store(monkeypatch)
+    monkeypatch.setattr(connections.knn_graph, "neighbors", lambda module, item_id, limit, min_similarity: neighbors)
+
+    request = ConnectionAnalysisRequest(module="identity", item_id="a", max_connections=2, min_similarity=0.5)
+    result = asyncio.run(connections.analyze_connections(request))
+
+    targets = [connection["metadata"]["target_id"] for connection in result["connections"]]
+    assert targets == ["business-0", "business-1", "learnings-0", "learnings-1"]
+
+def test_vector_search_is_used_until_the_graph_can_answer(monkeypatch):
+    """Si el grafo aún no puede responder, se consulta el índice vectorial de cada módulo."""
+    queried = []
+
+    async def query_items(collection_key, query_text, n_results):
+        queried.append(collection_key)
+        ids = ["a", "b"] if collection_key == "identity" else [f"{collection_key}-0"]
+        return {"ids": [ids], "distances": [[0.0, 0.1][:len(ids)]]}
+
+    fake_connection_store(monkeypatch)
+    monkeypatch.setattr(connections.async_db_manager, "query_items", query_items)
+    monkeypatch.setattr(connections.knn_graph, "neighbors", lambda module, item_id, limit, min_similarity: None)
+
+    request = ConnectionAnalysisRequest(module="identity", item_id="a", max_connections=1, min_similarity=0.5)
+    result = asyncio.run(connections.analyze_connections(request))
+
+    assert queried == ["identity", "business", "reminders", "learnings"]
+    targets = {connection["metadata"]["target_id"] for connection in result["connections"]}
+    assert targets == {"b", "business-0", "reminders-0", "learnings-0"}
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from app.models.schemas import PriorityReviewRequest
+from app.modules import priorities
+from app.utils.similarity import UnionFind
+
+def scored(items):
+    return {item["id"]: {"score": 0.5} for item in items}
+
+def item(item_id):
+    return {"id": item_id, "text": f"texto {item_id}"}
+
+async def collect(request, loaded):
+    return [event async for event in priorities.iter_duplicates(request, loaded)]
+
+def test_take_pairs_returns_chunks_until_exhausted():
+    """Los pares se retiran por tramos y se unen en el union-find."""
+    pairs = iter([(0, 1, 0.9), (1, 2, 0.9), (3, 4, 0.9)])
+    union_find = UnionFind()
+
+    assert priorities.take_pairs(pairs, union_find, max_pairs=2) == [(0, 1, 0.9), (1, 2, 0.9)]
+    assert priorities.take_pairs(pairs, union_find, max_pairs=2) == [(3, 4, 0.9)]
+    assert priorities.take_pairs(pairs, union_find, max_pairs=2) == []
+    assert union_find.groups() == [[0, 1, 2], [3, 4]]
+
+def test_exact_scan_runs_off_the_event_loop(monkeypatch):
+    """El cálculo de pares por bloques se ejecuta en el pool de lecturas, no en el bucle de eventos."""
+    threads = []
+    original = priorities.iter_similar_pairs
+
+    def recording_pairs(embeddings, min_similarity):
+        threads.append(threading.get_ident())
+        yield from original(embeddings, min_similarity)
+
+    async def embeddings(collection_key, items):
+        return [[1.0, 0.0] for _ in items]
+
+    monkeypatch.setattr(priorities, "iter_similar_pairs", recording_pairs)
+    monkeypatch.setattr(priorities.async_db_manager, "get_item_embeddings", embeddings)
+
+    items = [item("a"), item("b"), item("c")]
+    events = asyncio.run(collect(PriorityReviewRequest(min_similarity=0.9), [("identity", items, scored(items))]))
+
+    assert threads and threading.get_ident() not in threads
+    assert [kind for kind, _ in events].count("duplicate") == 3
+    [group] = [data for kind, data in events if kind == "duplicate_group"]
+    assert group["item_ids"] == ["a", "b", "c"]
+
+def test_ann_cross_module_queries_each_pair_from_one_side(monkeypatch):
+    """En modo 'ann' entre módulos, cada índice se consulta con sus vectores y los de los módulos anteriores."""
+    queried = []
+
+    async def embeddings(collection_key, items):
+        return [[1.0, 0.0] for _ in items]
+
+    async def query_neighbors(collection_key, embeddings, n_results):
+        queried.append((collection_key, len(embeddings)))
+        nearest = {"identity": "i1", "business": "b1", "learnings": "l1"}[collection_key]
+        return [[(nearest, 0.99)] for _ in embeddings]
+
+    monkeypatch.setattr(priorities.async_db_manager, "get_item_embeddings", embeddings)
+    monkeypatch.setattr(priorities.async_db_manager, "query_neighbors", query_neighbors)
+
+    loaded = [
+        (module, [item(f"{prefix}1"), item(f"{prefix}2")], scored([item(f"{prefix}1"), item(f"{prefix}2")]))
+        for module, prefix in (("identity", "i"), ("business", "b"), ("learnings", "l"))
+    ]
+    request = PriorityReviewRequest(min_similarity=0.9, duplicate_mode="ann", cross_module=True)
+    events = asyncio.run(collect(request, loaded))
+
+    assert queried == [("identity", 2), ("business", 4), ("learnings", 6)]
+    pairs = {(data["item1"]["id"], data["item2"]["id"]) for kind, data in events if kind == "duplicate"}
+    assert {("i1", "b1"), ("i1", "l1"), ("b1", "l1")} <= pairs
@@ -0,0 +1,71 @@
+import numpy as np
+
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embedding_service import EmbeddingService
+
+class CountingRegistry:
+    """Registro de prueba que cuenta los textos enviados al modelo."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def test_embedding_cache_persists_vectors(tmp_path):
+    """Los vectores sobreviven a reabrir la caché y se separan por modelo."""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, model_name="modelo-a", max_bytes=1024 * 1024)
+    cache.put_many(["hola", "adiós"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+
+    reopened = EmbeddingCache(path, model_name="modelo-a", max_bytes=1024 * 1024)
+    found = reopened.get_many(["hola", "adiós", "nuevo"])
+    assert set(found) == {"hola", "adiós"}
+    assert found["adiós"].tolist() == [3.0, 4.0]
+    assert found["hola"].dtype == np.float32
+    assert reopened.metrics()["disk_hits"] == 2
+    assert reopened.metrics()["misses"] == 1
+
+    other_model = EmbeddingCache(path, model_name="modelo-b", max_bytes=1024 * 1024)
+    assert other_model.get_many(["hola"]) == {}
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    """Al superar el tamaño máximo se expulsan primero las entradas menos usadas."""
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), model_name="m", max_bytes=10 * 16, memory_items=0)
+    vector = np.ones((1, 4), dtype=np.float32)  # 16 bytes por entrada
+
+    for i in range(10):
+        cache.put_many([f"texto {i}"], vector)
+    cache.get_many(["texto 0"])  # Marcar como usado recientemente
+    cache.put_many(["texto 10"], vector)
+
+    metrics = cache.metrics()
+    assert metrics["bytes"] <= 10 * 16
+    assert metrics["evictions"] > 0
+    assert "texto 0" in cache.get_many(["texto 0"])
+    assert "texto 1" not in cache.get_many(["texto 1"])
+
+def test_embedding_service_only_encodes_cache_misses(tmp_path):
+    """El servicio consulta la caché antes de llamar al modelo."""
+    registry = CountingRegistry()
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), model_name="m", max_bytes=1024 * 1024)
+    service = EmbeddingService(registry, window_ms=0, cache=cache)
+
+    first = service.encode(["uno", "dos"])
+    second = service.encode(["dos", "tres", "uno"])
+
+    assert registry.encoded == ["uno", "dos", "tres"]
+    assert second.tolist() == [first[1].tolist(), [4.0, 1.0], first[0].tolist()]
+
+def test_embedding_service_counts_each_lookup_once(tmp_path):
+    """Un lote servido en parte desde memoria cuenta cada texto en un solo nivel."""
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), model_name="m", max_bytes=1024 * 1024)
+    service = EmbeddingService(CountingRegistry(), window_ms=0, cache=cache)
+
+    service.encode(["uno"])
+    service.encode(["uno", "dos"])
+
+    metrics = cache.metrics()
+    assert metrics["memory_hits"] == 1
+    assert metrics["memory_hits"] + metrics["disk_hits"] + metrics["misses"] == 3
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.utils.embedding_service import EmbeddingService
+
+class RecordingRegistry:
+    """Registro de prueba: codifica cada texto como [longitud, suma de códigos] y anota los lotes."""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def encode(self, texts, **kwargs):
+        with self._lock:
+            self.batches.append(list(texts))
+        return np.array([[len(text), sum(map(ord, text))] for text in texts], dtype=np.float32)
+
+def expected(text):
+    return [len(text), sum(map(ord, text))]
+
+def test_embedding_service_returns_each_caller_its_vectors():
+    """Cada llamador recibe sus propios vectores, en su orden, aunque se agrupen."""
+    registry = RecordingRegistry()
+    service = EmbeddingService(registry, window_ms=50, max_batch_size=256)
+    requests = [[f"texto {i}", "x" * (i + 1)] for i in range(20)]
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(service.encode, requests))
+
+    for texts, vectors in zip(requests, results):
+        assert vectors.tolist() == [expected(text) for text in texts]
+
+    # Las 20 peticiones concurrentes se codifican en menos llamadas al modelo
+    assert len(registry.batches) < len(requests)
+    assert service.metrics()["requests"] == len(requests)
+
+def test_embedding_service_sorts_by_length_and_deduplicates():
+    """Dentro de un lote los textos únicos se envían al modelo ordenados por longitud."""
+    registry = RecordingRegistry()
+    service = EmbeddingService(registry, window_ms=0, max_batch_size=64)
+
+    vectors = service.encode(["ccc", "a", "bb", "a"])
+
+    assert registry.batches == [["a", "bb", "ccc"]]
+    assert vectors.tolist() == [expected("ccc"), expected("a"), expected("bb"), expected("a")]
+    assert service.encode("hola").tolist() == expected("hola")
+
+def test_embedding_service_propagates_model_errors():
+    """Un error del modelo se propaga a todos los llamadores del lote."""
+    class FailingRegistry:
+        def encode(self, texts, **kwargs):
+            raise RuntimeError("modelo no disponible")
+
+    service = EmbeddingService(FailingRegistry(), window_ms=0)
+    future = service.submit(["texto"])
+    assert isinstance(future.exception(timeout=5), RuntimeError)
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.executors import BoundedThreadPool
+
+def test_bounded_thread_pool_runs_off_the_event_loop():
+    """Las tareas se ejecutan en los hilos del pool, no en el del bucle de eventos."""
+    pool = BoundedThreadPool("test", max_workers=2)
+
+    async def main():
+        return await pool.run(threading.current_thread)
+
+    thread = asyncio.run(main())
+    assert thread is not threading.current_thread()
+    assert thread.name.startswith("quark-test")
+    assert pool.metrics()["completed"] == 1
+    pool.shutdown()
+
+def test_bounded_thread_pool_limits_tasks_in_flight():
+    """Nunca hay más tareas en vuelo que `max_pending`, aunque se envíen muchas a la vez."""
+    pool = BoundedThreadPool("test", max_workers=2, max_pending=3)
+
+    async def main():
+        await asyncio.gather(*(pool.run(time.sleep, 0.01) for _ in range(12)))
+
+    asyncio.run(main())
+    metrics = pool.metrics()
+    assert metrics["completed"] == 12
+    assert metrics["peak_in_flight"] <= 3
+    assert metrics["active"] == metrics["queued"] == metrics["waiting"] == 0
+    pool.shutdown()
+
+def test_bounded_thread_pool_propagates_errors_and_restarts():
+    """Las excepciones llegan al llamador y el pool se puede reutilizar tras `shutdown`."""
+    pool = BoundedThreadPool("test", max_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.run(fail))
+    pool.shutdown()
+
+    assert asyncio.run(pool.run(sum, [1, 2, 3])) == 6
+    assert pool.metrics()["failed"] == 1
+    pool.shutdown()
@@ -0,0 +1,29 @@
+from app.utils.filters import build_where
+
+def test_build_where_without_conditions_returns_none():
+    """Sin filtros no se envía cláusula where a ChromaDB."""
+    assert build_where() is None
+    assert build_where(equals={"category": None}, minimums={"strength": None}) is None
+
+def test_build_where_single_condition_is_not_wrapped():
+    """ChromaDB no acepta `$and` con una sola condición."""
+    assert build_where(equals={"category": "ventas"}) == {"category": {"$eq": "ventas"}}
+
+def test_build_where_combines_conditions_with_and():
+    """Varias condiciones se combinan con `$and` y los rangos usan `$gte`/`$lt`."""
+    where = build_where(
+        equals={"source_module": "business", "target_module": None},
+        minimums={"strength": 0.5},
+        maximums={"created_at_ts": 100}
+    )
+    assert where == {
+        "$and": [
+            {"source_module": {"$eq": "business"}},
+            {"strength": {"$gte": 0.5}},
+            {"created_at_ts": {"$lt": 100}}
+        ]
+    }
+
+def test_build_where_keeps_false_values():
+    """`False` es un filtro válido (por ejemplo, `is_duplicate=false`)."""
+    assert build_where(equals={"is_duplicate": False}) == {"is_duplicate": {"$eq": False}}
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.utils.jobs import JobManager, _current_job
+
+class EchoRequest(BaseModel):
+    value: int = 0
+
+def wait_for(manager, job_id, statuses=("completed", "failed"), timeout=5.0):
+    """Espera a que el trabajo alcance uno de los estados dados."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"El trabajo {job_id} no terminó a tiempo")
+
+@pytest.fixture
+def manager(tmp_path):
+    job_manager = JobManager(str(tmp_path / "jobs.sqlite3"), max_workers=1)
+    yield job_manager
+    job_manager.shutdown(wait=True)
+
+def test_job_runs_and_stores_result(manager):
+    """El resultado del handler se guarda como JSON junto con el progreso final."""
+    async def handler(request):
+        manager.report_progress(_current_job.get(), 0.5, "mitad")
+        return {"doubled": request.value * 2}
+
+    manager.register("echo", EchoRequest, handler)
+    job = manager.submit("echo", {"value": 21})
+
+    assert job["deduplicated"] is False
+    assert wait_for(manager, job["id"])["status"] == "completed"
+    result = manager.get_result(job["id"])
+    assert result["result"] == {"doubled": 42}
+    assert result["progress"] == 1.0
+    assert result["message"] == "mitad"
+
+def test_identical_active_jobs_are_deduplicated(manager):
+    """Un trabajo idéntico a otro en curso reutiliza el existente."""
+    release = threading.Event()
+
+    async def handler(request):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return {"value": request.value}
+
+    manager.register("echo", EchoRequest, handler)
+    first = manager.submit("echo", {"value": 1})
+    second = manager.submit("echo", {"value": 1})
+    other = manager.submit("echo", {"value": 2})
+
+    assert second["id"] == first["id"]
+    assert second["deduplicated"] is True
+    assert other["id"] != first["id"]
+
+    release.set()
+    wait_for(manager, other["id"])
+    assert manager.metrics()["completed"] == 2
+    assert manager.metrics()["deduplicated"] == 1
+
+def test_http_errors_mark_job_as_failed(manager):
+    """Los errores del endpoint se guardan como error del trabajo."""
+    async def handler(request):
+        raise HTTPException(status_code=400, detail="Módulo no válido")
+
+    manager.register("echo", EchoRequest, handler)
+    job = wait_for(manager, manager.submit("echo", {})["id"])
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Módulo no válido"
+
+def test_count_jobs_ignores_pagination(manager):
+    """El total de trabajos cuenta todos los que cumplen el filtro, no solo la página."""
+    async def handler(request):
+        if request.value < 0:
+            raise HTTPException(status_code=400, detail="Valor no válido")
+        return {"value": request.value}
+
+    manager.register("echo", EchoRequest, handler)
+    for value in (1, 2, 3, -1):
+        wait_for(manager, manager.submit("echo", {"value": value})["id"])
+
+    assert len(manager.list_jobs(limit=2)) == 2
+    assert manager.count_jobs() == 4
+    assert manager.count_jobs(status="completed") == 3
+    assert manager.count_jobs(status="failed") == 1
+
+def test_recover_requeues_interrupted_jobs(tmp_path):
+    """Los trabajos en curso al detener el proceso se reanudan al arrancar."""
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobManager(path)
+    first._connection.execute(
+        "INSERT INTO jobs (id, type, params, dedup_key, status, progress, created_at) "
+        "VALUES ('job-1', 'echo', '{\"value\": 3}', 'k', 'running', 0.4, '2024-01-01T00:00:00')"
+    )
+    first._connection.commit()
+
+    async def handler(request):
+        return {"value": request.value}
+
+    second = JobManager(path)
+    second.register("echo", EchoRequest, handler)
+    assert second.recover() == 1
+    assert wait_for(second, "job-1")["status"] == "completed"
+    assert second.get_result("job-1")["result"] == {"value": 3}
+    second.shutdown(wait=True)
@@ -0,0 +1,202 @@
+import threading
+import time
+
+import numpy as np
+
+from app.utils.knn_graph import KnnGraph
+from app.utils.similarity import normalize_embeddings
+
+VECTORS = {}
+
+def embed(text):
+    """Vector aleatorio pero determinista para cada texto."""
+    if text not in VECTORS:
+        VECTORS[text] = np.random.default_rng(abs(hash(text)) % (2 ** 32)).standard_normal(8).astype(np.float32)
+    return VECTORS[text]
+
+class FakeManager:
+    """Gestor mínimo con items en memoria que notifica las escrituras a los listeners."""
+
+    def __init__(self, items):
+        self.items = items
+        self.listeners = []
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def list_items(self, collection_key, limit=None, include_documents=True):
+        return list(self.items.get(collection_key, {}).values())
+
+    def get_item_embeddings(self, collection_key, items):
+        return [embed(item["text"]) for item in items]
+
+    def embedding_function(self, texts):
+        return [embed(text) for text in texts]
+
+    def write(self, collection_key, event, items):
+        store = self.items.setdefault(collection_key, {})
+        for item in items:
+            if event == "delete":
+                store.pop(item["id"], None)
+            else:
+                store[item["id"]] = item
+        for listener in self.listeners:
+            listener(collection_key, event, items)
+
+def corpus(n):
+    modules = ("identity", "business")
+    return {
+        module: {f"{module}-{i}": {"id": f"{module}-{i}", "text": f"{module} texto {i}"} for i in range(n)}
+        for module in modules
+    }
+
+def brute_force(manager, k):
+    """Referencia: k vecinos de cada item calculados con la matriz de similitud completa."""
+    keys = [(module, item_id) for module, items in manager.items.items() for item_id in items]
+    matrix = normalize_embeddings([embed(manager.items[module][item_id]["text"]) for module, item_id in keys])
+    similarities = matrix @ matrix.T
+    np.fill_diagonal(similarities, -np.inf)
+    return {
+        key: [keys[j] for j in np.argsort(-similarities[i])[:k]]
+        for i, key in enumerate(keys)
+    }
+
+def graph_lists(graph, manager):
+    return {
+        (module, item_id): [(hit["module"], hit["id"]) for hit in graph.neighbors(module, item_id)]
+        for module, items in manager.items.items() for item_id in items
+    }
+
+def test_built_graph_matches_brute_force(tmp_path):
+    """Las listas del grafo construido coinciden con el cálculo exacto."""
+    manager = FakeManager(corpus(15))
+    graph = KnnGraph(manager, path=str(tmp_path), k=4)
+
+    graph.rebuild()
+
+    assert graph_lists(graph, manager) == brute_force(manager, 4)
+    hits = graph.neighbors("identity", "identity-0", limit=2)
+    assert len(hits) == 2 and hits[0]["similarity"] >= hits[1]["similarity"]
+
+def test_incremental_updates_match_brute_force(tmp_path):
+    """Tras añadir, modificar y eliminar items el grafo sigue siendo exacto sin reconstruirse."""
+    manager = FakeManager(corpus(15))
+    graph = KnnGraph(manager, path=str(tmp_path), k=4)
+    graph.rebuild()
+
+    manager.write("identity", "add", [{"id": f"new-{i}", "text": f"nuevo {i}"} for i in range(5)])
+    manager.write("business", "delete", [{"id": "business-3"}, {"id": "business-7"}])
+    manager.write("identity", "update", [{"id": "identity-2", "text": "texto cambiado"}])
+    graph.apply_pending()
+
+    assert graph_lists(graph, manager) == brute_force(manager, 4)
+    assert graph.neighbors("business", "business-3") is None
+    assert graph.metrics()["builds"] == 1
+
+def test_saved_graph_is_memory_mapped_and_compacted(tmp_path):
+    """La compactación elimina los nodos borrados y la generación guardada se abre con memoria mapeada."""
+    manager = FakeManager(corpus(10))
+    graph = KnnGraph(manager, path=str(tmp_path), k=3)
+    graph.rebuild()
+    manager.write("business", "delete", [{"id": "business-0"}])
+    graph.apply_pending()
+    graph.save()
+
+    reloaded = KnnGraph(FakeManager({}), path=str(tmp_path), k=3)
+    assert reloaded.load()
+    assert isinstance(reloaded._indices, np.memmap)
+    assert reloaded.metrics()["nodes"] == 19
+    assert graph_lists(reloaded, manager) == brute_force(manager, 3)
+
+def test_save_writes_files_without_holding_the_lock(tmp_path, monkeypatch):
+    """Las consultas no esperan a la escritura en disco de una compactación."""
+    manager = FakeManager(corpus(5))
+    graph = KnnGraph(manager, path=str(tmp_path), k=3)
+    graph.rebuild()
+    lock_free = []
+    original_save = np.save
+
+    def probe():
+        acquired = graph._lock.acquire(timeout=1)
+        if acquired:
+            graph._lock.release()
+        lock_free.append(acquired)
+
+    def checking_save(path, array):
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        original_save(path, array)
+
+    monkeypatch.setattr(np, "save", checking_save)
+    graph.save()
+
+    assert lock_free == [True] * 4
+    assert graph_lists(graph, manager) == brute_force(manager, 3)
+
+def test_start_builds_the_graph_in_the_background(tmp_path):
+    """Sin grafo en disco, el hilo de actualización lo construye; hasta entonces no hay respuesta."""
+    manager = FakeManager(corpus(5))
+    graph = KnnGraph(manager, path=str(tmp_path), k=3, update_interval=60)
+    assert graph.neighbors("identity", "identity-0") is None
+
+    graph.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not graph.metrics()["built"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert graph.metrics()["builds"] == 1
+        assert graph_lists(graph, manager) == brute_force(manager, 3)
+    finally:
+        graph.stop()
+
+    restarted = KnnGraph(manager, path=str(tmp_path), k=3, update_interval=60)
+    restarted.start()
+    restarted.stop()
+    assert restarted.metrics()["built"] and restarted.metrics()["builds"] == 0
+
+def test_queries_skip_pending_writes_without_applying_them(tmp_path):
+    """Las consultas no aplican escrituras: omiten los items pendientes hasta que el hilo las aplica."""
+    manager = FakeManager(corpus(10))
+    graph = KnnGraph(manager, path=str(tmp_path), k=4)
+    graph.rebuild()
+    first = graph.neighbors("identity", "identity-0")[0]
+
+    manager.write(first["module"], "delete", [{"id": first["id"]}])
+    manager.write("identity", "add", [{"id": "nuevo", "text": "nuevo texto"}])
+
+    hits = graph.neighbors("identity", "identity-0")
+    assert (first["module"], first["id"]) not in {(hit["module"], hit["id"]) for hit in hits}
+    assert graph.neighbors("identity", "nuevo") is None
+    assert graph.metrics()["applied_items"] == 0 and graph.metrics()["pending_writes"] == 2
+
+    graph.apply_pending()
+    assert graph_lists(graph, manager) == brute_force(manager, 4)
+
+def test_cross_links_follow_the_neighbor_lists(tmp_path):
+    """Los enlaces entre módulos son las aristas del grafo entre módulos distintos, sin repetir pares."""
+    manager = FakeManager(corpus(12))
+    graph = KnnGraph(manager, path=str(tmp_path), k=4)
+    assert graph.cross_links(["identity", "business"], 0.0, 5) is None
+
+    graph.rebuild()
+    manager.write("identity", "delete", [{"id": "identity-0"}])
+    graph.apply_pending()
+    lists = graph_lists(graph, manager)
+    manager.write("identity", "update", [{"id": "identity-1", "text": "identity texto cambiado"}])
+
+    expected = {}
+    for (module, item_id), neighbors in lists.items():
+        for neighbor in neighbors:
+            pair = tuple(sorted([(module, item_id), neighbor]))
+            if neighbor[0] != module and ("identity", "identity-1") not in pair:
+                expected[pair] = float(np.dot(
+                    normalize_embeddings([embed(manager.items[pair[0][0]][pair[0][1]]["text"])])[0],
+                    normalize_embeddings([embed(manager.items[pair[1][0]][pair[1][1]]["text"])])[0]
+                ))
+    best = sorted(expected.items(), key=lambda entry: -entry[1])[:5]
+
+    links = graph.cross_links(["identity", "business"], 0.0, 5)
+    assert [(first, second) for first, second, _ in links] == [pair for pair, _ in best]
+    assert np.allclose([similarity for _, _, similarity in links], [similarity for _, similarity in best], atol=1e-5)
+    assert graph.cross_links(["identity"], 0.0, 5) == []
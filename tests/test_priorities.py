@@ -0,0 +1,71 @@
+import asyncio
+
+from app.database import db_manager
+from app.models.schemas import PriorityAdjustRequest, PriorityOptimizeRequest, generate_id
+from app.modules import priorities
+
+def test_adjust_creates_a_record_chromadb_accepts():
+    """Ajustar un item sin registro de prioridad crea uno con metadatos válidos para ChromaDB."""
+    item_id = generate_id()
+    db_manager.add_item("identity", item_id, "Item sin registro de prioridad", {"category": "prueba"})
+    created = None
+    try:
+        request = PriorityAdjustRequest(item_id=item_id, module="identity", priority_level="high")
+        created = asyncio.run(priorities.adjust_priority(request))
+
+        stored = db_manager.get_item("priorities", created["id"])
+        assert stored["metadata"]["priority_level"] == "high"
+        assert stored["metadata"]["duplicate_of"] == ""
+    finally:
+        db_manager.delete_item("identity", item_id)
+        if created is not None:
+            db_manager.delete_item("priorities", created["id"])
+
+def bump_usage_behind_the_index(record_id, usage_count):
+    """Simula un volcado de uso concurrente escribiendo en ChromaDB sin pasar por el índice."""
+    collection = db_manager.get_collection("priorities")
+    metadata = collection.get(ids=[record_id], include=["metadatas"])["metadatas"][0]
+    collection.update(ids=[record_id], metadatas=[{**metadata, "usage_count": usage_count}])
+
+def test_priority_writes_keep_concurrent_usage_counts(monkeypatch):
+    """Ajustar y optimizar solo escriben los campos que cambian: no pisan `usage_count`."""
+    item_id = generate_id()
+    db_manager.add_item("identity", item_id, "Item con accesos concurrentes", {"category": "prueba"})
+    record = None
+    try:
+        request = PriorityAdjustRequest(item_id=item_id, module="identity", priority_level="medium")
+        record = asyncio.run(priorities.adjust_priority(request))
+
+        bump_usage_behind_the_index(record["id"], 7)
+        request = PriorityAdjustRequest(item_id=item_id, module="identity", priority_level="high")
+        asyncio.run(priorities.adjust_priority(request))
+        stored = db_manager.get_item("priorities", record["id"])["metadata"]
+        assert stored["priority_level"] == "high" and stored["usage_count"] == 7
+
+        bump_usage_behind_the_index(record["id"], 9)
+
+        async def review(review_request):
+            return {
+                "potential_duplicates": [],
+                "duplicate_groups": [],
+                "low_relevance_items": [{
+                    "id": item_id, "module": "identity", "text": "Item con accesos concurrentes",
+                    "relevance_score": 0.1, "suggested_action": "archive"
+                }]
+            }
+
+        monkeypatch.setattr(priorities, "review_priorities", review)
+        monkeypatch.setattr(priorities.priority_index, "get_module", lambda module: {})
+        request = PriorityOptimizeRequest(module="identity", auto_archive_low_relevance=True)
+        result = asyncio.run(priorities.optimize_priorities(request))
+
+        assert result["write_errors"] == []
+        [update] = result["plan"]["record_updates"]
+        assert update["id"] == record["id"]
+        assert set(update["metadata"]) == {"priority_level", "updated_at"}
+        stored = db_manager.get_item("priorities", record["id"])["metadata"]
+        assert stored["priority_level"] == "archived" and stored["usage_count"] == 9
+    finally:
+        db_manager.delete_item("identity", item_id)
+        if record is not None:
+            db_manager.delete_item("priorities", record["id"])
@@ -0,0 +1,73 @@
+from app.utils.priority_index import PriorityIndex
+
+class FakeManager:
+    """Gestor mínimo con los métodos que usa el índice."""
+
+    def __init__(self, records):
+        self.records = records
+        self.list_calls = 0
+        self.listeners = []
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def list_items(self, collection_key, limit=100):
+        self.list_calls += 1
+        return list(self.records)
+
+    def write(self, collection_key, event, items):
+        for listener in self.listeners:
+            listener(collection_key, event, items)
+
+def record(record_id, module, item_id, **metadata):
+    return {"id": record_id, "text": "", "metadata": {"module": module, "item_id": item_id, **metadata}}
+
+def test_priority_index_loads_once_and_looks_up_by_module_and_item():
+    """El índice lee la colección una sola vez y responde por (módulo, item_id)."""
+    manager = FakeManager([
+        record("p1", "identity", "a", relevance_score=0.9),
+        record("p2", "business", "a", relevance_score=0.1),
+        record("p3", "identity", "b")
+    ])
+    index = PriorityIndex(manager)
+
+    assert index.get("identity", "a")["id"] == "p1"
+    assert index.get("business", "a")["id"] == "p2"
+    assert index.get("identity", "missing") is None
+    assert set(index.get_module("identity")) == {"a", "b"}
+    assert manager.list_calls == 1
+
+def test_priority_index_follows_writes():
+    """Las escrituras en la colección de prioridades mantienen el índice coherente."""
+    manager = FakeManager([record("p1", "identity", "a")])
+    index = PriorityIndex(manager)
+    index.load()
+
+    manager.write("priorities", "add", [record("p2", "identity", "b", usage_count=1)])
+    manager.write("priorities", "update", [record("p1", "identity", "a", usage_count=5)])
+    manager.write("identity", "delete", [{"id": "p2"}])  # Otra colección: se ignora
+
+    assert index.get("identity", "b")["metadata"]["usage_count"] == 1
+    assert index.get("identity", "a")["metadata"]["usage_count"] == 5
+
+    manager.write("priorities", "delete", [{"id": "p2"}])
+    assert index.get("identity", "b") is None
+    assert "b" not in index.get_module("identity")
+    assert manager.list_calls == 1
+
+def test_priority_index_keeps_writes_made_during_load():
+    """Una escritura que llega mientras se lee la colección no se pierde."""
+    manager = FakeManager([record("p1", "identity", "a")])
+    index = PriorityIndex(manager)
+    list_items = manager.list_items
+
+    def list_during_write(collection_key, limit=100):
+        records = list_items(collection_key, limit)
+        manager.write("priorities", "add", [record("p2", "identity", "b")])
+        return records
+
+    manager.list_items = list_during_write
+    index.load()
+
+    assert index.get("identity", "a")["id"] == "p1"
+    assert index.get("identity", "b")["id"] == "p2"
@@ -0,0 +1,86 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.utils.scoring import ScoringEngine, ScoreTable, rerank
+
+NOW = datetime(2024, 6, 1).timestamp()
+
+class FakeIndex:
+    """Índice de prioridades mínimo con los registros de un módulo."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def get_module(self, module):
+        return {record["metadata"]["item_id"]: record for record in self.records}
+
+def table(usage_count, days_ago, relevance=None, length=None, degree=None):
+    n = len(usage_count)
+    return ScoreTable(
+        [f"i{k}" for k in range(n)],
+        usage_count,
+        [NOW - d * 86400 if d is not None else np.nan for d in days_ago],
+        relevance if relevance is not None else [0.5] * n,
+        length if length is not None else [100] * n,
+        degree if degree is not None else [0] * n
+    )
+
+def test_usage_decays_with_last_access_age():
+    """Con el mismo uso, un acceso reciente puntúa más que uno antiguo."""
+    engine = ScoringEngine(None, None, half_life_days=10)
+
+    scores = engine.score(table([10, 10, 10, 0], [0, 10, None, 0]), now=NOW)
+
+    assert scores[0] > scores[1] > scores[2]
+    assert scores[2] == scores[3]  # Sin fecha de acceso el uso no cuenta
+
+def test_levels_are_assigned_by_percentile():
+    """Los niveles dependen de la posición relativa de cada puntuación."""
+    engine = ScoringEngine(None, None, high_percentile=80, low_percentile=20)
+
+    levels = engine.levels(np.linspace(0, 1, 10))
+
+    assert list(levels[:2]) == ["low", "low"]
+    assert list(levels[2:8]) == ["medium"] * 6
+    assert list(levels[8:]) == ["high", "high"]
+    assert list(engine.levels(np.full(5, 0.3))) == ["medium"] * 5
+
+def test_score_items_uses_records_overrides_and_connections():
+    """Las columnas salen del registro de prioridad, o de los metadatos planificados si se dan."""
+    recent = (datetime.now() - timedelta(days=1)).isoformat()
+    index = FakeIndex([
+        {"id": "p1", "metadata": {"item_id": "a", "usage_count": 50, "last_accessed": recent, "relevance_score": 0.9}},
+        {"id": "p2", "metadata": {"item_id": "b", "usage_count": 0, "relevance_score": 0.1}}
+    ])
+    engine = ScoringEngine(None, index)
+    engine.connection_degrees = lambda module: Counter({"a": 3})
+    items = [{"id": "a", "text": "x" * 500}, {"id": "b", "text": "y"}, {"id": "c", "text": "z" * 200}]
+
+    scores = engine.score_items("identity", items)
+    assert scores["a"]["score"] > scores["c"]["score"] > scores["b"]["score"]
+    assert scores["a"]["level"] == "high" and scores["b"]["level"] == "low"
+    assert scores["a"]["usage_count"] == 50
+
+    overridden = engine.score_items("identity", items, {"b": {"usage_count": 0, "relevance_score": 1.0}})
+    assert overridden["b"]["score"] > scores["b"]["score"]
+
+def test_rerank_blends_similarity_and_priority():
+    """Con peso 0 se conserva el orden por similitud; con peso alto domina la prioridad."""
+    items = [{"id": "a"}, {"id": "b"}]
+    scores = {"a": {"score": 0.0}, "b": {"score": 1.0}}
+
+    assert rerank(items, [0.9, 0.8], scores, 0.0) == [0, 1]
+    assert rerank(items, [0.9, 0.8], scores, 0.5) == [1, 0]
+
+def test_connection_degrees_come_from_the_connection_index():
+    """Los grados de conexión se leen del índice en memoria, sin consultar la base de datos."""
+    class FakeGraph:
+        def degrees(self, module):
+            return Counter({"a": 2}) if module == "identity" else Counter()
+
+    engine = ScoringEngine(None, None, FakeGraph())
+
+    assert engine.connection_degrees("identity") == {"a": 2}
+    assert engine.connection_degrees("business") == {}
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from app.utils.similarity import (
+    find_similar_pairs, normalize_embeddings, distance_to_similarity,
+    iter_neighbor_pairs, merge_ranked, UnionFind,
+    cross_block_shape, top_k_cross_similarities, strongest_cross_links
+)
+
+def brute_force_pairs(embeddings, min_similarity):
+    """Referencia: doble bucle con similitud coseno par a par."""
+    matrix = normalize_embeddings(embeddings)
+    pairs = []
+    for i in range(len(matrix)):
+        for j in range(i + 1, len(matrix)):
+            similarity = float(matrix[i] @ matrix[j])
+            if similarity >= min_similarity:
+                pairs.append((i, j))
+    return pairs
+
+def test_normalize_embeddings_handles_zero_rows():
+    """Las filas a cero no deben producir NaN."""
+    matrix = normalize_embeddings([[3.0, 4.0], [0.0, 0.0]])
+    assert np.allclose(matrix[0], [0.6, 0.8])
+    assert np.allclose(matrix[1], [0.0, 0.0])
+
+@pytest.mark.parametrize("block_size", [1, 7, 64])
+def test_find_similar_pairs_matches_brute_force(block_size):
+    """El cálculo por bloques encuentra los mismos pares, en el mismo orden, que el doble bucle."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((40, 8))
+    embeddings[10] = embeddings[3] + 0.01
+    embeddings[25] = embeddings[3] + 0.02
+
+    pairs = find_similar_pairs(embeddings, 0.5, block_size=block_size)
+
+    assert [(i, j) for i, j, _ in pairs] == brute_force_pairs(embeddings, 0.5)
+    assert all(i < j for i, j, _ in pairs)
+
+@pytest.mark.parametrize("memory_limit_bytes", [64, 4096, 1 << 20])
+def test_top_k_cross_similarities_matches_full_matrix(memory_limit_bytes):
+    """Con cualquier límite de memoria se obtienen los mismos k vecinos que con la matriz completa."""
+    rng = np.random.default_rng(1)
+    left = normalize_embeddings(rng.standard_normal((30, 8)))
+    right = normalize_embeddings(rng.standard_normal((45, 8)))
+
+    indices, similarities = top_k_cross_similarities(left, right, 4, memory_limit_bytes)
+
+    full = left @ right.T
+    expected = np.argsort(-full, axis=1)[:, :4]
+    assert np.array_equal(indices, expected)
+    assert np.allclose(similarities, np.take_along_axis(full, expected, axis=1), atol=1e-6)
+
+def test_cross_block_shape_respects_memory_limit():
+    """Las teselas no superan el presupuesto de memoria ni el tamaño de las matrices."""
+    rows, cols = cross_block_shape(100000, 50000, 16 * 1024 * 1024)
+    assert rows * cols * 16 <= 16 * 1024 * 1024
+    assert cross_block_shape(10, 20, 1 << 30) == (10, 20)
+
+def test_strongest_cross_links_limits_and_orders_links():
+    """Se conservan los enlaces más fuertes por encima del umbral, de mayor a menor."""
+    left = normalize_embeddings([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]])
+    right = normalize_embeddings([[1.0, 0.1], [0.1, 1.0], [1.0, 0.3]])
+
+    links = strongest_cross_links(left, right, limit=2, min_similarity=0.5, k=2)
+
+    assert [(i, j) for i, j, _ in links] == [(0, 0), (1, 1)]
+    assert links[0][2] >= links[1][2]
+    assert strongest_cross_links(left, right, limit=10, min_similarity=0.999, k=2) == []
+
+def test_distance_to_similarity_l2():
+    """La distancia L2 al cuadrado entre vectores unitarios se convierte en coseno."""
+    a = np.array([1.0, 0.0])
+    b = np.array([np.sqrt(0.5), np.sqrt(0.5)])
+    distance = float(np.sum((a - b) ** 2))
+    assert distance_to_similarity([distance], "l2")[0] == pytest.approx(float(a @ b), abs=1e-6)
+    assert distance_to_similarity([0.25], "cosine")[0] == pytest.approx(0.75)
+
+def test_iter_neighbor_pairs_deduplicates_symmetric_neighbors():
+    """Cada par aparece una sola vez y se ignoran el propio item y los IDs desconocidos."""
+    ids = ["a", "b", "c"]
+    neighbors = [
+        [("a", 1.0), ("b", 0.95), ("x", 0.99)],
+        [("b", 1.0), ("a", 0.95), ("c", 0.5)],
+        [("c", 1.0), ("b", 0.5)],
+    ]
+    assert list(iter_neighbor_pairs(ids, neighbors, 0.9)) == [(0, 1, 0.95)]
+
+def test_union_find_groups_transitive_duplicates():
+    """A~B y B~C forman un único grupo; los items aislados no aparecen."""
+    union_find = UnionFind()
+    union_find.union("a", "b")
+    union_find.union("b", "c")
+    union_find.union("d", "e")
+    union_find.add("f")
+
+    assert union_find.groups() == [["a", "b", "c"], ["d", "e"]]
+    assert union_find.find("c") == union_find.find("a")
+
+def test_merge_ranked_orders_hits_across_collections():
+    """La mezcla por montículo produce el ranking global y respeta el límite."""
+    identity = [{"id": "a", "distance": 0.1}, {"id": "b", "distance": 0.7}]
+    business = [{"id": "c", "distance": 0.3}, {"id": "d", "distance": 0.4}]
+    reminders = []
+
+    merged = merge_ranked([identity, business, reminders])
+    assert [hit["id"] for hit in merged] == ["a", "c", "d", "b"]
+    assert [hit["id"] for hit in merge_ranked([identity, business], limit=2)] == ["a", "c"]
@@ -0,0 +1,80 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from app.utils.snapshots import SnapshotCache
+
+class Request(BaseModel):
+    modules: list
+
+class FakeManager:
+    """Gestor mínimo con versiones de datos controladas por el test."""
+
+    def __init__(self):
+        self.versions = {}
+        self.idle_seconds = float("inf")
+
+    def data_versions(self, collection_keys):
+        return {key: self.versions.get(key, 0) for key in collection_keys}
+
+    def seconds_since_write(self, collection_keys):
+        return self.idle_seconds
+
+    def write(self, collection_key):
+        self.versions[collection_key] = self.versions.get(collection_key, 0) + 1
+        self.idle_seconds = 0.0
+
+def make_cache(manager, **kwargs):
+    calls = []
+
+    async def compute(request):
+        calls.append(request.modules)
+        return {"total": len(calls)}
+
+    cache = SnapshotCache(manager, **kwargs)
+    cache.register("analysis", Request, compute, lambda request: request.modules)
+    return cache, calls
+
+def test_unchanged_data_is_served_from_snapshot():
+    """Mientras las colecciones leídas no cambian, el análisis no se recalcula."""
+    manager = FakeManager()
+    cache, calls = make_cache(manager)
+
+    first = asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"])))
+    second = asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"])))
+
+    assert first == {"total": 1}
+    assert second == {"total": 1, "cached": True}
+    assert len(calls) == 1
+
+    manager.write("business")  # Colección que el análisis no lee
+    assert asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"])))["cached"]
+
+    manager.write("identity")
+    assert asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"]))) == {"total": 2}
+    assert cache.metrics()["hits"] == 2 and cache.metrics()["misses"] == 2
+
+def test_refresher_waits_for_writes_to_settle():
+    """Las instantáneas desactualizadas se recalculan fuera de la petición cuando cesan las escrituras."""
+    manager = FakeManager()
+    cache, calls = make_cache(manager, settle_seconds=10)
+    asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"])))
+
+    manager.write("identity")
+    assert cache.refresh_stale() == 0  # Escrituras recientes
+
+    manager.idle_seconds = 30
+    assert cache.refresh_stale() == 1
+    assert len(calls) == 2
+
+    result = asyncio.run(cache.get_or_compute("analysis", Request(modules=["identity"])))
+    assert result == {"total": 2, "cached": True}
+
+def test_snapshots_are_bounded():
+    """Se conservan como máximo `max_entries` instantáneas."""
+    cache, _ = make_cache(FakeManager(), max_entries=2)
+
+    for module in ("identity", "business", "reminders"):
+        asyncio.run(cache.get_or_compute("analysis", Request(modules=[module])))
+
+    assert cache.metrics()["entries"] == 2
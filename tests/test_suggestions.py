@@ -0,0 +1,145 @@
+import asyncio
+
+from app.database import db_manager
+from app.models.schemas import SuggestionRequest
+from app.modules import suggestions
+
+def module_items(module, size, match_index, filler, match):
+    """Items de un módulo: todos con el vector `filler` salvo el de `match_index`."""
+    return [
+        {
+            "id": f"{module}-{i}",
+            "text": f"texto {module} {i}",
+            "metadata": {},
+            "embedding": match if i == match_index else filler
+        }
+        for i in range(size)
+    ]
+
+def fake_store(monkeypatch, data, save=False, links=None):
+    """
+    Sustituye las lecturas de la base de datos por `data` y retorna las colecciones listadas.
+
+    Con `save` las sugerencias se guardan en ChromaDB; `links` son los enlaces
+    del grafo kNN (None: grafo aún no construido).
+    """
+    listed = []
+
+    async def list_items(collection_key, limit=100, offset=0, where=None,
+                         include_documents=True, include_embeddings=False):
+        listed.append(collection_key)
+        items = data.get(collection_key, [])
+        return items[offset:offset + limit] if limit is not None else list(items)
+
+    async def get_items(collection_key, ids):
+        by_id = {item["id"]: item for item in data.get(collection_key, [])}
+        return {item_id: by_id[item_id] for item_id in ids if item_id in by_id}
+
+    async def save_suggestion(suggestion_text, metadata):
+        return {"id": suggestion_text, "text": suggestion_text, "metadata": metadata}
+
+    monkeypatch.setattr(suggestions.async_db_manager, "list_items", list_items)
+    monkeypatch.setattr(suggestions.async_db_manager, "get_items", get_items)
+    monkeypatch.setattr(suggestions.knn_graph, "cross_links", lambda modules, min_similarity, limit_per_pair: links)
+    if not save:
+        monkeypatch.setattr(suggestions, "save_suggestion", save_suggestion)
+    monkeypatch.setattr(suggestions.theme_model, "apply_pending", lambda: 0)
+    monkeypatch.setattr(suggestions.theme_model, "themes", lambda modules: [])
+    return listed
+
+def test_connections_are_read_from_the_knn_graph(monkeypatch):
+    """Con el grafo construido, las conexiones salen de sus listas sin listar los módulos."""
+    listed = fake_store(monkeypatch, {
+        "identity": module_items("identity", 3, 0, [1.0, 0.0], [1.0, 0.0]),
+        "business": module_items("business", 3, 0, [1.0, 0.0], [1.0, 0.0])
+    }, links=[
+        (("business", "business-1"), ("identity", "identity-2"), 0.8),
+        (("business", "business-2"), ("identity", "identity-0"), 0.95)
+    ])
+
+    request = SuggestionRequest(modules=["identity", "business"], suggestion_types=["connection"],
+                                max_suggestions=1, min_relevance=0.0)
+    result = asyncio.run(suggestions.compute_suggestions(request))
+
+    assert listed == []
+    [suggestion] = result["suggestions"]
+    assert suggestion["metadata"]["source_items"] == "business-2,identity-0"
+
+def test_connections_fall_back_to_whole_modules_while_the_graph_builds(monkeypatch):
+    """Sin grafo, el cálculo exacto lee los módulos completos, no solo sus primeros 100 items."""
+    fake_store(monkeypatch, {
+        "identity": module_items("identity", 150, 120, [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]),
+        "business": module_items("business", 150, 130, [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])
+    })
+
+    request = SuggestionRequest(modules=["identity", "business"], suggestion_types=["connection"], min_relevance=0.0)
+    result = asyncio.run(suggestions.compute_suggestions(request))
+
+    [suggestion] = result["suggestions"]
+    assert suggestion["metadata"]["source_items"] == "business-130,identity-120"
+
+def test_inactive_items_are_read_by_id(monkeypatch):
+    """Los items sin actividad se leen por ID a partir de sus registros de prioridad."""
+    items = module_items("identity", 150, 0, [1.0, 0.0], [1.0, 0.0])
+    listed = fake_store(monkeypatch, {
+        "identity": items,
+        "priorities": [
+            {"id": "p1", "metadata": {"module": "identity", "item_id": "identity-140", "last_accessed_ts": 10.0}},
+            {"id": "p2", "metadata": {"module": "identity", "item_id": "borrado", "last_accessed_ts": 5.0}}
+        ]
+    })
+    requested = []
+
+    async def get_items(collection_key, ids):
+        requested.append((collection_key, ids))
+        by_id = {item["id"]: item for item in items}
+        return {item_id: by_id[item_id] for item_id in ids if item_id in by_id}
+
+    monkeypatch.setattr(suggestions.async_db_manager, "get_items", get_items)
+
+    request = SuggestionRequest(modules=["identity"], suggestion_types=["action"], min_relevance=0.0)
+    result = asyncio.run(suggestions.compute_suggestions(request))
+
+    assert listed == ["priorities"]
+    assert requested == [("identity", ["identity-140", "borrado"])]
+    [suggestion] = result["suggestions"]
+    assert suggestion["metadata"]["source_items"] == "identity-140"
+
+def test_sources_depend_on_priorities_only_for_actions():
+    """Las prioridades solo invalidan el análisis si se piden sugerencias "action"."""
+    connections = SuggestionRequest(modules=["identity", "business"], suggestion_types=["connection"])
+    assert suggestions.suggestion_sources(connections) == ["identity", "business", "suggestions"]
+    assert "priorities" in suggestions.suggestion_sources(SuggestionRequest(modules=["identity"]))
+    assert "priorities" in suggestions.suggestion_sources(SuggestionRequest(suggestion_types=["action"]))
+
+def test_theme_model_is_updated_before_reading_themes(monkeypatch):
+    """Las escrituras pendientes del modelo de temas se aplican antes de leer los temas."""
+    fake_store(monkeypatch, {"identity": module_items("identity", 3, 0, [1.0, 0.0], [1.0, 0.0])})
+    calls = []
+    monkeypatch.setattr(suggestions.theme_model, "apply_pending", lambda: calls.append("apply_pending"))
+    monkeypatch.setattr(suggestions.theme_model, "themes", lambda modules: calls.append("themes") or [])
+
+    request = SuggestionRequest(modules=["identity"], suggestion_types=["insight"], min_relevance=0.0)
+    asyncio.run(suggestions.compute_suggestions(request))
+
+    assert calls == ["apply_pending", "themes"]
+
+def test_suggestions_are_saved_in_chromadb(monkeypatch):
+    """Las sugerencias generadas se guardan en ChromaDB una sola vez, con metadatos escalares."""
+    fake_store(monkeypatch, {
+        "identity": module_items("identity", 3, 1, [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]),
+        "business": module_items("business", 3, 2, [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])
+    }, save=True)
+    request = SuggestionRequest(modules=["identity", "business"], suggestion_types=["connection"], min_relevance=0.0)
+
+    [suggestion] = asyncio.run(suggestions.compute_suggestions(request))["suggestions"]
+    try:
+        stored = db_manager.get_item(suggestions.COLLECTION_KEY, suggestion["id"])
+        assert stored["metadata"]["source_modules"] == "business,identity"
+        assert stored["metadata"]["source_items"] == "business-2,identity-1"
+        assert stored["metadata"]["implementation_date"] == ""
+
+        [again] = asyncio.run(suggestions.compute_suggestions(request))["suggestions"]
+        assert again["id"] == suggestion["id"]
+    finally:
+        db_manager.delete_item(suggestions.COLLECTION_KEY, suggestion["id"])
@@ -0,0 +1,176 @@
+import time
+
+import numpy as np
+
+from app.utils.theme_model import ThemeModel
+
+def embed(text):
+    """Vector determinista: la primera letra elige la dirección del tema."""
+    vector = np.zeros(8, dtype=np.float32)
+    vector["abc".index(text[0])] = 1.0
+    vector[3 + len(text) % 5] = 0.05
+    return vector
+
+class FakeManager:
+    """Gestor mínimo con items en memoria que notifica las escrituras a los listeners."""
+
+    def __init__(self, items):
+        self.items = items
+        self.listeners = []
+        self.encoded = 0
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def list_items(self, collection_key, limit=None):
+        return list(self.items.get(collection_key, {}).values())
+
+    def get_item_embeddings(self, collection_key, items):
+        return [embed(item["text"]) for item in items]
+
+    def embedding_function(self, texts):
+        self.encoded += len(texts)
+        return [embed(text) for text in texts]
+
+    def write(self, collection_key, event, items):
+        for listener in self.listeners:
+            listener(collection_key, event, items)
+
+def corpus():
+    identity = {f"i{n}": {"id": f"i{n}", "text": "a" * (n + 2)} for n in range(6)}
+    business = {f"b{n}": {"id": f"b{n}", "text": "b" * (n + 2)} for n in range(4)}
+    return {"identity": identity, "business": business}
+
+def wait_for_rebuilds(model, rebuilds):
+    deadline = time.monotonic() + 5
+    while model.metrics()["rebuilds"] < rebuilds and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return model.metrics()["rebuilds"]
+
+def test_themes_are_fitted_in_the_background_and_read_per_module(tmp_path):
+    """Leer los temas no ajusta el modelo: lo ajusta el hilo; los temas se cuentan por módulo."""
+    manager = FakeManager(corpus())
+    model = ThemeModel(manager, path=str(tmp_path / "themes.npz"), update_interval=60)
+    assert model.themes() == []
+    assert model.metrics()["rebuilds"] == 0
+
+    model.start()
+    try:
+        assert wait_for_rebuilds(model, 1) == 1
+    finally:
+        model.stop()
+
+    themes = model.themes()
+    assert sorted(theme["size"] for theme in themes) == [4, 6]
+    assert {theme["representative"]["module"] for theme in themes} == {"identity", "business"}
+
+    [theme] = model.themes(["business"])
+    assert theme["size"] == 4 and theme["representative"]["id"].startswith("b")
+    assert model.metrics()["rebuilds"] == 1
+
+def test_corpus_is_reclustered_in_the_background_after_enough_writes(tmp_path):
+    """Cuando el corpus crece lo suficiente el hilo vuelve a agrupar y elige de nuevo el número de temas."""
+    items = corpus()
+    manager = FakeManager(items)
+    model = ThemeModel(manager, path=str(tmp_path / "themes.npz"), update_interval=0.01, recluster_ratio=0.5)
+    model.rebuild()
+    assert len(model.themes()) == 2
+
+    new_items = [{"id": f"c{n}", "text": "c" * (n + 2)} for n in range(6)]
+    items["business"].update({item["id"]: item for item in new_items})
+    manager.write("business", "add", new_items)
+    model.apply_pending()
+    # Las lecturas no reagrupan: los nuevos items se reparten entre los temas existentes
+    assert len(model.themes()) == 2
+    assert model.needs_rebuild() and model.metrics()["rebuilds"] == 1
+
+    model.start()
+    try:
+        assert wait_for_rebuilds(model, 2) == 2
+    finally:
+        model.stop()
+    assert sorted(theme["size"] for theme in model.themes()) == [4, 6, 6]
+    assert not model.needs_rebuild()
+
+def test_apply_pending_does_not_wait_for_a_rebuild(tmp_path):
+    """Mientras el hilo reagrupa, aplicar las escrituras desde una petición no espera."""
+    manager = FakeManager(corpus())
+    model = ThemeModel(manager, path=str(tmp_path / "themes.npz"))
+    model.rebuild()
+    manager.write("identity", "add", [{"id": "i9", "text": "aaaaaaa"}])
+
+    with model._build_lock:
+        assert model.apply_pending() == 0
+    assert model.metrics()["pending_writes"] == 1
+    assert model.apply_pending() == 1
+
+def test_writes_update_counts_and_centroids_incrementally(tmp_path):
+    """Las escrituras se aplican por lotes sin reajustar el corpus."""
+    manager = FakeManager(corpus())
+    model = ThemeModel(manager, path=str(tmp_path / "themes.npz"))
+    model.rebuild()
+    label = next(theme["label"] for theme in model.themes() if theme["representative"]["module"] == "identity")
+    before = model._centroids[label].copy()
+
+    manager.write("identity", "add", [{"id": "i9", "text": "aaaaaaa"}, {"id": "i10", "text": "aaa"}])
+    manager.write("business", "delete", [{"id": "b0"}, {"id": "b1"}])
+    manager.write("connections", "add", [{"id": "c1", "text": "c"}])  # Fuera de los módulos: se ignora
+    assert model.themes(["identity"])[0]["size"] == 6  # Aún sin aplicar
+
+    assert model.apply_pending() == 4
+    assert model.themes(["identity"])[0]["size"] == 8
+    assert model.themes(["business"])[0]["size"] == 2
+    assert not np.allclose(model._centroids[label], before)
+    assert manager.encoded == 2
+    assert model.metrics()["rebuilds"] == 1
+
+    # Editar un item sin cambiar de tema no altera el recuento
+    manager.write("identity", "update", [{"id": "i9", "text": "aaaa"}])
+    model.apply_pending()
+    assert model.themes(["identity"])[0]["size"] == 8
+
+def test_edits_replace_the_old_vector_in_the_centroid(tmp_path):
+    """Al editar o eliminar un item su vector anterior sale del centroide: cada centroide es la media de su tema."""
+    manager = FakeManager(corpus())
+    model = ThemeModel(manager, path=str(tmp_path / "themes.npz"))
+    model.rebuild()
+    label = model._assignments[("identity", "i0")]
+    before = model._centroids[label].copy()
+
+    # Mismo tema, vector distinto: el centroide se mueve aunque no cambie la asignación
+    manager.write("identity", "update", [{"id": "i0", "text": "aaaaaa"}])
+    model.apply_pending()
+    assert model._assignments[("identity", "i0")] == label
+    assert not np.allclose(model._centroids[label], before)
+
+    manager.write("identity", "update", [{"id": "i1", "text": "bbb"}])  # Cambia de tema
+    manager.write("identity", "delete", [{"id": "i2"}])
+    manager.write("identity", "update", [{"id": "i3", "text": "aaaaa"}])  # Texto igual: no cambia nada
+    model.apply_pending()
+
+    texts = {**{key: item["text"] for key, item in corpus()["identity"].items()}, "i0": "aaaaaa", "i1": "bbb"}
+    texts.pop("i2")
+    members = {}
+    for item_id, text in texts.items():
+        members.setdefault(model._assignments[("identity", item_id)], []).append(embed(text))
+    for item in corpus()["business"].values():
+        members.setdefault(model._assignments[("business", item["id"])], []).append(embed(item["text"]))
+
+    for theme, vectors in members.items():
+        expected = np.mean([vector / np.linalg.norm(vector) for vector in vectors], axis=0)
+        assert np.allclose(model._centroids[theme], expected, atol=1e-3)
+        assert model._weights[theme] == len(vectors)
+
+def test_model_is_persisted_and_reloaded(tmp_path):
+    """El modelo guardado se carga sin volver a ajustar."""
+    path = str(tmp_path / "themes.npz")
+    model = ThemeModel(FakeManager(corpus()), path=path)
+    model.rebuild()
+    expected = model.themes()
+
+    reloaded = ThemeModel(FakeManager({}), path=path)
+    assert reloaded.load()
+    assert reloaded.themes() == expected
+    assert reloaded.metrics()["rebuilds"] == 0
+    assert reloaded.metrics()["items"] == 10
+    assert np.array_equal(reloaded._vectors[reloaded._rows[("identity", "i0")]], model._vectors[model._rows[("identity", "i0")]])
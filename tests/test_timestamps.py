@@ -0,0 +1,33 @@
+import math
+from datetime import datetime
+
+from app.utils.timestamps import parse_timestamp, with_epoch_fields, needs_epoch_fields
+
+def test_parse_timestamp_accepts_iso_and_epoch():
+    """Las fechas ISO y los epoch se convierten a segundos; el resto a NaN."""
+    moment = datetime(2024, 6, 1, 12, 30)
+    assert parse_timestamp(moment.isoformat()) == moment.timestamp()
+    assert parse_timestamp(1700000000) == 1700000000.0
+    assert math.isnan(parse_timestamp("ayer"))
+    assert math.isnan(parse_timestamp(None))
+
+def test_with_epoch_fields_adds_numeric_copies():
+    """Cada fecha válida se acompaña de su campo `_ts`; las demás claves no cambian."""
+    metadata = {"updated_at": "2024-06-01T12:00:00", "last_accessed": "", "module": "identity"}
+
+    enriched = with_epoch_fields(metadata)
+
+    assert enriched["updated_at_ts"] == datetime(2024, 6, 1, 12).timestamp()
+    assert "last_accessed_ts" not in enriched
+    assert enriched["module"] == "identity"
+    assert "updated_at_ts" not in metadata  # No se modifica el original
+    assert with_epoch_fields(None) is None
+
+def test_needs_epoch_fields_detects_missing_and_stale_values():
+    """La migración solo reescribe los metadatos sin campo epoch o con uno desfasado."""
+    current = with_epoch_fields({"last_accessed": "2024-06-01T00:00:00"})
+
+    assert not needs_epoch_fields(current)
+    assert needs_epoch_fields({"last_accessed": "2024-06-01T00:00:00"})
+    assert needs_epoch_fields({**current, "last_accessed": "2024-06-02T00:00:00"})
+    assert not needs_epoch_fields({"module": "identity"})
@@ -0,0 +1,102 @@
+from app.utils.usage_tracker import UsageTracker
+
+class FakeIndex:
+    """Índice de prioridades mínimo indexado por (módulo, item_id)."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def get(self, module, item_id):
+        return self.records.get((module, item_id))
+
+class FakeManager:
+    """Gestor mínimo que registra las escrituras masivas y aplica los parches de metadatos."""
+
+    def __init__(self, items, fail=False, records=None):
+        self.items = items
+        self.fail = fail
+        self.records = records or {}
+        self.updates = []
+        self.adds = []
+
+    def get_items(self, collection_key, ids):
+        return {item_id: self.items[item_id] for item_id in ids if item_id in self.items}
+
+    def update_items(self, collection_key, items, merge_metadata=False, usage_only=False):
+        if self.fail:
+            raise RuntimeError("base de datos no disponible")
+        assert merge_metadata and usage_only
+        self.updates.append(items)
+        for item in items:
+            metadata = self.records.setdefault(item["id"], {})
+            metadata.update(item.get("metadata") or {})
+            for field, delta in (item.get("increments") or {}).items():
+                metadata[field] = metadata.get(field, 0) + delta
+        return {"errors": []}
+
+    def add_items(self, collection_key, items, usage_only=False):
+        assert usage_only
+        self.adds.append(items)
+        return {"errors": []}
+
+def test_record_does_not_write_until_flush():
+    """Los accesos se acumulan en memoria y se vuelcan en una escritura masiva."""
+    stored = {"item_id": "a", "usage_count": 2, "priority_level": "high"}
+    index = FakeIndex({("identity", "a"): {"id": "p1", "metadata": dict(stored)}})
+    manager = FakeManager({"b": {"id": "b", "text": "item b"}}, records={"p1": stored})
+    tracker = UsageTracker(manager, index, flush_interval=60)
+
+    tracker.record("identity", ["a", "a", "b", "gone"])
+    tracker.record("connections", ["x"])  # Sin registros de prioridad: se ignora
+    assert manager.updates == [] and manager.adds == []
+    assert tracker.metrics()["pending_hits"] == 4
+
+    assert tracker.flush() == {"updated": 1, "created": 1}
+    [[update]] = manager.updates
+    assert update["id"] == "p1"
+    assert manager.records["p1"]["usage_count"] == 4
+    assert manager.records["p1"]["priority_level"] == "high"
+    assert "last_accessed" in manager.records["p1"]
+    [[created]] = manager.adds
+    assert created["metadata"]["item_id"] == "b"
+    assert created["metadata"]["usage_count"] == 1
+    assert tracker.metrics()["pending_hits"] == 0
+
+def test_counter_memory_is_bounded():
+    """Por encima de `max_items` los accesos a items nuevos se descartan."""
+    tracker = UsageTracker(FakeManager({}), FakeIndex({}), max_items=2)
+
+    tracker.record("business", ["a", "b", "c", "a"])
+
+    metrics = tracker.metrics()
+    assert metrics["pending_items"] == 2
+    assert metrics["pending_hits"] == 3
+    assert metrics["dropped_hits"] == 1
+
+def test_failed_flush_keeps_counters():
+    """Si el volcado falla, los accesos vuelven a memoria para el siguiente intento."""
+    index = FakeIndex({("identity", "a"): {"id": "p1", "metadata": {"usage_count": 0}}})
+    manager = FakeManager({}, fail=True, records={"p1": {"usage_count": 0}})
+    tracker = UsageTracker(manager, index)
+
+    tracker.record("identity", ["a", "a"])
+    tracker.flush()
+    assert tracker.metrics()["pending_hits"] == 2
+    assert tracker.metrics()["failed_flushes"] == 1
+
+    manager.fail = False
+    tracker.flush()
+    assert manager.records["p1"]["usage_count"] == 2
+
+def test_flush_does_not_overwrite_concurrent_changes():
+    """El volcado solo toca los campos de uso: un cambio de prioridad posterior al índice se conserva."""
+    index = FakeIndex({("identity", "a"): {"id": "p1", "metadata": {"usage_count": 1, "priority_level": "low"}}})
+    stored = {"usage_count": 1, "priority_level": "low"}
+    manager = FakeManager({}, records={"p1": stored})
+    tracker = UsageTracker(manager, index)
+
+    tracker.record("identity", ["a"])
+    stored.update({"priority_level": "high", "duplicate_of": "b"})  # /prioridad/ajustar tras leer el índice
+    tracker.flush()
+
+    assert stored == {"usage_count": 2, "priority_level": "high", "duplicate_of": "b", "last_accessed": stored["last_accessed"]}